@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the dremio_acl commands against the mock Dremio server
+
+    python -m benchmarks.run bench --size 100k --latency 0.005 --jobs 16
+    python -m benchmarks.run compare HEAD~1 HEAD
+
+Each benchmark runs in a child process so that its peak RSS is its own, and talks over HTTP to a mock server running
+in a process of its own, so requests go through the same client, limiter and metrics as a real run. Results are
+appended as JSON lines to the results file, tagged with the current git commit, so runs of different commits can be
+compared.
+"""
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+import simplejson as json
+
+from dremio_client.conf import build_config
+from dremio_client.dremio_simple_client import SimpleClient
+from dremio_client.mock import MockCatalog
+from dremio_client.model.endpoints import set_limiter, set_metrics
+from dremio_client.model.limiter import AdaptiveLimiter
+from dremio_client.model.metrics import Metrics
+from dremio_acl.acl import (fetch, fetch_object_paths, report_acl, dump_acl, update_acl, update_acls_to_folder,
+                            build_default_acl, index_acl_defs)
+from dremio_acl.crawl import CatalogStore
+
+BENCHMARKS = ("fetch", "fetch_object_paths", "report_acl", "dump_acl", "update_acl", "update_acls_to_folder")
+
+# (depth, folders per container, datasets per container) of one source and one space. Every container, the source
+# or space included, holds datasets
+SIZES = {
+    "1k": (2, 5, 32),      # 31 containers, 992 datasets each
+    "100k": (3, 10, 90),   # 1111 containers, 99990 datasets each
+    "1m": (4, 10, 90),     # 11111 containers, 999990 datasets each
+}
+
+FIELDS = 20
+
+
+def _quiet(x):
+    pass
+
+
+def _catalog(size):
+    depth, fan, datasets = SIZES[size]
+    return MockCatalog(sources=1, spaces=1, depth=depth, fan=fan, datasets=datasets, fields=FIELDS)
+
+
+def _acl_defs(catalog, every=10):
+    # a definition for every tenth dataset of the source, with the ACL of another path so that most need updating
+    entities = []
+    for child in catalog.walk([catalog.roots[0]]):
+        if child["type"] == "DATASET" and int(child["path"][-1][1:]) % every == 0:
+            entities.append({"entityPath": child["path"], "accessControlList": catalog.acl(child["path"] + ["x"])})
+    acl_defs = {"entities": entities}
+    index_acl_defs(acl_defs)
+    return acl_defs
+
+
+def _start_server(size, latency):
+    # the server gets a process of its own, so its threads take no time or memory from the benchmark
+    depth, fan, datasets = SIZES[size]
+    command = [sys.executable, "-u", "-m", "dremio_client.mock", "--port", "0", "--sources", "1", "--spaces", "1",
+               "--depth", str(depth), "--fan", str(fan), "--datasets", str(datasets), "--fields", str(FIELDS)]
+    if latency:
+        command += ["--latency", str(latency)]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE)
+    line = server.stdout.readline().decode("utf-8")
+    if " on http://" not in line:
+        server.kill()
+        raise click.ClickException("The mock server did not start: " + line)
+    host, _, port = line.strip().rpartition(" on http://")[2].rpartition(":")
+    return server, {"hostname": host, "port": int(port), "ssl": False, "auth.type": "basic",
+                    "auth.username": "dremio", "auth.password": "dremio123"}
+
+
+def run_one(name, size, latency, jobs, adaptive=False):
+    """run one benchmark in this process against a mock server and return its result"""
+    catalog = _catalog(size)
+    acl_defs = _acl_defs(catalog) if name in ("report_acl", "update_acl") else None
+    default_acl = build_default_acl("analysts", None)
+    base = [catalog.roots[0]]
+    per_root = catalog.dataset_count() // len(catalog.roots)
+    server, config = _start_server(size, latency)
+    workdir = tempfile.mkdtemp(prefix="dremio_acl_bench_")
+    limiter = AdaptiveLimiter(max_limit=jobs) if adaptive else None
+    metrics = Metrics()
+    try:
+        client = SimpleClient(build_config(config), pool_size=jobs)
+        set_limiter(limiter)
+        set_metrics(metrics)
+        store = CatalogStore(client)
+        start = time.time()
+        if name == "fetch":
+            datasets, _ = fetch(client, base, jobs, store)
+            items = len(datasets)
+        elif name == "fetch_object_paths":
+            items = len(fetch_object_paths(client, [catalog.roots[1]], 1, jobs, store))
+        elif name == "report_acl":
+            datasets, _ = fetch(client, base, jobs, store, lazy=True)
+            report_acl(client, base, acl_defs, datasets, workdir, default_acl, _quiet, store)
+            items = per_root
+        elif name == "dump_acl":
+            datasets, _ = fetch(client, base, jobs, store, lazy=True)
+            dump_acl(client, datasets, workdir, base, _quiet, store)
+            items = per_root
+        elif name == "update_acl":
+            datasets, source = fetch(client, base, jobs, store, lazy=True)
+            update_acl(client, acl_defs, datasets, source, False, default_acl, _quiet, jobs, store=store)
+            items = per_root
+        elif name == "update_acls_to_folder":
+            datasets, source = fetch(client, base, jobs, store, lazy=True)
+            update_acls_to_folder(client, datasets, source, default_acl, False, _quiet, jobs, store=store)
+            items = per_root
+        else:
+            raise click.BadParameter("unknown benchmark " + name)
+        wall = time.time() - start
+    finally:
+        set_limiter(None)
+        set_metrics(None)
+        server.terminate()
+        server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+    # ru_maxrss is in kilobytes on linux and in bytes on mac
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+    summary = metrics.summary()
+    requests = {}
+    for series in summary["requests"]:
+        key = "{} {}".format(series["method"], series["endpoint"])
+        requests[key] = requests.get(key, 0) + series["count"]
+    result = {"benchmark": name, "size": size, "latency": latency, "jobs": jobs, "adaptive": adaptive, "items": items,
+              "wall": wall, "throughput": items / wall if wall > 0 else None, "requests": requests,
+              "phases": summary["phases"], "peak_rss_mb": rss_mb}
+    if limiter is not None:
+        result["limiter"] = limiter.stats()
+    return result
+
+
+def _commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.STDOUT).decode("utf-8").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option("--size", "sizes", multiple=True, type=click.Choice(sorted(SIZES)), default=["1k"], show_default=True, help="Catalog size, may be repeated")
+@click.option("--latency", "latency", type=float, default=0.0, show_default=True, help="Seconds the mock server takes per request")
+@click.option("-j", "--jobs", "jobs", type=int, default=8, show_default=True, help="Number of concurrent catalog requests")
+@click.option("--adaptive", "adaptive", is_flag=True, default=False, help="Send requests through the adaptive limiter, up to --jobs in flight")
+@click.option("-b", "--benchmark", "benchmarks", multiple=True, type=click.Choice(BENCHMARKS), help="Benchmark to run, may be repeated. Default all")
+@click.option("-o", "--results", "results", type=click.Path(dir_okay=False), default="benchmarks/results.jsonl", show_default=True, help="File the results are appended to")
+def bench(sizes, latency, jobs, adaptive, benchmarks, results):
+    """
+    run benchmarks, each in a child process, and append the results
+    """
+    commit = _commit()
+    with open(results, "a") as f:
+        for size in sizes:
+            for name in benchmarks or BENCHMARKS:
+                output = subprocess.check_output([sys.executable, "-m", "benchmarks.run", "one", name, size,
+                                                  str(latency), str(jobs)] + (["--adaptive"] if adaptive else []))
+                result = json.loads(output.decode("utf-8").strip().splitlines()[-1])
+                result.update({"commit": commit, "timestamp": time.time(), "python": platform.python_version()})
+                f.write(json.dumps(result, sort_keys=True) + "\n")
+                f.flush()
+                click.echo("{benchmark:24} {size:5} {wall:9.2f}s {throughput:12.1f}/s {peak_rss_mb:9.1f} MB {requests}".format(**result))
+
+
+@cli.command()
+@click.argument("name")
+@click.argument("size")
+@click.argument("latency", type=float)
+@click.argument("jobs", type=int)
+@click.option("--adaptive", "adaptive", is_flag=True, default=False, help="Send requests through the adaptive limiter")
+def one(name, size, latency, jobs, adaptive):
+    """
+    run a single benchmark in this process and print its result as JSON
+    """
+    click.echo(json.dumps(run_one(name, size, latency, jobs, adaptive)))
+
+
+@cli.command()
+@click.argument("before")
+@click.argument("after")
+@click.option("-o", "--results", "results", type=click.Path(exists=True, dir_okay=False), default="benchmarks/results.jsonl", show_default=True, help="Results file")
+def compare(before, after, results):
+    """
+    compare the latest results of two commits, given as anything git rev-parse understands or as commit hash prefixes
+    """
+    def resolve(rev):
+        try:
+            return subprocess.check_output(["git", "rev-parse", rev], stderr=subprocess.STDOUT).decode("utf-8").strip()
+        except (OSError, subprocess.CalledProcessError):
+            return rev
+
+    before, after = resolve(before), resolve(after)
+    latest = {}
+    with open(results) as f:
+        for line in f:
+            r = json.loads(line)
+            for rev in (before, after):
+                if r.get("commit") and r["commit"].startswith(rev):
+                    latest[(rev, r["benchmark"], r["size"], r["latency"], r["jobs"], r.get("adaptive", False))] = r
+    keys = sorted(set(k[1:] for k in latest if k[0] == before) & set(k[1:] for k in latest if k[0] == after))
+    if not keys:
+        raise click.ClickException("No benchmark was run on both commits with the same settings")
+    for key in keys:
+        a, b = latest[(before,) + key], latest[(after,) + key]
+        click.echo("{:24} {:5} latency {} jobs {}{}: wall {:.2f}s -> {:.2f}s ({:+.1f}%), rss {:.1f} -> {:.1f} MB, "
+                   "requests {} -> {}".format(key[0], key[1], key[2], key[3], " adaptive" if key[4] else "",
+                                              a["wall"], b["wall"],
+                                              100.0 * (b["wall"] - a["wall"]) / a["wall"] if a["wall"] else 0.0,
+                                              a["peak_rss_mb"], b["peak_rss_mb"], sum(a["requests"].values()),
+                                              sum(b["requests"].values())))
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,80 +1,270 @@
 # -*- coding: utf-8 -*-
 import os
+import re
+import gzip
+import struct
 import simplejson as json
 import datetime
-from six.moves.urllib.parse import quote
-from dremio_client.error import DremioException
-
-
-def fetch(client, base):
+import itertools
+import time
+from six import string_types
+from dremio_client.model.endpoints import phase
+from .commit import commit
+from .output import PRINCIPAL_KINDS, open_output
+from .crawl import CatalogStore, crawl_containers, entity_path, iter_crawl, walk
+from .information_schema import sql_container_paths, sql_dataset_paths, with_fallback
+from .jsonstream import iter_entities
+from .pipeline import stream
+
+
+def fetch(client, base, jobs=1, store=None, lazy=False, enumerate_with="rest", out=lambda x: x):
+    """
+    resolve base and list the datasets below it
+
+    :param lazy: return a generator that crawls while it is consumed, in breadth first order, instead of a list
+    :param enumerate_with: rest to crawl the folders below base, sql to list the datasets with one
+        INFORMATION_SCHEMA query, crawling only if the query cannot be used
+    :param out: output function
+    :return: (dataset paths, base entity) or ([], None) if base is not a source or folder
+    """
+    store = store if store is not None else CatalogStore(client)
     dataset_paths = []
     parent = None
-    start = client.data
-    if base is not None:
-        for b in base:
-            start = start[b.replace('"', "").replace(" ", "_").replace("-", "_").replace("@", "").replace(".", "_")].get()
-    if start.meta.entityType == "source" or start.meta.entityType == "folder":
-        parent = client.simple().catalog_item(None, start.meta.path)
-        dataset_paths = recurse_child_pdss(client, parent["children"])
+    if base:
+        start = store.get(base)
+        if start["entityType"] == "source" or start["entityType"] == "folder":
+            parent = start
+            if enumerate_with == "sql":
+                dataset_paths = with_fallback(
+                    _remembered(store, sql_dataset_paths(client, [parent["path"]]), "DATASET"),
+                    lambda: iter_child_pdss(client, parent["children"], jobs, store),
+                    len(parent["children"]) > 0, out)
+                if not lazy:
+                    dataset_paths = list(dataset_paths)
+            elif lazy:
+                dataset_paths = iter_child_pdss(client, parent["children"], jobs, store)
+            else:
+                dataset_paths = recurse_child_pdss(client, parent["children"], jobs, store)
     return dataset_paths, parent
 
 
-def recurse_child_pdss(client, children):
-    dataset_paths = []
-    for child in children:
-        if child["type"] != "DATASET" and child["type"] != "CONTAINER":
+def fetch_bases(client, bases, jobs=1, store=None, enumerate_with="rest", summary=None, out=lambda x: x):
+    """
+    resolve several bases and list the datasets below each of them lazily, reading through one store
+
+    Bases that can not be read, or are not a source or folder, are reported and left out.
+
+    :param bases: list of paths
+    :param summary: optional bases.Summary recording the bases left out
+    :return: list of (dataset paths, source or folder entity)
+    """
+    store = store if store is not None else CatalogStore(client)
+    fetched = []
+    for base in bases:
+        try:
+            datasets, parent = fetch(client, base, jobs, store, lazy=True, enumerate_with=enumerate_with, out=out)
+        except Exception as e:  # NOQA
+            out("Unable to read base {}: {}".format("/".join(base), e))
+            if summary is not None:
+                summary.error(base, "unable to read it")
+            continue
+        if parent is None:
+            out("{} is not a source or folder, skipping it".format("/".join(base)))
+            if summary is not None:
+                summary.error(base, "not a source or folder")
             continue
+        fetched.append((datasets, parent))
+    return fetched
+
+
+def _remembered(store, paths, kind):
+    # what the query listed is known not to need a GET to tell its type, as if it came from a child listing
+    for path in paths:
+        store.remember([{"path": path, "type": kind}])
+        yield path
+
+
+def recurse_child_pdss(client, children, jobs=1, store=None):
+    listings = crawl_containers(client, children, jobs, store)
+    return list(walk(children, listings))
+
+
+def iter_child_pdss(client, children, jobs=1, store=None):
+    for child in iter_crawl(client, children, jobs, store):
         if child["type"] == "DATASET":
-            dataset_paths.append(child["path"])
-        else:
-            object = client.simple().catalog_item(None, child["path"])
-            d = recurse_child_pdss(client, object["children"])
-            dataset_paths.extend(d)
-    return dataset_paths
+            yield child["path"]
+
 
+def fetch_object_paths(client, base=None, baselen=0, jobs=1, store=None, lazy=False, enumerate_with="rest",
+                       out=lambda x: x):
+    """
+    list the spaces, folders and datasets below base, or below every space without a base
 
-def fetch_object_paths(client, base=None, baselen=0):
+    :param lazy: return a generator that crawls while it is consumed, in breadth first order, instead of a list
+    :param enumerate_with: rest to crawl the containers below base, sql to list them with one INFORMATION_SCHEMA
+        query for containers and one for datasets, crawling only if the queries cannot be used
+    :param out: output function
+    :return: list or generator of paths
+    """
+    store = store if store is not None else CatalogStore(client)
     object_paths = []
-    start = client.data
+    children = []
     if baselen > 0:
-        for b in base:
-            start = start[b.replace('"', "").replace(" ", "_").replace("-", "_").replace("@", "").replace(".", "_")].get()
-        if start.meta.entityType == "space" or start.meta.entityType == "folder":
-            parent = client.simple().catalog_item(None, start.meta.path)
-            if start.meta.entityType == "space":
+        parent = store.get(base)
+        if parent["entityType"] == "space" or parent["entityType"] == "folder":
+            if parent["entityType"] == "space":
                 object_paths.append([parent["name"]])
             else:
                 object_paths.append(parent["path"])
-            object_paths.extend(recurse_child_objects(client, parent["children"]))
+            children = parent["children"]
     else:
-        catalog = client.simple().catalog()
-        for entity in catalog["data"]:
-            if entity["type"] == "CONTAINER" and entity["containerType"] == "SPACE":
-                object_paths.append(entity["path"])
-                object = client.simple().catalog_item(None, entity["path"])
-                d = recurse_child_objects(client, object["children"])
-                object_paths.extend(d)
+        catalog = client.catalog()
+        children = [entity for entity in catalog["data"] if entity["type"] == "CONTAINER" and entity["containerType"] == "SPACE"]
+    if enumerate_with == "sql" and children:
+        paths = with_fallback(_sql_object_paths(client, object_paths, children, store),
+                              lambda: _iter_object_paths(client, [], children, jobs, store), True, out)
+        paths = _chain(object_paths, paths)
+        return paths if lazy else list(paths)
+    if lazy:
+        return _iter_object_paths(client, object_paths, children, jobs, store)
+    object_paths.extend(recurse_child_objects(client, children, jobs, store))
     return object_paths
 
 
-def recurse_child_objects(client, children):
-    object_paths = []
-    for child in children:
-        if child["type"] != "DATASET" and child["type"] != "CONTAINER":
-            continue
-        object_paths.append(child["path"])
-        if child["type"] == "CONTAINER":
-            object = client.simple().catalog_item(None, child["path"])
-            d = recurse_child_objects(client, object["children"])
-            object_paths.extend(d)
-    return object_paths
+def recurse_child_objects(client, children, jobs=1, store=None):
+    listings = crawl_containers(client, children, jobs, store)
+    return list(walk(children, listings, include_containers=True))
+
+
+def _sql_object_paths(client, object_paths, children, store):
+    # without a base the spaces themselves are listed too, with one they are in object_paths already
+    prefixes = object_paths or [child["path"] for child in children]
+    for path in sql_container_paths(client, prefixes):
+        if path not in object_paths:
+            yield path
+    for path in _remembered(store, sql_dataset_paths(client, prefixes), "DATASET"):
+        yield path
+
 
+def _chain(first, rest):
+    for path in first:
+        yield path
+    for path in rest:
+        yield path
 
-def build_acl_defs(acl_file):
-    acl_defs = json.load(acl_file)
+
+def _iter_object_paths(client, object_paths, children, jobs=1, store=None):
+    for path in object_paths:
+        yield path
+    # containers stay in the store until the consumer reads them with keep=False
+    for child in iter_crawl(client, children, jobs, store, keep_containers=True):
+        yield child["path"]
+
+
+def build_acl_defs(acl_file, out=lambda x: x):
+    # the entities are indexed as they are parsed, the document is never held as a whole
+    acl_defs = {"entities": iter_entities(acl_file)}
+    index = index_acl_defs(acl_defs, out)
+    acl_defs["entities"] = list(index.values())
     return acl_defs
 
 
+def acl_def_key(entity_path):
+    # spaces may be defined by name alone, everything else by its full path
+    if isinstance(entity_path, string_types):
+        return (entity_path,)
+    return tuple(entity_path)
+
+
+def object_key(db_object):
+    return (db_object["name"],) if db_object["entityType"] == "space" else tuple(db_object["path"])
+
+
+def canonical_acl(acl):
+    """
+    order insensitive form of an accessControlList
+
+    Principals are sorted by id and permissions become frozensets. The version key and empty principal lists are left
+    out, so two ACLs that grant the same permissions have the same canonical form. Each principal kind, users, groups
+    and roles, stays apart, a role and a group of the same name are different principals.
+
+    :param acl: accessControlList dict, may be None
+    :return: tuple of (principal kind, tuple of (id, frozenset of permissions)) pairs
+    """
+    if not acl:
+        return ()
+    return tuple((kind, tuple(sorted((entry["id"], frozenset(entry.get("permissions") or ())) for entry in acl[kind])))
+                 for kind in sorted(acl) if kind != "version" and acl[kind])
+
+
+def acl_fingerprint(acl):
+    """
+    what two ACLs are compared by, equal exactly when they grant the same permissions
+
+    This is the canonical form itself, not a hash of it: a hash collision would skip a change that is needed. Python
+    salts the hashes of strings per process, so neither this nor its hash is ever written out.
+
+    :param acl: accessControlList dict, may be None
+    :return: hashable canonical form, see canonical_acl
+    """
+    return canonical_acl(acl)
+
+
+def index_acl_defs(acl_defs, out=lambda x: x):
+    """
+    build a lookup of ACL definitions keyed by normalized entity path
+
+    When a path is defined more than once the last definition wins, as it did when definitions were scanned in order.
+    The fingerprint of each definition is computed once here and kept in acl_defs['fingerprints'] under the same key.
+    Definitions that grant the same share one fingerprint object.
+
+    :param acl_defs: parsed ACL definitions
+    :param out: output function
+    :return: dict of path tuple to ACL definition
+    """
+    index = {}
+    for acls in acl_defs['entities']:
+        key = acl_def_key(acls['entityPath'])
+        if key in index:
+            out("Duplicate ACL definition for {}, using the last one".format("/".join(key)))
+        index[key] = acls
+    acl_defs['index'] = index
+    shared = {}
+    fingerprints = {}
+    for key, acls in index.items():
+        fingerprint = acl_fingerprint(acls['accessControlList'])
+        fingerprints[key] = shared.setdefault(fingerprint, fingerprint)
+    acl_defs['fingerprints'] = fingerprints
+    return index
+
+
+def acl_index(acl_defs):
+    """the lookup of ACL definitions by path tuple, built by index_acl_defs on first use"""
+    if 'index' not in acl_defs:
+        index_acl_defs(acl_defs)
+    return acl_defs['index']
+
+
+def defined_acls(acl_defs):
+    """every accessControlList the definitions set, ACLs shared by several entities at least once"""
+    index = acl_index(acl_defs)
+    if hasattr(index, "acls"):
+        return index.acls()
+    return (acls['accessControlList'] for acls in index.values())
+
+
+def _acl_matches(acl_defs, key, acl):
+    # True if acl grants exactly what the definition for key grants
+    acl_index(acl_defs)
+    return acl_defs['fingerprints'][key] == acl_fingerprint(acl)
+
+
+def _default_fingerprint(default_acl):
+    if "fingerprint" not in default_acl:
+        default_acl["fingerprint"] = acl_fingerprint(default_acl["accessControlList"])
+    return default_acl["fingerprint"]
+
+
 def build_default_acl(group_on_acl_empty,user_on_acl_empty):
     acl = {"accessControlList": {}}
     if user_on_acl_empty:
@@ -96,299 +286,515 @@ def build_default_acl(group_on_acl_empty,user_on_acl_empty):
     return acl
 
 
-def submit(client, objs):
-    bad = []
-    for obj in objs:
-        try:
-            client.simple().update_catalog(quote(obj['id'], safe=''), obj)
-        except DremioException as e:
-            print(e)
-            bad.append(obj)
+def submit(client, objs, jobs=1, max_retries=5, out=lambda x: x, store=None, journal=None, deadline=None, writer=None, shard=None):
+    def committed(obj):
+        if journal is not None:
+            journal.committed(entity_path(obj), obj["id"])
+        if shard is not None:
+            shard.done(entity_path(obj))
+
+    on_commit = committed if journal is not None or shard is not None else None
+    if writer is not None:
+        # e.g. a grants.SqlWriter, which needs no full document to PUT
+        bad = writer.commit(objs, jobs, max_retries, out, on_commit, deadline)
+    else:
+        bad = commit(client, objs, jobs, max_retries, out, prepare=store.prepare if store is not None else None,
+                     on_commit=on_commit, deadline=deadline)
+    if journal is not None and deadline is not None and time.time() >= deadline:
+        # the run stops at its deadline, get what it did on disk before anything else can go wrong
+        journal.checkpoint()
+    if len(bad) > 0:
+        out("Failed to commit the following {} items:\n{}".format(
+            len(bad),
+            "\n".join('.'.join('"{}"'.format(j) for j in i["path"]) for i in bad)))
+    else:
+        out("Commit complete")
     return bad
 
 
-def delete_pds_acls(client, pdss_with_acls, out=lambda x: x):
+def delete_pds_acls(client, pdss_with_acls, out=lambda x: x, jobs=1, max_retries=5, writer=None):
     dirty_datasets = []
     for pds in pdss_with_acls:
         pds['accessControlList'] = {}
         dirty_datasets.append(pds)
         out("Deleted ACLs for PDS {}".format("/".join(pds["path"])))
 
-    last_run = len(dirty_datasets) + 1
-    bad = dirty_datasets
-    while len(bad) < last_run:
-        last_run = len(bad)
-        bad = submit(client, bad)
-    if len(bad) > 0:
-        out("Failed to commit the following {} items:\n{}".format(
-            len(bad),
-            "\n".join('.'.join('"{}"'.format(j) for j in i["path"]) for i in bad)))
-    else:
-        out("Commit complete")
+    submit(client, dirty_datasets, jobs, max_retries, out, writer=writer)
 
 
 def update_object_acl(db_object, acl_defs, default_acl, out=lambda x: x):
-    dirty_objects = []
-    has_acl = False
-    for acls in acl_defs['entities']:
-        # check if an object has an entry in the ACLs set. Object can be PDS or database
-        if acls['entityPath'] == (db_object["name"] if db_object["entityType"] == "space" else db_object["path"]) : #db_object["path"]:
-            has_acl = True;
-            # check if any ACLs are different
-            if acls['accessControlList'] != db_object['accessControlList']:
-                # they are different so update the object and add it to the set to be committed
-                db_object["accessControlList"] = acls['accessControlList']
-                dirty_objects.append(db_object)
-                out("Updated ACLs for {}".format(db_object["name"] if db_object["entityType"] == "space" else "/".join(db_object["path"])))
-    # if no ACLs found in acl_defs for object
-    if has_acl == False:
+    reason = _update_object_acl(db_object, acl_defs, default_acl, out)
+    return [db_object] if reason else []
+
+
+def _update_object_acl(db_object, acl_defs, default_acl, out=lambda x: x):
+    # returns the reason the object's ACL was changed, or None if it is already correct
+    name = db_object["name"] if db_object["entityType"] == "space" else "/".join(db_object["path"])
+    # check if an object has an entry in the ACLs set. Object can be PDS or database
+    key = object_key(db_object)
+    acls = acl_index(acl_defs).get(key)
+    if acls is not None:
+        # check if any ACLs are different
+        if not _acl_matches(acl_defs, key, db_object['accessControlList']):
+            # they are different so update the object and add it to the set to be committed
+            db_object["accessControlList"] = acls['accessControlList']
+            out("Updated ACLs for {}".format(name))
+            return "mismatch"
+    else:
+        # no ACLs found in acl_defs for object
         # check if the current ACLs for the object are not empty and contain anything other than the default acl
-        if db_object["accessControlList"] and ("users" in db_object["accessControlList"] or "groups" in db_object["accessControlList"]):
-            if "version" in db_object["accessControlList"]:
-                del db_object["accessControlList"]["version"]
-            if db_object["accessControlList"] != default_acl["accessControlList"]:
+        if db_object["accessControlList"] and any(kind in db_object["accessControlList"] for kind in PRINCIPAL_KINDS):
+            if acl_fingerprint(db_object["accessControlList"]) != _default_fingerprint(default_acl):
                 # reset the ACLS for the object to default ACL and add the object to the set to be committed
                 db_object["accessControlList"] = default_acl["accessControlList"]
-                dirty_objects.append(db_object)
-                out("Revoked ACLs for {}".format(db_object["name"] if db_object["entityType"] == "space" else "/".join(db_object["path"])))
+                out("Revoked ACLs for {}".format(name))
+                return "revoke"
         else:
             # the ACLs for the object are empty. If the default ACL is not empty, then need to set to the default ACL
             if default_acl["accessControlList"]:
                 db_object["accessControlList"] = default_acl["accessControlList"]
-                dirty_objects.append(db_object)
-                out("ACLs for {} are empty, setting to default ACL".format(db_object["name"] if db_object["entityType"] == "space" else "/".join(db_object["path"])))
-    return dirty_objects
+                out("ACLs for {} are empty, setting to default ACL".format(name))
+                return "default"
+    return None
+
+
+def _past(deadline, out):
+    if deadline is not None and time.time() >= deadline:
+        out("Deadline reached, no more objects will be read")
+        return True
+    return False
+
+
+def in_phase(name, worker):
+    """wrap worker so that the time it runs is counted as phase name in the installed metrics"""
+    def run(item):
+        with phase(name):
+            return worker(item)
+    return run
+
+
+def _pending(paths, out, journal=None, deadline=None, shard=None):
+    # the paths still to be read this run
+    for path in paths:
+        if _past(deadline, out):
+            return
+        if journal is not None and journal.is_done(path):
+            if shard is not None:
+                shard.done(path)
+            continue
+        yield path
 
 
-def update_acl(client, acl_defs, datasets, source_folder, source_only, default_acl, out=lambda x: x):
-    dirty_datasets = []
+def acl_changes(client, acl_defs, datasets, source_folder, source_only, default_acl, out=lambda x: x, store=None, journal=None, deadline=None, jobs=1, queue_size=1000):
+    """
+    compare the databases and PDSs below source_folder with the ACL definitions
+
+    With a journal, objects a previous run found correct or committed are skipped and every comparison is recorded.
+    With a deadline, no new objects are read once time.time() passes it. PDSs are read by `jobs` workers while datasets
+    is still being consumed, with at most `queue_size` paths and results waiting between the stages.
+
+    :return: generator of (object, reason) for every object whose ACL was changed to match the definitions
+    """
+    return bases_acl_changes(client, acl_defs, [(datasets, source_folder)], source_only, default_acl, out, store, journal,
+                             deadline, jobs, queue_size)
+
+
+def bases_acl_changes(client, acl_defs, fetched, source_only, default_acl, out=lambda x: x, store=None, journal=None, deadline=None, jobs=1, queue_size=1000, shard=None, summary=None):
+    """
+    acl_changes over several bases, with one pool of `jobs` workers reading the PDSs of all of them
+
+    The databases or folders of every base are compared first. The PDSs of all bases then go through one stream, so
+    the workers carry on with the next base while the last PDSs of one are still being read.
+
+    :param fetched: list of (dataset paths, source or folder entity), one per base, see fetch_bases
+    :param shard: optional shard.HashShard or shard.QueueShard, only the objects it owns or selects are compared.
+        PDSs found correct are marked done in it here, the caller marks those yielded done once it committed them
+    :param summary: optional bases.Summary counting the PDSs compared below each base
+    :return: generator of (object, reason) for every object whose ACL was changed to match the definitions
+    """
+    store = store if store is not None else CatalogStore(client)
+    for _, source_folder in fetched:
+        for change in _container_changes(acl_defs, source_folder, default_acl, out, store, journal, shard):
+            yield change
+    if not source_only: #process PDSs
+        def check(dataset_path):
+            try:
+                out("Processing {}".format("/".join(dataset_path)))
+                pre_time = datetime.datetime.now()
+                pds = store.get(dataset_path, keep=False)
+                post_time = datetime.datetime.now()
+                difference = post_time - pre_time
+                out("GET /catalog/by-path/ took {} for {}".format(difference, "/".join(pds["path"])))
+                reason = _update_object_acl(pds, acl_defs, default_acl, out)
+            except Exception as e:
+                out("Unable to process PDS {}: {}".format("/".join(dataset_path), e))
+                return None
+            if journal is not None:
+                journal.checked(dataset_path, pds["id"], reason is not None)
+            if not reason and shard is not None:
+                shard.done(dataset_path)
+            return (pds, reason) if reason else None
+
+        datasets = selected(itertools.chain.from_iterable(paths for paths, _ in fetched), shard, summary)
+        if shard is not None and shard.prefetch is not None:
+            queue_size = min(queue_size, shard.prefetch)
+        for change in stream(_pending(datasets, out, journal, deadline, shard), in_phase("compare", check), jobs,
+                             queue_size):
+            yield change
+
+
+def selected(paths, shard=None, summary=None):
+    """the paths shard selects, all of them without a shard, counted as datasets by summary if there is one"""
+    if shard is not None:
+        paths = shard.select(paths)
+    if summary is not None:
+        paths = summary.counted(paths)
+    return paths
+
+
+def _container_changes(acl_defs, source_folder, default_acl, out, store, journal, shard=None):
+    # the databases of a source, or the folder itself
     if source_folder["entityType"] == "source":
         for child in source_folder["children"]:
             if child["type"] == "CONTAINER": # we have a database
+                if journal is not None and journal.is_done(child["path"]):
+                    continue
+                if shard is not None and not shard.owns(child["path"]):
+                    continue
                 try:
                     out("Processing {}".format("/".join(child["path"])))
-                    db_object = client.simple().catalog_item(None, child["path"])
-                    d = update_object_acl(db_object, acl_defs, default_acl, out)
-                    dirty_datasets.extend(d)
+                    db_object = store.get(child["path"])
+                    reason = _update_object_acl(db_object, acl_defs, default_acl, out)
                 except Exception as e:
-                    print(e)
-                    out("Unable to process database {}".format("/".join(child["path"])))
-    elif source_folder["entityType"] == "folder":
+                    out("Unable to process database {}: {}".format("/".join(child["path"]), e))
+                    continue
+                if journal is not None:
+                    journal.checked(child["path"], db_object["id"], reason is not None)
+                if reason:
+                    yield db_object, reason
+    elif source_folder["entityType"] == "folder" and not (journal is not None and journal.is_done(source_folder["path"])) \
+            and (shard is None or shard.owns(source_folder["path"])):
         try:
             out("Processing {}".format("/".join(source_folder["path"])))
-            db_object = client.simple().catalog_item(None, source_folder["path"])
-            d = update_object_acl(db_object, acl_defs, default_acl, out)
-            dirty_datasets.extend(d)
+            reason = _update_object_acl(source_folder, acl_defs, default_acl, out)
+            if journal is not None:
+                journal.checked(source_folder["path"], source_folder["id"], reason is not None)
         except Exception as e:
-            print(e)
-            out("Unable to process database {}".format("/".join(source_folder["path"])))
-    if not source_only: #process PDSs
-        for dataset_path in datasets:
-            try:
-                out("Processing {}".format("/".join(dataset_path)))
-                pre_time = datetime.datetime.now()
-                pds = client.simple().catalog_item(None, dataset_path)
-                post_time = datetime.datetime.now()
-                difference = post_time - pre_time
-                out("GET /catalog/by-path/ took {} for {}".format(difference, "/".join(pds["path"])))
-                d = update_object_acl(pds, acl_defs, default_acl, out)
-                dirty_datasets.extend(d)
-            except Exception as  e:
-                print(e)
-                out("Unable to process PDS {}".format("/".join(dataset_path)))
-    last_run = len(dirty_datasets) + 1
-    bad = dirty_datasets
-    while len(bad) < last_run:
-        last_run = len(bad)
-        bad = submit(client, bad)
-    if len(bad) > 0:
-        out("Failed to commit the following {} items:\n{}".format(
-            len(bad),
-            "\n".join('.'.join('"{}"'.format(j) for j in i["path"]) for i in bad)))
-    else:
-        out("Commit complete")
+            out("Unable to process database {}: {}".format("/".join(source_folder["path"]), e))
+            reason = None
+        if reason:
+            yield source_folder, reason
+
+
+def update_acl(client, acl_defs, datasets, source_folder, source_only, default_acl, out=lambda x: x, jobs=1, max_retries=5, store=None, journal=None, deadline=None, writer=None):
+    # changes are committed while later objects are still being read
+    return update_bases_acl(client, acl_defs, [(datasets, source_folder)], source_only, default_acl, out, jobs, max_retries,
+                            store, journal, deadline, writer)
+
+
+def update_bases_acl(client, acl_defs, fetched, source_only, default_acl, out=lambda x: x, jobs=1, max_retries=5, store=None, journal=None, deadline=None, writer=None, summary=None, shard=None):
+    """
+    update_acl over several bases, reading and committing with one pool each for all of them
+
+    :param fetched: list of (dataset paths, source or folder entity), one per base, see fetch_bases
+    :param summary: optional bases.Summary counting the PDSs compared and the objects changed and failed below each base
+    :param shard: optional shard.HashShard or shard.QueueShard, only the objects it owns or selects are updated
+    :return: list of objects that could not be committed
+    """
+    changes = bases_acl_changes(client, acl_defs, fetched, source_only, default_acl, out, store, journal, deadline, jobs,
+                                shard=shard, summary=summary)
+    if summary is not None:
+        changes = summary.changes(changes)
+    bad = submit(client, (obj for obj, _ in changes), jobs, max_retries, out, store, journal, deadline, writer, shard)
+    if summary is not None:
+        for obj in bad:
+            summary.add(entity_path(obj), "failed")
+    return bad
 
 
-def update_space_acl(client, acl_defs, datasets, default_acl, out=lambda x: x):
-    dirty_datasets = []
-    for dataset_path in datasets:
+def space_acl_changes(client, acl_defs, datasets, default_acl, out=lambda x: x, store=None, journal=None, deadline=None, jobs=1, queue_size=1000):
+    """
+    compare the spaces, folders and VDSs at the given paths with the ACL definitions
+
+    Journal, deadline, jobs and queue_size behave as for acl_changes.
+
+    :return: generator of (object, reason) for every object whose ACL was changed to match the definitions
+    """
+    store = store if store is not None else CatalogStore(client)
+
+    def check(dataset_path):
         try:
             out("Processing {}".format("/".join(dataset_path)))
             pre_time = datetime.datetime.now()
-            obj = client.simple().catalog_item(None, dataset_path)
+            obj = store.get(dataset_path, keep=False)
             post_time = datetime.datetime.now()
             difference = post_time - pre_time
             out("GET /catalog/by-path/ took {} for {}".format(difference, (obj["name"] if obj["entityType"] == "space" else "/".join(obj["path"]))))
-            d = update_object_acl(obj, acl_defs, default_acl, out)
-            dirty_datasets.extend(d)
-        except Exception as  e:
-            print(e)
-            out("Unable to process {}".format("/".join(dataset_path)))
-    last_run = len(dirty_datasets) + 1
-    bad = dirty_datasets
-    while len(bad) < last_run:
-        last_run = len(bad)
-        bad = submit(client, bad)
-    if len(bad) > 0:
-        out("Failed to commit the following {} items:\n{}".format(
-            len(bad),
-            "\n".join('.'.join('"{}"'.format(j) for j in i["path"]) for i in bad)))
-    else:
-        out("Commit complete")
+            reason = _update_object_acl(obj, acl_defs, default_acl, out)
+        except Exception as e:
+            out("Unable to process {}: {}".format("/".join(dataset_path), e))
+            return None
+        if journal is not None:
+            journal.checked(dataset_path, obj["id"], reason is not None)
+        return (obj, reason) if reason else None
 
+    for change in stream(_pending(datasets, out, journal, deadline), in_phase("compare", check), jobs, queue_size):
+        yield change
 
-def update_acls_to_folder(client, datasets, source_folder, default_acl, del_pds_acls, out=lambda x: x):
-    dirty_folders = []
-    pdss_with_acls = []
-    aclSuperset = {}
-    for dataset_path in datasets:
+
+def update_space_acl(client, acl_defs, datasets, default_acl, out=lambda x: x, jobs=1, max_retries=5, store=None, journal=None, deadline=None, writer=None):
+    changes = space_acl_changes(client, acl_defs, datasets, default_acl, out, store, journal, deadline, jobs)
+    submit(client, (obj for obj, _ in changes), jobs, max_retries, out, store, journal, deadline, writer)
+
+
+def merge_acl(superset, acl):
+    """
+    fold an accessControlList into a superset
+
+    :param superset: dict of principal kind to dict of principal id to set of permissions, updated in place
+    :param acl: accessControlList dict
+    """
+    for kind, entries in acl.items():
+        if kind == "version":
+            continue
+        principals = superset.setdefault(kind, {})
+        for entry in entries:
+            principals.setdefault(entry["id"], set()).update(entry["permissions"])
+
+
+def superset_acl(superset):
+    return dict((kind, [{"id": pid, "permissions": sorted(perms)} for pid, perms in principals.items()])
+                for kind, principals in superset.items())
+
+
+def _set_superset(folder, superset, default_acl, out=lambda x: x):
+    # returns True if the folder's ACL was changed and it needs committing
+    name = "/".join(folder["path"])
+    if len(superset) > 0:
+        folder["accessControlList"] = superset_acl(superset)
+        out("Updated ACL superset for Folder {}".format(name))
+        return True
+    # if the ACLs for the superset are empty and if the default ACL is not empty, then need to set to the default ACL into the source folder
+    if default_acl["accessControlList"]:
+        folder["accessControlList"] = default_acl["accessControlList"]
+        out("ACL superset for Folder {} is empty, setting to default ACL".format(name))
+        return True
+    out("ACL superset for Folder {} is empty and no default ACL defined. Not updating.".format(name))
+    return False
+
+
+def read_pds(store, out):
+    """
+    worker reading a PDS through store for pipeline.stream
+
+    :return: function of a dataset path returning its entity, or None if it can not be read
+    """
+    def read(dataset_path):
         try:
             out("Processing {}".format("/".join(dataset_path)))
             pre_time = datetime.datetime.now()
-            pds = client.simple().catalog_item(None, dataset_path)
+            pds = store.get(dataset_path, keep=False)
             post_time = datetime.datetime.now()
             difference = post_time - pre_time
             out("GET /catalog/by-path/ took {} for {}".format(difference, "/".join(pds["path"])))
-            if pds['accessControlList']:
-                pdss_with_acls.append(pds)
-                # look through each accessControlList entry in the PDS and see if the user/group exists in aclSuperset
-                for aclEntry in pds['accessControlList']:
-                    if aclEntry not in aclSuperset:
-                        aclSuperset[aclEntry] = []
-                        # user/group entry exists in aclSuperset, now lets look at ACLs for each specific user and group and compare to what's in the superset
-                    for pdsAclEntry in pds['accessControlList'][aclEntry]:
-                        isAclIdInSuperset = False
-                        for supersetAclEntry in aclSuperset[aclEntry]:
-                            if pdsAclEntry['id'] == supersetAclEntry['id']:
-                                isAclIdInSuperset = True
-                                supersetPermissions = list(set(pdsAclEntry['permissions']) | set(supersetAclEntry['permissions']))
-                                supersetAclEntry['permissions'] = supersetPermissions
-                        if not isAclIdInSuperset:
-                            aclSuperset[aclEntry].append(pdsAclEntry)
-        except Exception as  e:
-            print(e)
-            out("Unable to process PDS {}".format("/".join(dataset_path)))
-    out("Superset ACLs: {}".format(aclSuperset))
-    # if the ACLs for the superset are empty and if the default ACL is not empty, then need to set to the default ACL into the source folder
-    if len(aclSuperset) > 0:
-        source_folder["accessControlList"] = aclSuperset
-        dirty_folders.append(source_folder)
-        out("Updated ACL superset for Folder {}".format("/".join(source_folder["path"])))
-    else:
-        if default_acl["accessControlList"]:
-            source_folder["accessControlList"] = default_acl["accessControlList"]
-            dirty_folders.append(source_folder)
-            out("ACL superset for Folder {} is empty, setting to default ACL".format("/".join(source_folder["path"])))
-        else:
-            out("ACL superset for Folder {} is empty and no default ACL defined. Not updating.".format("/".join(source_folder["path"])))
+            return pds
+        except Exception as e:
+            out("Unable to process PDS {}: {}".format("/".join(dataset_path), e))
+            return None
+    return read
 
-    bad = submit(client, dirty_folders)
-    if len(bad) > 0:
-        out("Failed to commit the following {} items:\n{}".format(
-            len(bad),
-            "\n".join('.'.join('"{}"'.format(j) for j in i["path"]) for i in bad)))
-    else:
-        out("Commit complete")
-        if del_pds_acls:
-            out("Deleting PDS ACLs")
-            delete_pds_acls(client, pdss_with_acls, out)
 
+def update_acls_to_folder(client, datasets, source_folder, default_acl, del_pds_acls, out=lambda x: x, jobs=1, max_retries=5, store=None, writer=None):
+    store = store if store is not None else CatalogStore(client)
+    pdss_with_acls = []
+    aclSuperset = {}
+    for pds in stream(datasets, read_pds(store, out), jobs):
+        if pds['accessControlList']:
+            pdss_with_acls.append(pds)
+            merge_acl(aclSuperset, pds['accessControlList'])
+    out("Superset ACLs: {}".format(superset_acl(aclSuperset)))
+    dirty_folders = [source_folder] if _set_superset(source_folder, aclSuperset, default_acl, out) else []
+
+    bad = submit(client, dirty_folders, jobs, max_retries, out, writer=writer)
+    if len(bad) == 0 and del_pds_acls:
+        out("Deleting PDS ACLs")
+        delete_pds_acls(client, pdss_with_acls, out, jobs, max_retries, writer)
+
+
+def rollup_acls_to_folders(client, source_folder, default_acl, del_pds_acls, out=lambda x: x, jobs=1, max_retries=5, store=None, writer=None):
+    """
+    set the ACL of source_folder and of every folder below it to the superset of the PDS ACLs beneath it
+
+    The tree is crawled and each PDS read once. Each PDS ACL is folded into the superset of every one of its ancestors
+    down from source_folder, and all folders are committed together.
+
+    :param source_folder: source or folder entity to start from
+    :return: list of folders that could not be committed
+    """
+    store = store if store is not None else CatalogStore(client)
+    base = tuple(entity_path(source_folder))
+    supersets = {base: {}}
+    folders = []
+    pdss_with_acls = []
 
-def report_acl(client, base, acl_defs, datasets, report_path, default_acl, out=lambda x: x):
+    def datasets():
+        # containers stay in the store until they are committed
+        for child in iter_crawl(client, source_folder["children"], jobs, store, keep_containers=True):
+            if child["type"] == "CONTAINER":
+                folders.append(child["path"])
+                supersets[tuple(child["path"])] = {}
+            else:
+                yield child["path"]
+
+    for pds in stream(datasets(), read_pds(store, out), jobs):
+        if pds['accessControlList']:
+            pdss_with_acls.append(pds)
+            for depth in range(len(base), len(pds["path"])):
+                merge_acl(supersets[tuple(pds["path"][:depth])], pds['accessControlList'])
+
+    def dirty_folders():
+        if _set_superset(source_folder, supersets[base], default_acl, out):
+            yield source_folder
+        for path in folders:
+            folder = store.get(path, keep=False)
+            if _set_superset(folder, supersets[tuple(path)], default_acl, out):
+                yield folder
+
+    out("Rolling PDS ACLs up into {} folders".format(len(folders) + 1))
+    bad = submit(client, dirty_folders(), jobs, max_retries, out, writer=writer)
+    if len(bad) == 0 and del_pds_acls:
+        out("Deleting PDS ACLs")
+        delete_pds_acls(client, pdss_with_acls, out, jobs, max_retries, writer)
+    return bad
+
+
+def report_acl(client, base, acl_defs, datasets, report_path, default_acl, out=lambda x: x, store=None, fmt="json", summary=None, on_done=None):
+    """
+    write a report of the PDSs whose ACL does not match the definitions
+
+    :param base: path the report file is named after
+    :param summary: optional bases.Summary counting the PDSs that need updating below each base as changed
+    :param on_done: optional function called with the path of each PDS once it is compared and its record, if it
+        needs one, is written, e.g. shard.QueueShard.done
+    """
+    store = store if store is not None else CatalogStore(client)
     try:
         os.makedirs(report_path)
         out("{} created".format(report_path))
     except:
         pass
     filename = "acl_report_" + "-".join(base) + "_" + datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
-    jf = os.path.join(report_path, filename) + ".json"
-    report_file = open(jf, 'a')
+    report_file = open_output(os.path.join(report_path, filename), fmt, "report")
     count = 0
     for dataset_path in datasets:
-        has_acl = False;
         try:
             out("Processing {}".format("/".join(dataset_path)))
             pre_time = datetime.datetime.now()
-            pds = client.simple().catalog_item(None, dataset_path)
+            pds = store.get(dataset_path, keep=False)
             post_time = datetime.datetime.now()
             difference = post_time - pre_time
             out("GET /catalog/by-path/ took {} for {}".format(difference, "/".join(pds["path"])))
-            for acls in acl_defs['entities']:
-                # check if a dataset has an entry in the ACLs set.
-                if acls['entityPath'] == pds["path"]:
-                    has_acl = True;
-                    # check if any ACLs are different
-                    if acls['accessControlList'] != pds['accessControlList']:
-                        # they are different so update the dataset and add it to the set to be committed
-                        out("ACLs mismatch for {}".format("/".join(pds["path"])))
-                        acl_dict = {'id': pds["id"], 'path': pds["path"], 'aclReport': "ACLs mismatch for {}".format("/".join(pds["path"]))}
-                        report_file.write(json.dumps(acl_dict) + '\n')
-                        count += 1
-            # if no ACLs found in acl_defs for dataset
-            if has_acl == False:
+            # check if a dataset has an entry in the ACLs set.
+            key = object_key(pds)
+            acls = acl_index(acl_defs).get(key)
+            if acls is not None:
+                # check if any ACLs are different
+                if not _acl_matches(acl_defs, key, pds['accessControlList']):
+                    # they are different so update the dataset and add it to the set to be committed
+                    out("ACLs mismatch for {}".format("/".join(pds["path"])))
+                    acl_dict = {'id': pds["id"], 'path': pds["path"], 'aclReport': "ACLs mismatch for {}".format("/".join(pds["path"]))}
+                    report_file.write(acl_dict)
+                    count += 1
+                    if summary is not None:
+                        summary.add(pds["path"], "changed")
+            else:
+                # no ACLs found in acl_defs for dataset
                 # check if the current ACLs for the dataset are not empty and contain anything other than the default acl
                 if pds["accessControlList"]:
-                    if pds["accessControlList"] != default_acl["accessControlList"]:
+                    if acl_fingerprint(pds["accessControlList"]) != _default_fingerprint(default_acl):
                         out("ACLs must be revoked for {}".format("/".join(pds["path"])))
                         acl_dict = {'id': pds["id"], 'path': pds["path"],
                                     'aclReport': "ACLs must be revoked for {}".format("/".join(pds["path"]))}
-                        report_file.write(json.dumps(acl_dict) + '\n')
+                        report_file.write(acl_dict)
                         count += 1
+                        if summary is not None:
+                            summary.add(pds["path"], "changed")
                 else:
                     # the ACLs for the PDS are empty. If the default ACL is not empty, then need to set to the default ACL
                     if default_acl["accessControlList"]:
                         out("ACLs for PDS {} are empty, must set to default ACL".format("/".join(pds["path"])))
                         acl_dict = {'id': pds["id"], 'path': pds["path"],
                                     'aclReport': "ACLs for PDS {} are empty, must set to default ACL".format("/".join(pds["path"]))}
-                        report_file.write(json.dumps(acl_dict) + '\n')
+                        report_file.write(acl_dict)
                         count += 1
+                        if summary is not None:
+                            summary.add(pds["path"], "changed")
         except:
             out("Unable to process PDS {}".format("/".join(dataset_path)))
             acl_dict = {'id': "", 'path': pds["path"],
                         'aclReport': "Unable to process PDS {}".format("/".join(dataset_path))}
-            report_file.write(json.dumps(acl_dict) + '\n')
+            report_file.write(acl_dict)
+        else:
+            if on_done is not None:
+                on_done(dataset_path)
     report_file.close()
     out("Report complete. {} PDSs need updating.".format(count))
+    return report_file.filename
+
 
+def dump_acl(client, datasets, dump_path, base, out=lambda x: x, store=None, fmt="json", on_done=None):
+    """
+    write the ACL of every PDS in datasets to a dump file
 
-def dump_acl(client, datasets, dump_path, base, out=lambda x: x):
+    :param on_done: optional function called with the path of each PDS once its record is written, e.g.
+        shard.QueueShard.done
+    :return: name of the dump file
+    """
+    store = store if store is not None else CatalogStore(client)
     try:
         os.makedirs(dump_path)
         out("{} created".format(dump_path))
     except:
         pass
     filename = "acl_dump_" + "-".join(base) + "_" + datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
-    jf = os.path.join(dump_path, filename) + ".json"
-    acl_file = open(jf, 'a')
+    acl_file = open_output(os.path.join(dump_path, filename), fmt, "dump")
     for dataset_path in datasets:
         try:
             out("Processing {}".format("/".join(dataset_path)))
             pre_time = datetime.datetime.now()
-            pds = client.simple().catalog_item(None, dataset_path)
+            pds = store.get(dataset_path, keep=False)
             post_time = datetime.datetime.now()
             difference = post_time - pre_time
             out("GET /catalog/by-path/ took {} for {}".format(difference, "/".join(pds["path"])))
             acl_dict = {'id': pds["id"], 'path': pds["path"], 'accessControlList' : pds["accessControlList"]}
-            acl_file.write(json.dumps(acl_dict) + '\n')
         except:
             out("Unable to process PDS {}".format("/".join(dataset_path)))
+            continue
+        # outside the try, a record the output can not hold stops the dump instead of being left out
+        acl_file.write(acl_dict)
+        if on_done is not None:
+            on_done(dataset_path)
     acl_file.close()
-    out("Dump complete. See file {} for details.".format(jf))
+    out("Dump complete. See file {} for details.".format(acl_file.filename))
+    return acl_file.filename
 
 
-def dump_space_acl(client, objects, dump_path, base, out=lambda x: x, include_vds=False):
+def dump_space_acl(client, objects, dump_path, base, out=lambda x: x, include_vds=False, store=None, fmt="json"):
+    store = store if store is not None else CatalogStore(client)
     try:
         os.makedirs(dump_path)
         out("{} created".format(dump_path))
     except:
         pass
     filename = "space_acl_dump_" + "-".join(base) + "_" + datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
-    jf = os.path.join(dump_path, filename) + ".json"
-    acl_file = open(jf, 'a')
+    acl_file = open_output(os.path.join(dump_path, filename), fmt, "space_dump")
     for object_path in objects:
+        # the child listing already told us this is a dataset, don't fetch it only to throw it away
+        if not include_vds and store.is_dataset(object_path, keep=False):
+            continue
         try:
             #pre_time = datetime.datetime.now()
-            obj = client.simple().catalog_item(None, object_path)
+            obj = store.get(object_path, keep=False)
             #post_time = datetime.datetime.now()
             #difference = post_time - pre_time
             #out("GET /catalog/by-path/ took {} for {}".format(difference, "/".join(obj["path"])))
@@ -396,9 +802,64 @@ def dump_space_acl(client, objects, dump_path, base, out=lambda x: x, include_vd
                 continue
             out("Processing {}".format("/".join(object_path)))
             acl_dict = {'id': obj["id"], 'path': [obj["name"]] if obj["entityType"] == 'space' else obj["path"], 'entityType': obj["entityType"], 'accessControlList': obj["accessControlList"]}
-            acl_file.write(json.dumps(acl_dict) + '\n')
         except Exception as e:
             out(e)
             out("Unable to process {}".format("/".join(object_path)))
+            continue
+        acl_file.write(acl_dict)
     acl_file.close()
-    out("Dump complete. See file {} for details.".format(jf))
+    out("Dump complete. See file {} for details.".format(acl_file.filename))
+
+
+_ID = re.compile(br'"id"\s*:\s*"([^"]*)"')
+
+
+def dump_raw(client, datasets, dump_path, base, out=lambda x: x, jobs=1, compress=False, length_prefixed=False):
+    """
+    back up catalog responses byte for byte
+
+    Response bodies are written as received, without decoding them. With JSONL framing line breaks are dropped from
+    each body, which only removes whitespace between JSON tokens. With length prefixed framing each body is preceded
+    by its length as a 4 byte big endian integer. A JSONL index next to the dump gives the path, id, offset and length
+    of every record, offsets are into the uncompressed stream. The id is the first "id" in the body, which is the
+    entity's own id in catalog responses.
+
+    :param compress: gzip the dump
+    :param length_prefixed: use length prefixed framing instead of JSONL
+    """
+    try:
+        os.makedirs(dump_path)
+        out("{} created".format(dump_path))
+    except:
+        pass
+    filename = os.path.join(dump_path, "acl_raw_" + "-".join(base) + "_" + datetime.datetime.now().strftime("%Y%m%d-%H%M%S"))
+    filename += (".bin" if length_prefixed else ".jsonl") + (".gz" if compress else "")
+    raw_file = gzip.open(filename, "wb") if compress else open(filename, "wb")
+    index_file = open(filename + ".idx", "w")
+
+    def read(dataset_path):
+        try:
+            return dataset_path, client.catalog_item_raw(None, dataset_path)
+        except Exception as e:
+            out(e)
+            out("Unable to process PDS {}".format("/".join(dataset_path)))
+            return None
+
+    offset = 0
+    count = 0
+    try:
+        for dataset_path, body in stream(datasets, read, jobs):
+            if length_prefixed:
+                record = struct.pack(">I", len(body)) + body
+            else:
+                record = body.replace(b"\r", b"").replace(b"\n", b"") + b"\n"
+            raw_file.write(record)
+            match = _ID.search(body)
+            index_file.write(json.dumps({"path": dataset_path, "id": match.group(1).decode("utf-8") if match else None,
+                                         "offset": offset, "length": len(record)}) + "\n")
+            offset += len(record)
+            count += 1
+    finally:
+        raw_file.close()
+        index_file.close()
+    out("Dump complete. {} PDSs written to {}".format(count, filename))
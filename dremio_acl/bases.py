@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+import shlex
+import threading
+
+import six
+
+from .crawl import entity_path
+
+# what is counted per base, and how the report names it
+COUNTS = (("datasets", "datasets"), ("changed", "changed"), ("failed", "failed to commit"))
+
+
+def parse_base(line):
+    """
+    path of a base written as on the command line: components separated by spaces, quoted if they contain spaces
+
+    :param line: e.g. MYSOURCE "my db"
+    :return: list of path components, empty for a blank or comment line
+    """
+    if six.PY2 and isinstance(line, six.text_type):
+        # shlex in python 2 only splits byte strings
+        return [p.decode("utf-8") for p in shlex.split(line.encode("utf-8"), comments=True)]
+    return shlex.split(line, comments=True)
+
+
+def read_bases(bases_file):
+    """
+    bases listed in a file, one per line as parse_base reads them. Blank lines and # comments are skipped
+
+    :param bases_file: open file
+    :return: list of paths
+    """
+    return [base for base in (parse_base(line) for line in bases_file) if base]
+
+
+def label(bases):
+    """name for output files of a run over bases"""
+    if len(bases) == 1:
+        return list(bases[0])
+    return [bases[0][0], "and", str(len(bases) - 1), "more"]
+
+
+class Summary(object):
+    def __init__(self, bases, counts=COUNTS):
+        """
+        Per base counts of a run over several bases, for the combined report at its end
+
+        :param bases: list of paths
+        :param counts: (name, description) of what is counted, see COUNTS
+        """
+        self.bases = [list(base) for base in bases]
+        self._names = counts
+        self._counts = dict((tuple(base), dict((name, 0) for name, _ in counts)) for base in self.bases)
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def base_of(self, path):
+        """the longest base path is below, None if it is below none of them"""
+        found = None
+        for base in self.bases:
+            if list(path[:len(base)]) == base and (found is None or len(base) > len(found)):
+                found = base
+        return found
+
+    def add(self, path, name, count=1):
+        base = self.base_of(path)
+        if base is None:
+            return
+        with self._lock:
+            self._counts[tuple(base)][name] += count
+
+    def counted(self, paths, name="datasets"):
+        """pass paths through, counting them against their base"""
+        for path in paths:
+            self.add(path, name)
+            yield path
+
+    def changes(self, changes):
+        """pass (object, reason) pairs through, counting the objects as changed"""
+        for obj, reason in changes:
+            self.add(entity_path(obj), "changed")
+            yield obj, reason
+
+    def error(self, base, message):
+        """record that base could not be processed"""
+        with self._lock:
+            self._errors[tuple(base)] = message
+
+    def as_dict(self):
+        """the counts as a JSON document, to merge with those of other processes"""
+        with self._lock:
+            return {"counts": [list(c) for c in self._names],
+                    "bases": [{"base": base, "counts": self._counts[tuple(base)], "error": self._errors.get(tuple(base))}
+                              for base in self.bases]}
+
+    @classmethod
+    def merged(cls, summaries):
+        """
+        one Summary adding up the counts of several, e.g. of the shards of a run
+
+        A base counts as not processed if no summary processed it.
+
+        :param summaries: list of as_dict() documents
+        """
+        bases = []
+        for summary in summaries:
+            for entry in summary["bases"]:
+                if entry["base"] not in bases:
+                    bases.append(entry["base"])
+        merged = cls(bases, tuple(tuple(c) for c in summaries[0]["counts"]) if summaries else COUNTS)
+        processed = set()
+        errors = {}
+        for summary in summaries:
+            for entry in summary["bases"]:
+                if entry["error"] is not None:
+                    errors[tuple(entry["base"])] = entry["error"]
+                    continue
+                processed.add(tuple(entry["base"]))
+                for name, count in entry["counts"].items():
+                    merged.add(entry["base"], name, count)
+        for base, error in errors.items():
+            if base not in processed:
+                merged.error(base, error)
+        return merged
+
+    def _line(self, counts):
+        return ", ".join("{} {}".format(counts[name], description) for name, description in self._names)
+
+    def report(self, out=lambda x: x):
+        """write one line per base and the totals"""
+        totals = dict((name, 0) for name, _ in self._names)
+        with self._lock:
+            for base in self.bases:
+                counts = self._counts[tuple(base)]
+                error = self._errors.get(tuple(base))
+                if error is not None:
+                    out("{}: not processed, {}".format("/".join(base), error))
+                    continue
+                out("{}: {}".format("/".join(base), self._line(counts)))
+                for name in totals:
+                    totals[name] += counts[name]
+            out("{} bases, {} not processed: {}".format(len(self.bases), len(self._errors), self._line(totals)))
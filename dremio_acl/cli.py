@@ -1,13 +1,32 @@
 # -*- coding: utf-8 -*-
 """Console script for dremio_acl."""
+import itertools
 import os
 import sys
+import time
 import click
 import requests
+import simplejson as json
 
-from dremio_client.dremio_client import DremioClient
+from dremio_client.dremio_simple_client import SimpleClient
 from dremio_client.conf.config_parser import build_config
-from .acl import fetch, fetch_object_paths, build_acl_defs, build_default_acl,  report_acl, update_acl, update_space_acl, dump_acl, dump_space_acl, update_acls_to_folder
+from dremio_client.model.endpoints import set_limiter, set_metrics
+from dremio_client.model.limiter import AdaptiveLimiter
+from dremio_client.model.metrics import Metrics
+from dremio_client.profiling import Profiler, note_output
+from .crawl import CatalogStore
+from .snapshot import Snapshot
+from .definitions import load_acl_defs
+from .journal import Journal
+from .plan import write_plan, apply_plan
+from .placement import placement_changes
+from .output import FORMATS, merge_outputs
+from .information_schema import ENUMERATORS
+from .privileges import READERS, PrivilegeStore
+from .grants import WRITERS, SqlWriter, check_sql_writable
+from .bases import COUNTS, Summary, label, parse_base, read_bases
+from .shard import HashShard, QueueShard, parse_shard
+from .acl import defined_acls, fetch, fetch_bases, selected, fetch_object_paths, bases_acl_changes, update_bases_acl, build_default_acl,  report_acl, update_space_acl, dump_acl, dump_space_acl, dump_raw, update_acls_to_folder, rollup_acls_to_folders, space_acl_changes
 
 requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
 
@@ -19,8 +38,13 @@ requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.
 @click.option("-u", "--username", help="username if different from config file")
 @click.option("--password", help="password if different from config file")
 @click.option("--skip-verify", is_flag=True, help="skip verification of ssl cert")
+@click.option("--adaptive", is_flag=True, default=False, help="Adapt the number of requests in flight to the coordinator's latency, up to --jobs")
+@click.option("--target-latency", "target_latency", type=float, default=1.0, show_default=True, help="p95 request latency in seconds that --adaptive aims to stay under")
+@click.option("--metrics-json", "metrics_json", type=click.Path(dir_okay=False), default=None, help="Write request, phase and limiter metrics of the run to this JSON file")
+@click.option("--metrics-prom", "metrics_prom", type=click.Path(dir_okay=False), default=None, help="Write the same metrics in Prometheus text format, e.g. for the node exporter textfile collector")
+@click.option("--profile", "profile", is_flag=True, default=False, help="Profile the run and write the profile next to the report or dump, or to the current directory")
 @click.pass_context
-def cli(ctx, config, hostname, port, ssl, username, password, skip_verify):
+def cli(ctx, config, hostname, port, ssl, username, password, skip_verify, adaptive, target_latency, metrics_json, metrics_prom, profile):
     """
     Use dremio_acl to interact with Dremio's REST API to report on or update PDS ACLs
     """
@@ -39,6 +63,161 @@ def cli(ctx, config, hostname, port, ssl, username, password, skip_verify):
         ctx.obj["auth.password"] = password
     if skip_verify:
         ctx.obj["verify"] = not skip_verify
+    limiter = AdaptiveLimiter(target_latency=target_latency) if adaptive else None
+    metrics = Metrics() if metrics_json or metrics_prom or profile else None
+    if profile:
+        profiler = Profiler(ctx.invoked_subcommand)
+        ctx.call_on_close(lambda: profiler.stop(metrics, click.echo))
+        profiler.start()
+    if limiter is not None:
+        set_limiter(limiter)
+        ctx.call_on_close(lambda: click.echo("Adaptive limit: {limit} requests in flight (peak {peak}, {increases} increases, "
+                                             "{decreases} decreases)".format(**limiter.stats())))
+    if metrics is not None:
+        set_metrics(metrics)
+        ctx.call_on_close(lambda: _write_metrics(metrics, limiter, metrics_json, metrics_prom))
+
+
+def _write_metrics(metrics, limiter, metrics_json, metrics_prom):
+    if limiter is not None:
+        for name, value in limiter.stats().items():
+            metrics.set_gauge("adaptive_" + name, value)
+    if metrics_json:
+        metrics.write_json(metrics_json)
+    if metrics_prom:
+        metrics.write_prometheus(metrics_prom)
+
+
+def _store(client, snapshot_file, enumerate_with="rest", read_acls_with="rest", bases=None, track_datasets=False):
+    if snapshot_file and enumerate_with == "sql":
+        raise click.UsageError("--enumerate-with sql lists datasets from Dremio, it can not be used with --snapshot")
+    if snapshot_file and read_acls_with == "sql":
+        raise click.UsageError("--read-acls-with sql reads ACLs from Dremio, it can not be used with --snapshot")
+    if snapshot_file:
+        return Snapshot(snapshot_file, client)
+    return PrivilegeStore(client, bases) if read_acls_with == "sql" else CatalogStore(client, track_datasets)
+
+
+def _writer(client, write_acls_with, bases=None, acls=()):
+    # without bases the objects to write decide which grants are read. acls are the ACLs the run may write, the SQL
+    # writer refuses to start on ones it can not grant
+    if write_acls_with != "sql":
+        return None
+    for acl in acls:
+        try:
+            check_sql_writable(acl)
+        except ValueError as e:
+            raise click.UsageError(str(e))
+    return SqlWriter(client, bases or None)
+
+
+def _defined_acls(acl_defs, default_acl):
+    return itertools.chain([default_acl["accessControlList"]], defined_acls(acl_defs))
+
+
+def _bases(base, more_bases, bases_file):
+    # BASE, every --base and every line of --bases-file, in that order and without repeats
+    bases = [list(base)] if base else []
+    bases.extend(parse_base(b) for b in more_bases)
+    if bases_file is not None:
+        bases.extend(read_bases(bases_file))
+    unique = []
+    for b in bases:
+        if b and b not in unique:
+            unique.append(b)
+    if not unique:
+        raise click.UsageError("Give a BASE, --base or --bases-file")
+    return unique
+
+
+def _space_bases(base, more_bases, bases_file):
+    # the space commands that take an optional BASE run over every space when given none at all
+    if not base and not more_bases and bases_file is None:
+        return [[]]
+    return _bases(base, more_bases, bases_file)
+
+
+def _space_objects(client, bases, jobs, store, enumerate_with):
+    return itertools.chain.from_iterable(
+        fetch_object_paths(client, base, len(base), jobs, store, lazy=True, enumerate_with=enumerate_with, out=click.echo)
+        for base in bases)
+
+
+def _datasets(fetched, shard=None, summary=None):
+    return selected(itertools.chain.from_iterable(datasets for datasets, _ in fetched), shard, summary)
+
+
+def _report(summary, out):
+    # one line per base is only worth printing when there is more than one
+    if len(summary.bases) > 1:
+        summary.report(out)
+
+
+def _shard(shard_spec, work_queue):
+    if shard_spec and work_queue:
+        raise click.UsageError("--shard and --work-queue split a run in different ways, give only one of them")
+    if work_queue:
+        return QueueShard(work_queue)
+    if shard_spec:
+        try:
+            return HashShard(*parse_shard(shard_spec))
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--shard")
+    return None
+
+
+def _on_done(shard):
+    # a dataset of the queue is done once its record is written, one that failed is left for another process
+    return shard.done if shard is not None else None
+
+
+def _shard_label(bases, shard):
+    # output files are named after the bases, and the shard that wrote them
+    return label(bases) + ([shard.name] if shard is not None else [])
+
+
+def _shard_file(filename, shard):
+    if shard is None:
+        return filename
+    root, ext = os.path.splitext(filename)
+    return "{}-{}{}".format(root, shard.name, ext)
+
+
+def _finish(summary, shard, summary_file, out, output=None, merged_output=None):
+    # the last process of a work queue merges the summaries and output files of all of them
+    if summary_file:
+        with open(summary_file, "w") as f:
+            json.dump(summary.as_dict(), f)
+    if not isinstance(shard, QueueShard):
+        _report(summary, out)
+        return
+    merged = shard.finish(summary.as_dict(), output, out)
+    shard.close()
+    if merged is None:
+        summary.report(out)
+        out("Other processes are still working on the queue, the last one to finish merges the reports")
+        return
+    summaries, outputs = merged
+    out("Merged summary of {} processes:".format(len(summaries)))
+    Summary.merged(summaries).report(out)
+    if merged_output is not None and outputs:
+        merge_outputs(outputs, merged_output)
+        out("Merged {} files into {}".format(len(outputs), merged_output))
+
+
+def _journal(journal_file, resume, out):
+    if resume and not journal_file:
+        raise click.UsageError("--resume needs --journal")
+    if not journal_file:
+        return None
+    journal = Journal(journal_file, resume)
+    if resume:
+        out("Resuming, {} objects already done".format(len(journal)))
+    return journal
+
+
+def _deadline(seconds):
+    return time.time() + seconds if seconds is not None else None
 
 
 @cli.group()
@@ -59,100 +238,398 @@ def dump(args):
     pass
 
 
+@cli.group()
+@click.pass_obj
+def snapshot(args):
+    pass
+
+
+@cli.group()
+@click.pass_obj
+def plan(args):
+    pass
+
+
 @update.command()
-@click.argument("base", nargs=-1, required=True)
+@click.argument("base", nargs=-1, required=False)
+@click.option("-b", "--base", "more_bases", multiple=True, help="Another base to process in the same run, written as BASE is, e.g. -b 'MYSOURCE MYDB'. Repeatable")
+@click.option("--bases-file", "bases_file", type=click.File(), default=None, help="File listing more bases to process in the same run, one per line written as BASE is")
 @click.option("-g", "--group-on-acl-empty", "group_on_acl_empty", required=False, show_default=False, default=None, help="Optional group to set ACL for if a PDS ACL list is empty")
 @click.option("-u", "--user-on-acl-empty", "user_on_acl_empty", required=False, show_default=False, default=None, help="Optional user to set ACL for if a PDS ACL list is empty")
 @click.option("-d", "--delete-pds-acls", "delete_pds_acls", is_flag=True, default=False, show_default=False, required=False, help="Flag to delete PDS ACLs once the data source folder is updated")
+@click.option("-j", "--jobs", "jobs", type=int, default=1, show_default=True, help="Number of concurrent catalog requests to use when crawling and committing")
+@click.option("--enumerate-with", "enumerate_with", type=click.Choice(ENUMERATORS), default="rest", show_default=True, help="List datasets by crawling folders over REST, or with one INFORMATION_SCHEMA query falling back to crawling")
+@click.option("--max-retries", "max_retries", type=int, default=5, show_default=True, help="Number of times to retry a commit that failed with a retryable error")
+@click.option("--write-acls-with", "write_acls_with", type=click.Choice(WRITERS), default="rest", show_default=True, help="Write ACLs by PUTting each catalog object, or as SQL GRANT and REVOKE statements where the Dremio edition has them. SQL grants to users and roles only, ACLs with groups need rest")
+@click.option("-r", "--recursive", "recursive", is_flag=True, default=False, show_default=False, required=False, help="Flag to also set the superset of every folder below BASE, crawling BASE once")
 @click.pass_obj
-def acls_to_folder(args, group_on_acl_empty, user_on_acl_empty, delete_pds_acls, base):
+def acls_to_folder(args, more_bases, bases_file, group_on_acl_empty, user_on_acl_empty, delete_pds_acls, jobs, max_retries, recursive, enumerate_with, write_acls_with, base):
     """
         BASE: base directory of data source folder in Dremio for which to generate superset of ACLs. Space separated. e.g. to start at a folder within a source: MYSOURCE MYDB
     """
-    client = DremioClient(build_config(args))
+    bases = _bases(base, more_bases, bases_file)
+    client = SimpleClient(build_config(args), pool_size=jobs)
     default_acl = build_default_acl(group_on_acl_empty, user_on_acl_empty)
-    ds, source_folder = fetch(client, base)
-    update_acls_to_folder(client, ds, source_folder, default_acl, delete_pds_acls, click.echo)
+    store = CatalogStore(client)
+    if recursive and enumerate_with == "sql":
+        raise click.UsageError("--recursive reads every folder below BASE, --enumerate-with sql can not be used with it")
+    # every base gets its own superset, only the client, store and writer are shared
+    writer = _writer(client, write_acls_with, bases, [default_acl["accessControlList"]])
+    for ds, source_folder in fetch_bases(client, bases, jobs, store, enumerate_with, out=click.echo):
+        if recursive:
+            rollup_acls_to_folders(client, source_folder, default_acl, delete_pds_acls, click.echo, jobs, max_retries, store,
+                                   writer)
+        else:
+            update_acls_to_folder(client, ds, source_folder, default_acl, delete_pds_acls, click.echo, jobs, max_retries,
+                                  store, writer)
 
 
 @update.command()
-@click.argument("base", nargs=-1, required=True)
+@click.argument("base", nargs=-1, required=False)
+@click.option("-b", "--base", "more_bases", multiple=True, help="Another base to process in the same run, written as BASE is, e.g. -b 'MYSOURCE MYDB'. Repeatable")
+@click.option("--bases-file", "bases_file", type=click.File(), default=None, help="File listing more bases to process in the same run, one per line written as BASE is")
+@click.option("--shard", "shard_spec", default=None, help="Only process the objects whose path hashes to shard I of N, given as I/N with I from 0 to N-1. Run N processes to cover every object")
+@click.option("--work-queue", "work_queue", type=click.Path(dir_okay=False), default=None, help="Share the run with every process given the same SQLite work queue file, each taking the next batch of PDSs when it is ready for more. The last one to finish merges the summaries and output files")
+@click.option("--summary-file", "summary_file", type=click.Path(dir_okay=False), default=None, help="Write the counts of each base to this JSON file, e.g. to combine the shards of a run with merge summaries")
 @click.option("-a", "--acl_file", "acl_file", required=True, type=click.File(), help="Path to a file containing the ACL definitions")
+@click.option("--defs-cache", "defs_cache", type=click.Path(file_okay=False), default=None, help="Directory to keep ACL definitions compiled in, keyed by the hash of the file, so later runs with the same file skip parsing it")
 @click.option("-g", "--group-on-acl-empty", "group_on_acl_empty", required=False, show_default=False, default=None, help="Optional group to set ACL for if a PDS ACL list is empty")
 @click.option("-u", "--user-on-acl-empty", "user_on_acl_empty", required=False, show_default=False, default=None, help="Optional user to set ACL for if a PDS ACL list is empty")
 @click.option("-s", "--source-only", "source_only", is_flag=True, default=False, show_default=False, required=False, help="Flag to only set ACLs at database level, omit setting PDS ACLs")
+@click.option("-j", "--jobs", "jobs", type=int, default=1, show_default=True, help="Number of concurrent catalog requests to use when crawling and committing")
+@click.option("--enumerate-with", "enumerate_with", type=click.Choice(ENUMERATORS), default="rest", show_default=True, help="List datasets by crawling folders over REST, or with one INFORMATION_SCHEMA query falling back to crawling")
+@click.option("--read-acls-with", "read_acls_with", type=click.Choice(READERS), default="rest", show_default=True, help="Read PDS ACLs with one GET each, or in bulk from sys.privileges where the Dremio edition has it")
+@click.option("--max-retries", "max_retries", type=int, default=5, show_default=True, help="Number of times to retry a commit that failed with a retryable error")
+@click.option("--write-acls-with", "write_acls_with", type=click.Choice(WRITERS), default="rest", show_default=True, help="Write ACLs by PUTting each catalog object, or as SQL GRANT and REVOKE statements where the Dremio edition has them. SQL grants to users and roles only, ACLs with groups need rest")
+@click.option("--snapshot", "snapshot_file", required=False, default=None, type=click.Path(exists=True, dir_okay=False), help="Read the catalog from a snapshot file created by snapshot refresh instead of from Dremio")
+@click.option("--journal", "journal_file", required=False, default=None, type=click.Path(dir_okay=False), help="Path of a journal recording checked and committed objects")
+@click.option("--resume", "resume", is_flag=True, default=False, show_default=False, required=False, help="Flag to skip the work recorded as done in the journal of an earlier run")
+@click.option("--deadline", "deadline", type=int, default=None, required=False, help="Stop scheduling new work after this many seconds")
 @click.pass_obj
-def acl(args, acl_file, group_on_acl_empty, user_on_acl_empty, source_only, base):
+def acl(args, more_bases, bases_file, shard_spec, work_queue, summary_file, acl_file, defs_cache, group_on_acl_empty, user_on_acl_empty, source_only, jobs, max_retries, snapshot_file, journal_file, resume, deadline, enumerate_with, read_acls_with, write_acls_with, base):
     """
         BASE: base directory in Dremio where to start applying ACLs to. Space separated. e.g. to start at a db within a source: MYSOURCE MYDB
     """
-    client = DremioClient(build_config(args))
-    acl_defs = build_acl_defs(acl_file)
+    bases = _bases(base, more_bases, bases_file)
+    shard = _shard(shard_spec, work_queue)
+    client = SimpleClient(build_config(args), pool_size=jobs)
+    acl_defs = load_acl_defs(acl_file, defs_cache, click.echo)
     default_acl = build_default_acl(group_on_acl_empty, user_on_acl_empty)
-    ds, source_folder = fetch(client, base)
-    update_acl(client, acl_defs, ds, source_folder, source_only, default_acl, click.echo)
+    writer = _writer(client, write_acls_with, bases, _defined_acls(acl_defs, default_acl))
+    store = _store(client, snapshot_file, enumerate_with, read_acls_with, bases)
+    summary = Summary(bases)
+    fetched = fetch_bases(client, bases, jobs, store, enumerate_with, summary, click.echo)
+    journal = _journal(journal_file, resume, click.echo)
+    try:
+        update_bases_acl(client, acl_defs, fetched, source_only, default_acl, click.echo, jobs, max_retries, store,
+                         journal, _deadline(deadline), writer, summary, shard)
+    finally:
+        if journal is not None:
+            journal.close()
+    _finish(summary, shard, summary_file, click.echo)
 
 
 @update.command()
-@click.argument("base", nargs=-1, required=True)
+@click.argument("base", nargs=-1, required=False)
 @click.option("-a", "--acl_file", "acl_file", required=True, type=click.File(), help="Path to a file containing the ACL definitions")
+@click.option("--defs-cache", "defs_cache", type=click.Path(file_okay=False), default=None, help="Directory to keep ACL definitions compiled in, keyed by the hash of the file, so later runs with the same file skip parsing it")
 @click.option("-g", "--group-on-acl-empty", "group_on_acl_empty", required=False, show_default=False, default=None, help="Optional group to set ACL for if object ACLs are not present in the definition file")
 @click.option("-u", "--user-on-acl-empty", "user_on_acl_empty", required=False, show_default=False, default=None, help="Optional user to set ACL for if object ACLs are not present in the definition file")
+@click.option("-j", "--jobs", "jobs", type=int, default=1, show_default=True, help="Number of concurrent catalog requests to use when crawling and committing")
+@click.option("--enumerate-with", "enumerate_with", type=click.Choice(ENUMERATORS), default="rest", show_default=True, help="List datasets by crawling folders over REST, or with one INFORMATION_SCHEMA query falling back to crawling")
+@click.option("--max-retries", "max_retries", type=int, default=5, show_default=True, help="Number of times to retry a commit that failed with a retryable error")
+@click.option("--write-acls-with", "write_acls_with", type=click.Choice(WRITERS), default="rest", show_default=True, help="Write ACLs by PUTting each catalog object, or as SQL GRANT and REVOKE statements where the Dremio edition has them. SQL grants to users and roles only, ACLs with groups need rest")
+@click.option("--snapshot", "snapshot_file", required=False, default=None, type=click.Path(exists=True, dir_okay=False), help="Read the catalog from a snapshot file created by snapshot refresh instead of from Dremio")
+@click.option("--journal", "journal_file", required=False, default=None, type=click.Path(dir_okay=False), help="Path of a journal recording checked and committed objects")
+@click.option("--resume", "resume", is_flag=True, default=False, show_default=False, required=False, help="Flag to skip the work recorded as done in the journal of an earlier run")
+@click.option("--deadline", "deadline", type=int, default=None, required=False, help="Stop scheduling new work after this many seconds")
+@click.option("-b", "--base", "more_bases", multiple=True, help="Another base to process in the same run, written as BASE is, e.g. -b 'MYSOURCE MYDB'. Repeatable")
+@click.option("--bases-file", "bases_file", type=click.File(), default=None, help="File listing more bases to process in the same run, one per line written as BASE is")
 @click.pass_obj
-def space_acl(args, acl_file, group_on_acl_empty, user_on_acl_empty, base):
+def space_acl(args, acl_file, defs_cache, group_on_acl_empty, user_on_acl_empty, jobs, max_retries, snapshot_file, journal_file, resume, deadline, enumerate_with, write_acls_with, more_bases, bases_file, base):
     """
         BASE: base directory in the space hierarchy Dremio where to start applying ACLs to. Space separated. e.g. to start at a folder within a space: MYSPACE MYFOLDER
     """
-    client = DremioClient(build_config(args))
-    acl_defs = build_acl_defs(acl_file)
+    client = SimpleClient(build_config(args), pool_size=jobs)
+    acl_defs = load_acl_defs(acl_file, defs_cache, click.echo)
     default_acl = build_default_acl(group_on_acl_empty, user_on_acl_empty)
-    ds = fetch_object_paths(client, base, len(base) if base else 0)
-    update_space_acl(client, acl_defs, ds, default_acl, click.echo)
+    bases = _bases(base, more_bases, bases_file)
+    writer = _writer(client, write_acls_with, bases, _defined_acls(acl_defs, default_acl))
+    store = _store(client, snapshot_file, enumerate_with)
+    ds = _space_objects(client, bases, jobs, store, enumerate_with)
+    journal = _journal(journal_file, resume, click.echo)
+    try:
+        update_space_acl(client, acl_defs, ds, default_acl, click.echo, jobs, max_retries, store, journal,
+                         _deadline(deadline), writer)
+    finally:
+        if journal is not None:
+            journal.close()
 
 
 @report.command()
-@click.argument("base", nargs=-1, required=True)
+@click.argument("base", nargs=-1, required=False)
+@click.option("-b", "--base", "more_bases", multiple=True, help="Another base to process in the same run, written as BASE is, e.g. -b 'MYSOURCE MYDB'. Repeatable")
+@click.option("--bases-file", "bases_file", type=click.File(), default=None, help="File listing more bases to process in the same run, one per line written as BASE is")
+@click.option("--shard", "shard_spec", default=None, help="Only process the objects whose path hashes to shard I of N, given as I/N with I from 0 to N-1. Run N processes to cover every object")
+@click.option("--work-queue", "work_queue", type=click.Path(dir_okay=False), default=None, help="Share the run with every process given the same SQLite work queue file, each taking the next batch of PDSs when it is ready for more. The last one to finish merges the summaries and output files")
+@click.option("--summary-file", "summary_file", type=click.Path(dir_okay=False), default=None, help="Write the counts of each base to this JSON file, e.g. to combine the shards of a run with merge summaries")
 @click.option("-a", "--acl_file", "acl_file", required=True, type=click.File(), help="Path to a file containing the ACL definitions")
+@click.option("--defs-cache", "defs_cache", type=click.Path(file_okay=False), default=None, help="Directory to keep ACL definitions compiled in, keyed by the hash of the file, so later runs with the same file skip parsing it")
 @click.option("-r", "--report-path", "report_path", required=True, type=click.Path(), help="Path where the file containing a list of all PDSs with incorrect ACLs will be written")
 @click.option("-g", "--group-on-acl-empty", "group_on_acl_empty", required=False, show_default=False, default=None, help="Optional group to set ACL for if a PDS ACL list is empty")
 @click.option("-u", "--user-on-acl-empty", "user_on_acl_empty", required=False, show_default=False, default=None, help="Optional user to set ACL for if a PDS ACL list is empty")
+@click.option("-j", "--jobs", "jobs", type=int, default=1, show_default=True, help="Number of concurrent catalog requests to use when crawling")
+@click.option("--enumerate-with", "enumerate_with", type=click.Choice(ENUMERATORS), default="rest", show_default=True, help="List datasets by crawling folders over REST, or with one INFORMATION_SCHEMA query falling back to crawling")
+@click.option("--read-acls-with", "read_acls_with", type=click.Choice(READERS), default="rest", show_default=True, help="Read PDS ACLs with one GET each, or in bulk from sys.privileges where the Dremio edition has it")
+@click.option("--snapshot", "snapshot_file", required=False, default=None, type=click.Path(exists=True, dir_okay=False), help="Read the catalog from a snapshot file created by snapshot refresh instead of from Dremio")
+@click.option("--format", "fmt", type=click.Choice(FORMATS), default="json", show_default=True, help="Output format. parquet and arrow need pyarrow")
 @click.pass_obj
-def acl(args, acl_file, report_path, group_on_acl_empty, user_on_acl_empty, base):
+def acl(args, more_bases, bases_file, shard_spec, work_queue, summary_file, acl_file, defs_cache, report_path, group_on_acl_empty, user_on_acl_empty, jobs, snapshot_file, fmt, enumerate_with, read_acls_with, base):
     """
         BASE: base directory in Dremio where to start comparing ACLs. Space separated. e.g. to start at a db\schema within a source: MYSOURCE MYDB
     """
-    client = DremioClient(build_config(args))
-    acl_defs = build_acl_defs(acl_file)
+    bases = _bases(base, more_bases, bases_file)
+    shard = _shard(shard_spec, work_queue)
+    client = SimpleClient(build_config(args), pool_size=jobs)
+    acl_defs = load_acl_defs(acl_file, defs_cache, click.echo)
     default_acl = build_default_acl(group_on_acl_empty, user_on_acl_empty)
-    ds, source = fetch(client, base)
-    report_acl(client, base, acl_defs, ds, report_path, default_acl, click.echo)
+    store = _store(client, snapshot_file, enumerate_with, read_acls_with, bases)
+    summary = Summary(bases, COUNTS[:1] + (("changed", "need updating"),))
+    fetched = fetch_bases(client, bases, jobs, store, enumerate_with, summary, click.echo)
+    note_output(report_path)
+    report_file = report_acl(client, _shard_label(bases, shard), acl_defs, _datasets(fetched, shard, summary),
+                             report_path, default_acl, click.echo, store, fmt, summary, _on_done(shard))
+    _finish(summary, shard, summary_file, click.echo, report_file,
+            report_file.replace("-" + shard.name, "", 1) if shard is not None else None)
 
 
 @dump.command()
-@click.argument("base", nargs=-1, required=True)
+@click.argument("base", nargs=-1, required=False)
+@click.option("-b", "--base", "more_bases", multiple=True, help="Another base to process in the same run, written as BASE is, e.g. -b 'MYSOURCE MYDB'. Repeatable")
+@click.option("--bases-file", "bases_file", type=click.File(), default=None, help="File listing more bases to process in the same run, one per line written as BASE is")
+@click.option("--shard", "shard_spec", default=None, help="Only process the objects whose path hashes to shard I of N, given as I/N with I from 0 to N-1. Run N processes to cover every object")
+@click.option("--work-queue", "work_queue", type=click.Path(dir_okay=False), default=None, help="Share the run with every process given the same SQLite work queue file, each taking the next batch of PDSs when it is ready for more. The last one to finish merges the summaries and output files")
+@click.option("--summary-file", "summary_file", type=click.Path(dir_okay=False), default=None, help="Write the counts of each base to this JSON file, e.g. to combine the shards of a run with merge summaries")
 @click.option("-d", "--dump-path", "dump_path", required=True, type=click.Path(), help="Path where the file containing a list of all ACLs will be written")
+@click.option("-j", "--jobs", "jobs", type=int, default=1, show_default=True, help="Number of concurrent catalog requests to use when crawling")
+@click.option("--enumerate-with", "enumerate_with", type=click.Choice(ENUMERATORS), default="rest", show_default=True, help="List datasets by crawling folders over REST, or with one INFORMATION_SCHEMA query falling back to crawling")
+@click.option("--read-acls-with", "read_acls_with", type=click.Choice(READERS), default="rest", show_default=True, help="Read PDS ACLs with one GET each, or in bulk from sys.privileges where the Dremio edition has it")
+@click.option("--snapshot", "snapshot_file", required=False, default=None, type=click.Path(exists=True, dir_okay=False), help="Read the catalog from a snapshot file created by snapshot refresh instead of from Dremio")
+@click.option("--format", "fmt", type=click.Choice(FORMATS), default="json", show_default=True, help="Output format. parquet and arrow need pyarrow")
 @click.pass_obj
-def acl(args, dump_path, base):
+def acl(args, more_bases, bases_file, shard_spec, work_queue, summary_file, dump_path, jobs, snapshot_file, fmt, enumerate_with, read_acls_with, base):
     """
         BASE: base directory in Dremio where to start listing ACLs from. Space separated. e.g. to start at a db within a source: MYSOURCE MYDB
     """
-    client = DremioClient(build_config(args))
-    ds, source = fetch(client, base)
-    dump_acl(client, ds, dump_path, base, click.echo)
+    bases = _bases(base, more_bases, bases_file)
+    shard = _shard(shard_spec, work_queue)
+    client = SimpleClient(build_config(args), pool_size=jobs)
+    store = _store(client, snapshot_file, enumerate_with, read_acls_with, bases)
+    summary = Summary(bases, COUNTS[:1])
+    fetched = fetch_bases(client, bases, jobs, store, enumerate_with, summary, click.echo)
+    note_output(dump_path)
+    dump_file = dump_acl(client, _datasets(fetched, shard, summary), dump_path, _shard_label(bases, shard), click.echo,
+                         store, fmt, _on_done(shard))
+    _finish(summary, shard, summary_file, click.echo, dump_file,
+            dump_file.replace("-" + shard.name, "", 1) if shard is not None else None)
 
 
 @dump.command()
 @click.argument("base", nargs=-1, required=False)
 @click.option("-d", "--dump-path", "dump_path", required=True, type=click.Path(), help="Path where the file containing a list of all ACLs will be written")
 @click.option("-v", "--include-vds", "include_vds", is_flag=True, default=False, show_default=False, required=False, help="Flag to include VDS ACLs in the dump")
+@click.option("-j", "--jobs", "jobs", type=int, default=1, show_default=True, help="Number of concurrent catalog requests to use when crawling")
+@click.option("--enumerate-with", "enumerate_with", type=click.Choice(ENUMERATORS), default="rest", show_default=True, help="List datasets by crawling folders over REST, or with one INFORMATION_SCHEMA query falling back to crawling")
+@click.option("--snapshot", "snapshot_file", required=False, default=None, type=click.Path(exists=True, dir_okay=False), help="Read the catalog from a snapshot file created by snapshot refresh instead of from Dremio")
+@click.option("--format", "fmt", type=click.Choice(FORMATS), default="json", show_default=True, help="Output format. parquet and arrow need pyarrow")
+@click.option("-b", "--base", "more_bases", multiple=True, help="Another base to process in the same run, written as BASE is, e.g. -b 'MYSOURCE MYDB'. Repeatable")
+@click.option("--bases-file", "bases_file", type=click.File(), default=None, help="File listing more bases to process in the same run, one per line written as BASE is")
 @click.pass_obj
-def space_acl(args, dump_path, base, include_vds):
+def space_acl(args, dump_path, base, include_vds, jobs, snapshot_file, fmt, enumerate_with, more_bases, bases_file):
     """
         BASE: optional base directory in Dremio where to start listing ACLs from. Space separated. e.g. to start at a folder within a space: MYSPACE MYFOLDER
     """
-    client = DremioClient(build_config(args))
-    objects = fetch_object_paths(client, base, len(base) if base else 0)
-    dump_space_acl(client, objects, dump_path, base, click.echo, include_vds)
+    client = SimpleClient(build_config(args), pool_size=jobs)
+    # datasets are only told apart from the listings when they are left out
+    bases = _space_bases(base, more_bases, bases_file)
+    store = _store(client, snapshot_file, enumerate_with, track_datasets=not include_vds)
+    objects = _space_objects(client, bases, jobs, store, enumerate_with)
+    note_output(dump_path)
+    dump_space_acl(client, objects, dump_path, label(bases), click.echo, include_vds, store, fmt)
+
+
+@dump.command()
+@click.argument("base", nargs=-1, required=True)
+@click.option("-d", "--dump-path", "dump_path", required=True, type=click.Path(), help="Path where the dump and its index will be written")
+@click.option("-j", "--jobs", "jobs", type=int, default=1, show_default=True, help="Number of concurrent catalog requests to use when crawling and reading")
+@click.option("--enumerate-with", "enumerate_with", type=click.Choice(ENUMERATORS), default="rest", show_default=True, help="List datasets by crawling folders over REST, or with one INFORMATION_SCHEMA query falling back to crawling")
+@click.option("-z", "--gzip", "compress", is_flag=True, default=False, show_default=False, required=False, help="Flag to gzip the dump")
+@click.option("--length-prefixed", "length_prefixed", is_flag=True, default=False, show_default=False, required=False, help="Flag to write each response after its 4 byte length instead of one per line")
+@click.pass_obj
+def raw(args, dump_path, jobs, compress, length_prefixed, enumerate_with, base):
+    """
+        BASE: base directory in Dremio below which to back up the full catalog entry of every PDS, as returned by Dremio. Space separated. e.g. MYSOURCE MYDB
+    """
+    client = SimpleClient(build_config(args), pool_size=jobs)
+    ds, source = fetch(client, base, jobs, lazy=True, enumerate_with=enumerate_with, out=click.echo)
+    note_output(dump_path)
+    dump_raw(client, ds, dump_path, base, click.echo, jobs, compress, length_prefixed)
+
+
+@snapshot.command()
+@click.argument("base", nargs=-1, required=True)
+@click.option("-f", "--snapshot-file", "snapshot_file", required=True, type=click.Path(dir_okay=False), help="Path of the snapshot file to create or refresh")
+@click.option("-j", "--jobs", "jobs", type=int, default=1, show_default=True, help="Number of concurrent catalog requests to use when crawling")
+@click.option("--full", "full", is_flag=True, default=False, show_default=False, required=False, help="Flag to read every container again instead of taking those whose tag is unchanged from the snapshot")
+@click.pass_obj
+def refresh(args, snapshot_file, jobs, full, base):
+    """
+        BASE: base directory in Dremio to snapshot. Space separated. e.g. to snapshot a db within a source: MYSOURCE MYDB
+    """
+    client = SimpleClient(build_config(args), pool_size=jobs)
+    snap = Snapshot(snapshot_file, client)
+    snap.refresh(base, jobs, click.echo, full)
+    snap.close()
+
+
+@plan.command()
+@click.argument("base", nargs=-1, required=False)
+@click.option("-b", "--base", "more_bases", multiple=True, help="Another base to process in the same run, written as BASE is, e.g. -b 'MYSOURCE MYDB'. Repeatable")
+@click.option("--bases-file", "bases_file", type=click.File(), default=None, help="File listing more bases to process in the same run, one per line written as BASE is")
+@click.option("--shard", "shard_spec", default=None, help="Only process the objects whose path hashes to shard I of N, given as I/N with I from 0 to N-1. Run N processes to cover every object")
+@click.option("--work-queue", "work_queue", type=click.Path(dir_okay=False), default=None, help="Share the run with every process given the same SQLite work queue file, each taking the next batch of PDSs when it is ready for more. The last one to finish merges the summaries and output files")
+@click.option("--summary-file", "summary_file", type=click.Path(dir_okay=False), default=None, help="Write the counts of each base to this JSON file, e.g. to combine the shards of a run with merge summaries")
+@click.option("-a", "--acl_file", "acl_file", required=True, type=click.File(), help="Path to a file containing the ACL definitions")
+@click.option("--defs-cache", "defs_cache", type=click.Path(file_okay=False), default=None, help="Directory to keep ACL definitions compiled in, keyed by the hash of the file, so later runs with the same file skip parsing it")
+@click.option("-o", "--plan-file", "plan_file", required=True, type=click.Path(dir_okay=False), help="Path where the change plan will be written")
+@click.option("-g", "--group-on-acl-empty", "group_on_acl_empty", required=False, show_default=False, default=None, help="Optional group to set ACL for if a PDS ACL list is empty")
+@click.option("-u", "--user-on-acl-empty", "user_on_acl_empty", required=False, show_default=False, default=None, help="Optional user to set ACL for if a PDS ACL list is empty")
+@click.option("-s", "--source-only", "source_only", is_flag=True, default=False, show_default=False, required=False, help="Flag to only plan ACLs at database level, omit PDS ACLs")
+@click.option("-j", "--jobs", "jobs", type=int, default=1, show_default=True, help="Number of concurrent catalog requests to use when crawling")
+@click.option("--enumerate-with", "enumerate_with", type=click.Choice(ENUMERATORS), default="rest", show_default=True, help="List datasets by crawling folders over REST, or with one INFORMATION_SCHEMA query falling back to crawling")
+@click.option("--read-acls-with", "read_acls_with", type=click.Choice(READERS), default="rest", show_default=True, help="Read PDS ACLs with one GET each, or in bulk from sys.privileges where the Dremio edition has it")
+@click.option("--snapshot", "snapshot_file", required=False, default=None, type=click.Path(exists=True, dir_okay=False), help="Read the catalog from a snapshot file created by snapshot refresh instead of from Dremio")
+@click.pass_obj
+def acl(args, more_bases, bases_file, shard_spec, work_queue, summary_file, acl_file, defs_cache, plan_file, group_on_acl_empty, user_on_acl_empty, source_only, jobs, snapshot_file, enumerate_with, read_acls_with, base):
+    """
+        BASE: base directory in Dremio where to start planning ACL changes. Space separated. e.g. to start at a db within a source: MYSOURCE MYDB
+    """
+    bases = _bases(base, more_bases, bases_file)
+    shard = _shard(shard_spec, work_queue)
+    client = SimpleClient(build_config(args), pool_size=jobs)
+    acl_defs = load_acl_defs(acl_file, defs_cache, click.echo)
+    default_acl = build_default_acl(group_on_acl_empty, user_on_acl_empty)
+    store = _store(client, snapshot_file, enumerate_with, read_acls_with, bases)
+    summary = Summary(bases, COUNTS[:2])
+    fetched = fetch_bases(client, bases, jobs, store, enumerate_with, summary, click.echo)
+    note_output(os.path.dirname(plan_file) or ".")
+    changes = bases_acl_changes(client, acl_defs, fetched, source_only, default_acl, click.echo, store, jobs=jobs,
+                                shard=shard, summary=summary)
+    write_plan(summary.changes(changes), _shard_file(plan_file, shard), click.echo, _on_done(shard))
+    _finish(summary, shard, summary_file, click.echo, _shard_file(plan_file, shard), plan_file)
+
+
+@plan.command()
+@click.argument("base", nargs=-1, required=False)
+@click.option("-a", "--acl_file", "acl_file", required=True, type=click.File(), help="Path to a file containing the ACL definitions")
+@click.option("--defs-cache", "defs_cache", type=click.Path(file_okay=False), default=None, help="Directory to keep ACL definitions compiled in, keyed by the hash of the file, so later runs with the same file skip parsing it")
+@click.option("-o", "--plan-file", "plan_file", required=True, type=click.Path(dir_okay=False), help="Path where the change plan will be written")
+@click.option("-g", "--group-on-acl-empty", "group_on_acl_empty", required=False, show_default=False, default=None, help="Optional group to set ACL for if object ACLs are not present in the definition file")
+@click.option("-u", "--user-on-acl-empty", "user_on_acl_empty", required=False, show_default=False, default=None, help="Optional user to set ACL for if object ACLs are not present in the definition file")
+@click.option("-j", "--jobs", "jobs", type=int, default=1, show_default=True, help="Number of concurrent catalog requests to use when crawling")
+@click.option("--enumerate-with", "enumerate_with", type=click.Choice(ENUMERATORS), default="rest", show_default=True, help="List datasets by crawling folders over REST, or with one INFORMATION_SCHEMA query falling back to crawling")
+@click.option("--snapshot", "snapshot_file", required=False, default=None, type=click.Path(exists=True, dir_okay=False), help="Read the catalog from a snapshot file created by snapshot refresh instead of from Dremio")
+@click.option("-b", "--base", "more_bases", multiple=True, help="Another base to process in the same run, written as BASE is, e.g. -b 'MYSOURCE MYDB'. Repeatable")
+@click.option("--bases-file", "bases_file", type=click.File(), default=None, help="File listing more bases to process in the same run, one per line written as BASE is")
+@click.pass_obj
+def space_acl(args, acl_file, defs_cache, plan_file, group_on_acl_empty, user_on_acl_empty, jobs, snapshot_file, enumerate_with, more_bases, bases_file, base):
+    """
+        BASE: optional base directory in the space hierarchy Dremio where to start planning ACL changes. Space separated. e.g. to start at a folder within a space: MYSPACE MYFOLDER
+    """
+    client = SimpleClient(build_config(args), pool_size=jobs)
+    acl_defs = load_acl_defs(acl_file, defs_cache, click.echo)
+    default_acl = build_default_acl(group_on_acl_empty, user_on_acl_empty)
+    store = _store(client, snapshot_file, enumerate_with)
+    ds = _space_objects(client, _space_bases(base, more_bases, bases_file), jobs, store, enumerate_with)
+    note_output(os.path.dirname(plan_file) or ".")
+    write_plan(space_acl_changes(client, acl_defs, ds, default_acl, click.echo, store, jobs=jobs), plan_file, click.echo)
+
+
+@plan.command()
+@click.argument("base", nargs=-1, required=True)
+@click.option("-a", "--acl_file", "acl_file", required=True, type=click.File(), help="Path to a file containing the ACL definitions")
+@click.option("--defs-cache", "defs_cache", type=click.Path(file_okay=False), default=None, help="Directory to keep ACL definitions compiled in, keyed by the hash of the file, so later runs with the same file skip parsing it")
+@click.option("-o", "--plan-file", "plan_file", required=True, type=click.Path(dir_okay=False), help="Path where the change plan will be written")
+@click.option("-g", "--group-on-acl-empty", "group_on_acl_empty", required=False, show_default=False, default=None, help="Optional group to grant if a PDS has no ACL definition")
+@click.option("-u", "--user-on-acl-empty", "user_on_acl_empty", required=False, show_default=False, default=None, help="Optional user to grant if a PDS has no ACL definition")
+@click.option("-j", "--jobs", "jobs", type=int, default=1, show_default=True, help="Number of concurrent catalog requests to use when crawling")
+@click.pass_obj
+def hoist(args, acl_file, defs_cache, plan_file, group_on_acl_empty, user_on_acl_empty, jobs, base):
+    """
+        BASE: source or folder in Dremio below which to plan the fewest ACL writes giving every PDS its defined ACL, with folders carrying the grants their PDSs share. Space separated. e.g. MYSOURCE MYDB
+    """
+    client = SimpleClient(build_config(args), pool_size=jobs)
+    acl_defs = load_acl_defs(acl_file, defs_cache, click.echo)
+    default_acl = build_default_acl(group_on_acl_empty, user_on_acl_empty)
+    store = CatalogStore(client)
+    source_folder = store.get(base)
+    note_output(os.path.dirname(plan_file) or ".")
+    write_plan(placement_changes(client, acl_defs, source_folder, default_acl, click.echo, jobs, store), plan_file, click.echo)
+
+
+@cli.command()
+@click.option("--plan", "plan_file", required=True, type=click.File(), help="Path to a change plan written by the plan commands")
+@click.option("-j", "--jobs", "jobs", type=int, default=1, show_default=True, help="Number of concurrent catalog requests to use when committing")
+@click.option("--max-retries", "max_retries", type=int, default=5, show_default=True, help="Number of times to retry a commit that failed with a retryable error")
+@click.option("--write-acls-with", "write_acls_with", type=click.Choice(WRITERS), default="rest", show_default=True, help="Write ACLs by PUTting each catalog object, or as SQL GRANT and REVOKE statements where the Dremio edition has them. SQL grants to users and roles only, ACLs with groups need rest")
+@click.option("--journal", "journal_file", required=False, default=None, type=click.Path(dir_okay=False), help="Path of a journal recording checked and committed objects")
+@click.option("--resume", "resume", is_flag=True, default=False, show_default=False, required=False, help="Flag to skip the work recorded as done in the journal of an earlier run")
+@click.option("--deadline", "deadline", type=int, default=None, required=False, help="Stop scheduling new work after this many seconds")
+@click.pass_obj
+def apply(args, plan_file, jobs, max_retries, journal_file, resume, deadline, write_acls_with):
+    """
+        Commit the ACL changes recorded in a change plan without listing the catalog again
+    """
+    client = SimpleClient(build_config(args), pool_size=jobs)
+    journal = _journal(journal_file, resume, click.echo)
+    try:
+        apply_plan(client, plan_file, jobs, max_retries, click.echo, journal, _deadline(deadline),
+                   _writer(client, write_acls_with))
+    finally:
+        if journal is not None:
+            journal.close()
+
+
+@cli.group()
+@click.pass_obj
+def merge(args):
+    pass
+
+
+@merge.command()
+@click.argument("summary_files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.pass_obj
+def summaries(args, summary_files):
+    """
+        SUMMARY_FILES: files written with --summary-file, e.g. by each shard of a run, to add up into one summary
+    """
+    loaded = []
+    for summary_file in summary_files:
+        with open(summary_file) as f:
+            loaded.append(json.load(f))
+    Summary.merged(loaded).report(click.echo)
+
+
+@merge.command()
+@click.argument("files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("-o", "--output", "output", required=True, type=click.Path(dir_okay=False), help="Path of the merged file, its extension tells Parquet and Arrow files from JSON lines")
+@click.pass_obj
+def outputs(args, files, output):
+    """
+        FILES: dump, report or plan files of the same kind, e.g. written by each shard of a run, to concatenate
+    """
+    merge_outputs(files, output)
+    click.echo("Merged {} files into {}".format(len(files), output))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import heapq
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from requests.exceptions import ConnectionError, Timeout
+from six.moves.urllib.parse import quote
+from dremio_client.error import DremioException
+from dremio_client.model.endpoints import phase
+
+TERMINAL_STATUS = {400, 401, 403, 404}
+
+
+def is_retryable(e):
+    """
+    classify a commit error
+
+    Connection resets, timeouts, tag conflicts (409), throttling (429) and server errors (5xx) are worth retrying.
+    Everything else, notably 400/403/404, will fail the same way again.
+
+    :param e: exception raised by update_catalog
+    :return: True if the PUT should be retried
+    """
+    if isinstance(e, (ConnectionError, Timeout)):
+        return True
+    if isinstance(e, DremioException) and e.response is not None:
+        code = e.response.status_code
+        if code in TERMINAL_STATUS:
+            return False
+        return code == 409 or code == 429 or code >= 500
+    return False
+
+
+def _is_conflict(e):
+    return isinstance(e, DremioException) and e.response is not None and e.response.status_code == 409
+
+
+def _put(client, obj, refresh_tag, prepare):
+    with phase("commit"):
+        if prepare is not None:
+            obj = prepare(obj)
+        cid = quote(obj["id"], safe="")
+        if refresh_tag:
+            # another writer changed the entity since we read it, pick up its tag and keep our ACL
+            obj["tag"] = client.catalog_item(cid, None)["tag"]
+        return client.update_catalog(cid, obj)
+
+
+def backoff(attempt, base_delay=0.5, max_delay=30.0):
+    """
+    exponential backoff with full jitter
+
+    :param attempt: number of attempts made so far (1 for the first retry)
+    :param base_delay: delay in seconds for the first retry before jitter
+    :param max_delay: cap on the delay in seconds
+    :return: seconds to wait before the next attempt
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+
+def commit(client, objs, jobs=1, max_retries=5, out=lambda x: x, base_delay=0.5, max_delay=30.0, prepare=None,
+           on_commit=None, deadline=None):
+    """
+    PUT a set of catalog objects with bounded concurrency and per item retries
+
+    At most `jobs` PUTs are in flight at once. Items failing with a retryable error are rescheduled after a jittered
+    exponential backoff, up to `max_retries` times. Items failing with a terminal error are not retried.
+
+    :param client: dremio client
+    :param objs: iterable of catalog objects to commit
+    :param jobs: maximum number of concurrent PUTs
+    :param max_retries: maximum number of retries per item
+    :param out: output function
+    :param base_delay: delay in seconds for the first retry before jitter
+    :param max_delay: cap on the retry delay in seconds
+    :param prepare: optional function turning an object into the document to PUT, called on the worker thread
+    :param on_commit: optional function called with each object once it has been committed
+    :param deadline: optional time.time() after which no new PUTs are started and objs is not read any further. Items
+        already taken from objs but not committed are returned as bad, the rest is left in objs for a later run
+    :return: list of objects that could not be committed, in input order
+    """
+    jobs = max(1, jobs)
+    # objs may be a lazy pipeline, items are only pulled from it when there is room for another PUT
+    source = enumerate(objs)
+    ready = deque()
+    delayed = []
+    in_flight = {}
+    bad = []
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    try:
+        while source is not None or ready or delayed or in_flight:
+            now = time.time()
+            if deadline is not None and now >= deadline and (source is not None or ready or delayed):
+                # only what was taken from objs already, the rest of a lazy pipeline is never read
+                left = [item[:2] for item in ready] + [item[1:3] for item in delayed]
+                out("Deadline reached, {} retries waiting and the items not read yet are left for a later run".format(
+                    len(left)))
+                bad.extend(left)
+                source = None
+                ready.clear()
+                delayed = []
+            while delayed and delayed[0][0] <= now:
+                ready.append(heapq.heappop(delayed)[1:])
+            while len(in_flight) < jobs and (ready or source is not None):
+                if ready:
+                    item = ready.popleft()
+                else:
+                    nxt = next(source, None)
+                    if nxt is None:
+                        source = None
+                        break
+                    item = (nxt[0], nxt[1], 0, False)
+                in_flight[executor.submit(_put, client, item[1], item[3], prepare)] = item
+            timeout = max(0, delayed[0][0] - now) if delayed else None
+            if not in_flight:
+                if timeout is not None:
+                    time.sleep(timeout)
+                continue
+            done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, obj, attempt, _ = in_flight.pop(future)
+                e = future.exception()
+                if e is None:
+                    if on_commit is not None:
+                        on_commit(obj)
+                    continue
+                if is_retryable(e) and attempt < max_retries:
+                    delay = backoff(attempt + 1, base_delay, max_delay)
+                    out("Retrying {} in {:.1f}s: {}".format("/".join(obj["path"]), delay, e))
+                    heapq.heappush(delayed, (time.time() + delay, i, obj, attempt + 1, _is_conflict(e)))
+                else:
+                    out("Unable to commit {}: {}".format("/".join(obj["path"]), e))
+                    bad.append((i, obj))
+    finally:
+        executor.shutdown(wait=True)
+    return [obj for _, obj in sorted(bad, key=lambda x: x[0])]
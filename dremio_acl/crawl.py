@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from dremio_client.model.endpoints import phase
+
+
+def entity_path(obj):
+    return [obj["name"]] if obj["entityType"] == "space" else obj["path"]
+
+
+class CatalogStore(object):
+    def __init__(self, client, track_datasets=False):
+        """
+        Per run store of catalog responses keyed by path, so each entity is fetched from Dremio at most once per run
+
+        :param client: dremio client
+        :param track_datasets: record the datasets child listings name, for is_dataset. A record is dropped when the
+            dataset is read with keep=False or asked about with keep=False, so only datasets that were listed and not
+            read yet are held
+        """
+        self._client = client
+        self._items = {}
+        self._datasets = {} if track_datasets else None
+        self._lock = threading.Lock()
+
+    def get(self, path, keep=True):
+        """
+        return the catalog entity at path, fetching it by path if it has not been seen yet this run
+
+        :param path: list ['source', 'folder', 'pds']
+        :param keep: keep the response for later lookups. Pass False for entities that are only read once, a stored
+            response is then handed out and dropped from the store
+        :return: json of resource
+        """
+        key = tuple(path)
+        with self._lock:
+            item = self._items.get(key) if keep else self._items.pop(key, None)
+            if not keep and self._datasets is not None:
+                self._datasets.pop(key, None)
+        if item is None:
+            item = self._client.catalog_item(None, path)
+            if keep:
+                with self._lock:
+                    self._items[key] = item
+        return item
+
+    def cached(self, path):
+        with self._lock:
+            return self._items.get(tuple(path))
+
+    def prepare(self, obj):
+        """return the document to PUT for an object read through this store. Live responses are complete already"""
+        return obj
+
+    def remember(self, children):
+        """record the datasets of a child listing so later passes can tell them apart without a GET"""
+        if self._datasets is None:
+            return
+        with self._lock:
+            for child in children:
+                if child["type"] == "DATASET":
+                    self._datasets[tuple(child["path"])] = child.get("id")
+
+    def _listed(self, path, keep=True):
+        # (True, id from the listing) if a child listing named path as a dataset, (False, None) otherwise
+        if self._datasets is None:
+            return False, None
+        key = tuple(path)
+        with self._lock:
+            if key not in self._datasets:
+                return False, None
+            return True, self._datasets[key] if keep else self._datasets.pop(key)
+
+    def is_dataset(self, path, keep=True):
+        """
+        True if a child listing named path as a dataset. Always False unless the store tracks datasets
+
+        :param keep: False if path will not be asked about again, its record is dropped
+        """
+        return self._listed(path, keep)[0]
+
+
+def _list(store, path, keep=True):
+    with phase("enumerate"):
+        return store.get(path, keep)
+
+
+def crawl_containers(client, children, jobs=1, store=None):
+    """
+    breadth first fetch of every container below a child listing
+
+    Containers are fetched by a pool of `jobs` workers fed from a frontier of pending containers. As each container
+    comes back its CONTAINER children are added to the frontier, so the number of requests in flight is bounded by
+    `jobs` rather than by the depth of the tree.
+
+    :param client: dremio client
+    :param children: child listing of the container to start from
+    :param jobs: maximum number of concurrent catalog requests
+    :param store: optional CatalogStore to read containers through and keep them in
+    :return: dict of container path tuple to its child listing
+    """
+    store = store if store is not None else CatalogStore(client)
+    listings = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, jobs))
+    frontier = {}
+
+    def schedule(kids):
+        store.remember(kids)
+        for child in kids:
+            if child["type"] == "CONTAINER":
+                future = executor.submit(_list, store, child["path"])
+                frontier[future] = tuple(child["path"])
+
+    try:
+        schedule(children)
+        while frontier:
+            done, _ = wait(list(frontier), return_when=FIRST_COMPLETED)
+            for future in done:
+                path = frontier.pop(future)
+                listings[path] = future.result().get("children", [])
+                schedule(listings[path])
+    finally:
+        for future in frontier:
+            future.cancel()
+        executor.shutdown(wait=True)
+    return listings
+
+
+def walk(children, listings, include_containers=False):
+    """
+    depth first walk over listings fetched by crawl_containers
+
+    Yields paths in the same order as a depth first traversal of the live catalog would.
+
+    :param children: child listing to start from
+    :param listings: dict of container path tuple to child listing
+    :param include_containers: yield container paths as well as dataset paths
+    :return: generator of paths
+    """
+    stack = [iter(children)]
+    while stack:
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+            continue
+        if child["type"] != "DATASET" and child["type"] != "CONTAINER":
+            continue
+        if child["type"] == "DATASET" or include_containers:
+            yield child["path"]
+        if child["type"] == "CONTAINER":
+            stack.append(iter(listings[tuple(child["path"])]))
+
+
+def iter_crawl(client, children, jobs=1, store=None, keep_containers=False):
+    """
+    breadth first crawl yielding child entries as soon as the listing they are in arrives
+
+    Nothing is collected. At most 2 * `jobs` container requests are in flight, the CONTAINER entries waiting behind
+    them stay in the pending queue of listed entries, so memory grows with the widest listings rather than with the
+    whole tree. DATASET entries are yielded as soon as they are listed, CONTAINER entries once the container itself
+    has been fetched. Containers are fetched with keep=keep_containers; keep them when the consumer will read them
+    again with store.get(path, keep=False), which hands each one out once and drops it.
+
+    :param client: dremio client
+    :param children: child listing to start from
+    :param jobs: maximum number of concurrent catalog requests
+    :param store: optional CatalogStore to read containers through
+    :param keep_containers: leave fetched containers in the store for the consumer
+    :return: generator of DATASET and CONTAINER child entries
+    """
+    store = store if store is not None else CatalogStore(client)
+    jobs = max(1, jobs)
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    frontier = {}
+    pending = deque(children)
+    store.remember(children)
+    try:
+        while pending or frontier:
+            while pending:
+                child = pending[0]
+                if child["type"] == "CONTAINER":
+                    if len(frontier) >= 2 * jobs:
+                        break
+                    frontier[executor.submit(_list, store, child["path"], keep_containers)] = child
+                elif child["type"] == "DATASET":
+                    yield child
+                pending.popleft()
+            if frontier:
+                done, _ = wait(list(frontier), return_when=FIRST_COMPLETED)
+                for future in done:
+                    child = frontier.pop(future)
+                    kids = future.result().get("children", [])
+                    store.remember(kids)
+                    pending.extend(kids)
+                    yield child
+    finally:
+        for future in frontier:
+            future.cancel()
+        executor.shutdown(wait=True)
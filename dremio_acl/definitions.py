@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+
+import simplejson as json
+from six import string_types
+
+from .acl import acl_def_key, acl_fingerprint, build_acl_defs, canonical_acl
+from .jsonstream import iter_entities
+
+_SEP = u"\x1f"
+
+# magic, number of ACLs, number of keys, then the offsets of the ACL offsets, ACL blob, key offsets, key blob and ACL
+# ids of the keys. Bump the magic when the layout changes, artifacts are named after it
+_MAGIC = b"DACLDEF1"
+_HEADER = struct.Struct("<8sQQQQQQQ")
+_OFFSET = struct.Struct("<Q")
+_ID = struct.Struct("<I")
+
+
+def _encode(key):
+    return _SEP.join(key).encode("utf-8")
+
+
+def compile_defs(entities, filename, out=lambda x: x):
+    """
+    write ACL definitions to a compiled artifact
+
+    Keys are normalized with acl_def_key and sorted, so a key is found by binary search without reading the others.
+    ACLs that grant the same permissions are stored once and keys refer to them by number. When a path is defined
+    more than once the last definition wins, as with index_acl_defs.
+
+    :param entities: iterable of entity dicts with entityPath and accessControlList, e.g. from iter_entities
+    :param filename: artifact file to write
+    :param out: output function
+    :return: number of keys written
+    """
+    acl_ids = {}
+    acls = []
+    keys = {}
+    for entity in entities:
+        key = acl_def_key(entity["entityPath"])
+        encoded = _encode(key)
+        if encoded in keys:
+            out("Duplicate ACL definition for {}, using the last one".format("/".join(key)))
+        canonical = canonical_acl(entity["accessControlList"])
+        if canonical not in acl_ids:
+            acl_ids[canonical] = len(acls)
+            acls.append(json.dumps(entity["accessControlList"]).encode("utf-8"))
+        keys[encoded] = acl_ids[canonical]
+    order = sorted(keys)
+
+    def offsets(blobs):
+        position = 0
+        packed = [_OFFSET.pack(0)]
+        for blob in blobs:
+            position += len(blob)
+            packed.append(_OFFSET.pack(position))
+        return b"".join(packed)
+
+    sections = [offsets(acls), b"".join(acls), offsets(order), b"".join(order),
+                b"".join(_ID.pack(keys[k]) for k in order)]
+    starts = []
+    position = _HEADER.size
+    for section in sections:
+        starts.append(position)
+        position += len(section)
+    with open(filename, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(acls), len(order), *starts))
+        for section in sections:
+            f.write(section)
+    return len(order)
+
+
+class CompiledDefs(object):
+    def __init__(self, filename):
+        """
+        ACL definitions read from a compiled artifact through a memory map
+
+        Opening one reads nothing but its header. Keys are looked up by binary search in the mapped file and each
+        distinct ACL is decoded the first time a key needs it, so a run only pays for the definitions it compares
+        against. Serves as the index of acl_defs: get(key) returns a definition dict like index_acl_defs does.
+
+        :param filename: artifact written by compile_defs
+        """
+        self.filename = filename
+        self._file = open(filename, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = _HEADER.unpack_from(self._map, 0)
+        if header[0] != _MAGIC:
+            raise ValueError("{} is not a compiled ACL definitions file".format(filename))
+        (self._acl_count, self._key_count, self._acl_offsets, self._acl_blob, self._key_offsets, self._key_blob,
+         self._ids) = header[1:]
+        self._acls = {}
+        self._fingerprints = {}
+
+    def __len__(self):
+        return self._key_count
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _slice(self, offsets, blob, i):
+        start, end = struct.unpack_from("<QQ", self._map, offsets + i * _OFFSET.size)
+        return self._map[blob + start:blob + end]
+
+    def _find(self, key):
+        # number of the ACL of key, None if key is not defined
+        wanted = _encode(key)
+        lo, hi = 0, self._key_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found = self._slice(self._key_offsets, self._key_blob, mid)
+            if found == wanted:
+                return _ID.unpack_from(self._map, self._ids + mid * _ID.size)[0]
+            if found < wanted:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _acl(self, acl_id):
+        acl = self._acls.get(acl_id)
+        if acl is None:
+            acl = json.loads(self._slice(self._acl_offsets, self._acl_blob, acl_id).decode("utf-8"))
+            self._acls[acl_id] = acl
+        return acl
+
+    def get(self, key, default=None):
+        acl_id = self._find(key)
+        if acl_id is None:
+            return default
+        return {"entityPath": list(key), "accessControlList": self._acl(acl_id)}
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def acls(self):
+        """every distinct ACL of the definitions"""
+        for acl_id in range(self._acl_count):
+            yield self._acl(acl_id)
+
+    def fingerprint(self, key):
+        """acl_fingerprint of the ACL defined for key, computed once per distinct ACL"""
+        acl_id = self._find(key)
+        if acl_id is None:
+            raise KeyError(key)
+        fingerprint = self._fingerprints.get(acl_id)
+        if fingerprint is None:
+            fingerprint = acl_fingerprint(self._acl(acl_id))
+            self._fingerprints[acl_id] = fingerprint
+        return fingerprint
+
+
+class _Fingerprints(object):
+    # acl_defs['fingerprints'] of compiled definitions
+    def __init__(self, defs):
+        self._defs = defs
+
+    def __getitem__(self, key):
+        return self._defs.fingerprint(key)
+
+
+def _file_hash(filename):
+    digest = hashlib.sha1()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _stat_key(filename):
+    # size, modification time and inode stand in for the content hash as long as none of them changes
+    st = os.stat(filename)
+    stat = [os.path.abspath(filename), st.st_size, getattr(st, "st_mtime_ns", st.st_mtime), st.st_ino]
+    return hashlib.sha1(json.dumps(stat).encode("utf-8")).hexdigest()
+
+
+def _write_atomically(filename, write):
+    handle, tmp = tempfile.mkstemp(dir=os.path.dirname(filename), suffix=".tmp")
+    os.close(handle)
+    try:
+        write(tmp)
+        os.rename(tmp, filename)
+    except OSError:
+        # on Windows rename does not replace, another process wrote the same file first
+        if not os.path.exists(filename):
+            raise
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_acl_defs(acl_file, cache_dir=None, out=lambda x: x):
+    """
+    ACL definitions, from the compiled artifact of acl_file in cache_dir when there is one
+
+    Artifacts are named after the SHA-1 of the definitions file, so an edited file is compiled again and files with
+    the same content share one. The first run with a file parses it as a stream and compiles it. Later runs open the
+    artifact without parsing anything. The hash of a file is remembered against its size, modification time and
+    inode, so it is only read again when one of those changes.
+
+    :param acl_file: open ACL definitions file
+    :param cache_dir: directory to keep artifacts in, None to parse acl_file as build_acl_defs does
+    :param out: output function
+    :return: acl_defs for the compare functions
+    """
+    filename = getattr(acl_file, "name", None)
+    if cache_dir is None or not isinstance(filename, string_types) or not os.path.isfile(filename):
+        return build_acl_defs(acl_file, out)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    memo = os.path.join(cache_dir, "stat-" + _stat_key(filename))
+    digest = None
+    if os.path.exists(memo):
+        with open(memo) as f:
+            digest = f.read().strip()
+    artifact = os.path.join(cache_dir, "{}.{}".format(digest, _MAGIC.decode("ascii").lower())) if digest else None
+    if artifact is None or not os.path.exists(artifact):
+        digest = _file_hash(filename)
+        artifact = os.path.join(cache_dir, "{}.{}".format(digest, _MAGIC.decode("ascii").lower()))
+        if not os.path.exists(artifact):
+            out("Compiling ACL definitions {} into {}".format(filename, artifact))
+            _write_atomically(artifact, lambda tmp: compile_defs(iter_entities(acl_file), tmp, out))
+
+        def write_memo(tmp):
+            with open(tmp, "w") as f:
+                f.write(digest)
+        _write_atomically(memo, write_memo)
+    defs = CompiledDefs(artifact)
+    out("Loaded {} ACL definitions from {}".format(len(defs), artifact))
+    return {"index": defs, "fingerprints": _Fingerprints(defs)}
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from dremio_client.error import DremioException
+from dremio_client.model.endpoints import phase
+from .commit import backoff, is_retryable
+from .crawl import entity_path
+from .pipeline import stream
+from .privileges import PERMISSIONS, quoted_name, read_grants
+
+WRITERS = ("rest", "sql")
+
+# SQL grantee type of each accessControlList kind. Dremio has no GRANT ... TO GROUP, so groups are only written over
+# REST. Mapping them to ROLE would grant to a different principal than a PUT of the same ACL does
+_GRANTEES = {"users": "USER", "roles": "ROLE"}
+_OBJECTS = {"source": "SOURCE", "space": "SPACE", "folder": "FOLDER"}
+
+
+def check_sql_writable(acl):
+    """
+    make sure every principal of an accessControlList has a SQL grantee type
+
+    :param acl: accessControlList dict, may be None
+    :raise: ValueError naming the kinds that can only be written over REST
+    """
+    unwritable = sorted(kind for kind, principals in (acl or {}).items()
+                        if kind != "version" and principals and kind not in _GRANTEES)
+    if unwritable:
+        raise ValueError("{} can not be granted with SQL, Dremio has no grantee type for them. Write these ACLs with "
+                         "--write-acls-with rest".format(" and ".join(unwritable)))
+
+
+def _principals(acl):
+    # {(kind, id): set of permissions} of an accessControlList
+    check_sql_writable(acl)
+    principals = {}
+    for kind in _GRANTEES:
+        for principal in (acl or {}).get(kind) or []:
+            principals.setdefault((kind, principal["id"]), set()).update(principal.get("permissions") or [])
+    return principals
+
+
+def _object_keyword(obj, object_type=None):
+    if obj["entityType"] != "dataset":
+        return _OBJECTS[obj["entityType"]]
+    # bulk read datasets carry no type, fall back to what sys.privileges said and then to a PDS
+    if obj.get("type") == "VIRTUAL_DATASET" or object_type == "VDS":
+        return "VIEW"
+    return "TABLE"
+
+
+def grant_statements(obj, current, object_type=None, permissions=None):
+    """
+    the GRANT and REVOKE statements turning the current ACL of an object into the one it carries
+
+    Grants come before revokes so that no principal is left without access in between. All privileges granted to or
+    revoked from one principal go in one statement.
+
+    :param obj: catalog object carrying its new accessControlList
+    :param current: accessControlList the object has now
+    :param object_type: object type from sys.privileges, if known
+    :param permissions: dict of SQL privilege to ACL permission, PERMISSIONS if None
+    :raise: ValueError if either ACL has principals SQL can not grant to, see check_sql_writable
+    :return: list of statements
+    """
+    privileges = dict((v, k) for k, v in (permissions if permissions is not None else PERMISSIONS).items())
+    target = "{} {}".format(_object_keyword(obj, object_type), quoted_name(entity_path(obj)))
+    want = _principals(obj["accessControlList"])
+    have = _principals(current)
+    grants = []
+    revokes = []
+    for kind, pid in sorted(set(want) | set(have)):
+        grantee = "{} {}".format(_GRANTEES[kind], quoted_name([pid]))
+        added = sorted(privileges.get(p, p) for p in want.get((kind, pid), set()) - have.get((kind, pid), set()))
+        removed = sorted(privileges.get(p, p) for p in have.get((kind, pid), set()) - want.get((kind, pid), set()))
+        if added:
+            grants.append("GRANT {} ON {} TO {}".format(", ".join(added), target, grantee))
+        if removed:
+            revokes.append("REVOKE {} ON {} FROM {}".format(", ".join(removed), target, grantee))
+    return grants + revokes
+
+
+def _common_prefixes(paths):
+    # the longest common prefix of the paths under each top level container
+    prefixes = {}
+    for path in paths:
+        prefix = prefixes.get(path[0])
+        if prefix is None:
+            prefixes[path[0]] = list(path)
+            continue
+        i = 0
+        while i < len(prefix) and i < len(path) and prefix[i] == path[i]:
+            i += 1
+        del prefix[i:]
+    return [prefixes[root] for root in sorted(prefixes)]
+
+
+class SqlWriter(object):
+    def __init__(self, client, prefixes=None, permissions=None, sleep_time=0.2):
+        """
+        Write ACL changes as GRANT and REVOKE statements instead of PUTting each catalog object
+
+        The grants objects have now are read once, from sys.privileges, when the first object is written. Each object
+        then costs one SQL job per principal whose privileges change, however large its catalog document is. Needs a
+        Dremio edition with SQL privileges. Users and roles are granted to, an object whose new or current ACL has
+        groups fails, as SQL has no grantee type for them.
+
+        :param client: dremio client
+        :param prefixes: container paths holding every object that will be written, to read the current grants below.
+            None to work them out from the objects, which are then all read before the first is written
+        :param permissions: dict of SQL privilege to ACL permission, PERMISSIONS if None
+        :param sleep_time: seconds between job status checks
+        """
+        self._client = client
+        self._prefixes = prefixes
+        self._permissions = permissions
+        self._sleep_time = sleep_time
+        self._grants = None
+        self._lock = threading.Lock()
+
+    def _current(self, path):
+        with self._lock:
+            if self._grants is None:
+                self._grants = read_grants(self._client, self._prefixes, self._permissions)
+            return self._grants.pop(tuple(path), (None, {}))
+
+    def _wait(self, job_id):
+        # like query.run, without fetching the one row of results a GRANT returns
+        while True:
+            state = self._client.job_status(job_id)
+            if state["jobState"] == "COMPLETED":
+                return
+            if state["jobState"] in ("CANCELED", "FAILED"):
+                raise DremioException("job {} {}".format(job_id, state["jobState"].lower()), state.get("errorMessage"))
+            time.sleep(self._sleep_time)
+
+    def _run(self, statement, max_retries):
+        attempt = 0
+        while True:
+            try:
+                return self._wait(self._client.sql(statement)["id"])
+            except Exception as e:  # NOQA
+                if not is_retryable(e) or attempt >= max_retries:
+                    raise
+                attempt += 1
+                time.sleep(backoff(attempt))
+
+    def commit(self, objs, jobs=1, max_retries=5, out=lambda x: x, on_commit=None, deadline=None):
+        """
+        write every object's accessControlList, running the statements of up to `jobs` objects at once
+
+        Same contract as commit: objects are pulled lazily, failures are reported per object and returned.
+
+        :param objs: iterable of catalog objects carrying their new accessControlList
+        :param jobs: maximum number of concurrent SQL jobs
+        :param max_retries: maximum number of retries per statement on a retryable error
+        :param out: output function
+        :param on_commit: optional function called with each object once all its statements ran
+        :param deadline: optional time.time() after which no new objects are started and objs is not read any further
+        :return: list of objects that could not be written, in input order
+        """
+        if self._prefixes is None:
+            objs = list(objs)
+            self._prefixes = _common_prefixes([entity_path(obj) for obj in objs])
+        left = []
+
+        def pending():
+            for item in enumerate(objs):
+                if deadline is not None and time.time() >= deadline:
+                    # the rest of a lazy pipeline is never read, only the object in hand is returned as bad
+                    left.append(item)
+                    return
+                yield item
+
+        def write(item):
+            i, obj = item
+            path = entity_path(obj)
+            try:
+                object_type, current = self._current(path)
+            except Exception as e:  # NOQA
+                out("Unable to read the grants of {}: {}".format("/".join(path), e))
+                return i, obj, False
+            try:
+                statements = grant_statements(obj, current, object_type, self._permissions)
+            except ValueError as e:
+                out("Unable to commit {}: {}".format("/".join(path), e))
+                return i, obj, False
+            for statement in statements:
+                try:
+                    with phase("commit"):
+                        self._run(statement, max_retries)
+                except Exception as e:  # NOQA
+                    out("Unable to commit {}: {} failed: {}".format("/".join(path), statement, e))
+                    return i, obj, False
+            return i, obj, True
+
+        bad = []
+        for i, obj, ok in stream(pending(), write, jobs):
+            if ok:
+                if on_commit is not None:
+                    on_commit(obj)
+            else:
+                bad.append((i, obj))
+        if left:
+            out("Deadline reached, the objects not read yet are left for a later run")
+            bad.extend(left)
+        return [obj for _, obj in sorted(bad, key=lambda x: x[0])]
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+from dremio_client.error import DremioException
+from dremio_client.model.endpoints import phase
+
+ENUMERATORS = ("rest", "sql")
+
+# rows per results request, the most Dremio returns at once
+PAGE_SIZE = 500
+
+
+def _literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def under(column, names):
+    """
+    SQL condition matching the dotted names or anything below them. LIKE wildcards in names are escaped
+
+    :param column: column holding dotted names
+    :param names: list of dotted names
+    :return: condition in parentheses
+    """
+    conditions = []
+    for name in names:
+        like = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + ".%"
+        conditions.append("{0} = {1} OR {0} LIKE {2} ESCAPE '\\'".format(column, _literal(name), _literal(like)))
+    return "(" + " OR ".join(conditions) + ")"
+
+
+def _split(schema, prefixes):
+    """
+    the path of a dotted schema name below one of prefixes
+
+    INFORMATION_SCHEMA joins path components with dots. The prefix is known, only the rest is split on dots, so names
+    containing dots are only a problem below the base.
+    """
+    for prefix in prefixes:
+        joined = ".".join(prefix)
+        if schema == joined:
+            return list(prefix)
+        if schema.startswith(joined + "."):
+            return list(prefix) + schema[len(joined) + 1:].split(".")
+    return None
+
+
+def query_rows(client, query, phase_name="enumerate"):
+    """
+    rows of a query run through the REST api, fetched a page at a time as they are consumed
+
+    :param client: dremio client
+    :param query: sql query
+    :param phase_name: phase the waiting for the job and its pages is timed in
+    :return: generator of row dicts
+    """
+    pages = client.query(query, sleep_time=0.5, page_size=PAGE_SIZE)
+    while True:
+        with phase(phase_name):
+            page = next(pages, None)
+        if page is None:
+            return
+        for row in page.get("rows", []):
+            yield row
+
+
+def sql_dataset_paths(client, prefixes):
+    """
+    paths of the datasets below prefixes, listed by one INFORMATION_SCHEMA."TABLES" query
+
+    :param client: dremio client
+    :param prefixes: list of container paths
+    :return: generator of dataset paths, in no particular order
+    """
+    query = ('SELECT TABLE_SCHEMA, TABLE_NAME FROM INFORMATION_SCHEMA."TABLES" '
+             "WHERE TABLE_TYPE <> 'SYSTEM_TABLE' AND " + under("TABLE_SCHEMA", [".".join(p) for p in prefixes]))
+    for row in query_rows(client, query):
+        path = _split(row["TABLE_SCHEMA"], prefixes)
+        if path is not None:
+            yield path + [row["TABLE_NAME"]]
+
+
+def sql_container_paths(client, prefixes):
+    """
+    paths of the containers below prefixes, and of the prefixes themselves, listed by one INFORMATION_SCHEMA.SCHEMATA
+    query
+
+    :param client: dremio client
+    :param prefixes: list of container paths
+    :return: generator of container paths, in no particular order
+    """
+    query = ("SELECT SCHEMA_NAME FROM INFORMATION_SCHEMA.SCHEMATA WHERE " +
+             under("SCHEMA_NAME", [".".join(p) for p in prefixes]))
+    for row in query_rows(client, query):
+        path = _split(row["SCHEMA_NAME"], prefixes)
+        if path is not None:
+            yield path
+
+
+def with_fallback(paths, crawl, expect_rows=True, out=lambda x: x):
+    """
+    paths listed by a query, or by the crawler if the query cannot be used
+
+    The crawler takes over when the query fails before it returned anything, e.g. when INFORMATION_SCHEMA is not
+    accessible to the user, or when it finds nothing below a base that has children, e.g. when the source metadata
+    has not been refreshed since its datasets were promoted. Failures after the first rows are raised.
+
+    :param paths: generator of paths from sql_dataset_paths or sql_container_paths
+    :param crawl: function returning the paths as the crawler lists them
+    :param expect_rows: the base has children, so an empty result means the query missed them
+    :param out: output function
+    :return: generator of paths
+    """
+    paths = iter(paths)
+    try:
+        first = next(paths, None)
+    except DremioException as e:
+        out("Listing with INFORMATION_SCHEMA failed, crawling instead: {}".format(e))
+        first = None
+    else:
+        if first is not None or not expect_rows:
+            if first is not None:
+                yield first
+            for path in paths:
+                yield path
+            return
+        out("INFORMATION_SCHEMA lists nothing below a non empty base, crawling instead")
+    for path in crawl():
+        yield path
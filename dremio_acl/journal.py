@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+
+import simplejson as json
+
+
+class Journal(object):
+    def __init__(self, filename, resume=False, sync_every=500):
+        """
+        Append only record of the entities a run has checked and committed
+
+        Every record is one JSON line. Lines are flushed and fsynced in batches of `sync_every` records and on
+        checkpoint, so a run that dies loses at most one batch of progress. A resumed journal is cut back to its last
+        complete line first, so records appended after a line the dead run left half written stay readable.
+
+        :param filename: journal file
+        :param resume: keep the existing journal and skip the work it records as done, otherwise start a new one
+        :param sync_every: number of records between fsyncs
+        """
+        self._done = set()
+        if resume and os.path.exists(filename):
+            self._done, complete = self._load(filename)
+            if complete < os.path.getsize(filename):
+                with open(filename, "r+b") as f:
+                    f.truncate(complete)
+        self._file = open(filename, "a" if resume else "w")
+        self._sync_every = sync_every
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load(filename):
+        # (paths done, length of the file up to the end of its last complete line)
+        done = set()
+        complete = 0
+        with open(filename, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # the last line is half written if the run was killed
+                    break
+                complete += len(line)
+                try:
+                    record = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    continue
+                if record["op"] == "committed" or (record["op"] == "checked" and not record["dirty"]):
+                    done.add(tuple(record["path"]))
+        return done, complete
+
+    def __len__(self):
+        return len(self._done)
+
+    def is_done(self, path):
+        """True if a previous run found the entity at path correct or committed it"""
+        return tuple(path) in self._done
+
+    def checked(self, path, cid, dirty):
+        self._append({"op": "checked", "path": list(path), "id": cid, "dirty": dirty})
+
+    def committed(self, path, cid):
+        self._append({"op": "committed", "path": list(path), "id": cid})
+
+    def _append(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._pending += 1
+            if self._pending >= self._sync_every:
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def checkpoint(self):
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            self._file.close()
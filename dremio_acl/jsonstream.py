@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import codecs
+
+import simplejson as json
+
+_WHITESPACE = " \t\n\r"
+
+
+class _Reader(object):
+    def __init__(self, f, chunk_size):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buf = u""
+        self._pos = 0
+        self._eof = False
+
+    def _more(self):
+        # append the next chunk, False at the end of the file
+        if self._eof:
+            return False
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        if isinstance(chunk, bytes):
+            chunk = self._text.decode(chunk)
+        if self._pos > self._chunk_size:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        self._buf += chunk
+        return True
+
+    def peek(self):
+        """the next character that is not whitespace, None at the end of the file"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._more():
+                return None
+
+    def expect(self, c):
+        if self.peek() != c:
+            raise ValueError("Expected {!r} at character {} of the ACL definitions".format(c, self._pos))
+        self._pos += 1
+
+    def value(self):
+        """the next JSON value, reading as much of the file as it takes"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                if self._more():
+                    continue
+                raise
+            # a number may go on in the next chunk
+            if end == len(self._buf) and self._more():
+                continue
+            self._pos = end
+            return value
+
+
+def iter_entities(f, chunk_size=1 << 20):
+    """
+    the entities of an ACL definitions file, parsed one at a time
+
+    Only the chunk being parsed is held in memory, not the whole document. Other top level keys are parsed and
+    dropped.
+
+    :param f: open ACL definitions file, text or binary
+    :param chunk_size: characters or bytes read at a time
+    :raise: ValueError if the file is not a JSON object
+    :return: generator of entity dicts with entityPath and accessControlList
+    """
+    reader = _Reader(f, chunk_size)
+    reader.expect("{")
+    while True:
+        c = reader.peek()
+        if c == "}":
+            return
+        if c == ",":
+            reader.expect(",")
+            continue
+        key = reader.value()
+        reader.expect(":")
+        if key != "entities":
+            reader.value()
+            continue
+        reader.expect("[")
+        while True:
+            c = reader.peek()
+            if c == "]":
+                reader.expect("]")
+                break
+            if c == ",":
+                reader.expect(",")
+                continue
+            if c is None:
+                raise ValueError("ACL definitions end inside the entities list")
+            yield reader.value()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import os
+
+import click
+import simplejson as json
+from six import string_types
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    NO_PYARROW = False
+except ImportError:
+    NO_PYARROW = True
+
+FORMATS = ("json", "parquet", "arrow")
+_EXTENSIONS = {"json": ".json", "parquet": ".parquet", "arrow": ".arrows"}
+_NO_PYARROW = "{} needs pyarrow, install it with: pip install dremio_acl[arrow]"
+# the principal kinds of an accessControlList, each a list of principals with their permissions
+PRINCIPAL_KINDS = ("users", "groups", "roles")
+
+
+def _schema(kind):
+    # principals, permissions and entity types repeat across most rows so they are dictionary encoded
+    names = pa.dictionary(pa.int32(), pa.string())
+    principal = pa.struct([("id", names), ("permissions", pa.list_(names))])
+    acl = pa.struct([(kind, pa.list_(principal)) for kind in PRINCIPAL_KINDS] + [("version", pa.string())])
+    fields = [("id", pa.string()), ("path", pa.list_(pa.string()))]
+    if kind == "space_dump":
+        fields.append(("entityType", names))
+    if kind == "report":
+        fields.append(("aclReport", pa.string()))
+    else:
+        fields.append(("accessControlList", acl))
+    return pa.schema(fields)
+
+
+class JsonWriter(object):
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, "a")
+
+    def write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class ColumnarWriter(object):
+    def __init__(self, filename, fmt, kind, batch_size=10000):
+        """
+        Write records as batches of Arrow columns to a Parquet file or an Arrow IPC stream
+
+        :param filename: file to write
+        :param fmt: parquet or arrow
+        :param kind: dump, space_dump or report, the shape of the records
+        :param batch_size: number of records per record batch
+        """
+        self.filename = filename
+        self._schema = _schema(kind)
+        self._batch_size = batch_size
+        self._rows = []
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(filename, self._schema, compression="zstd")
+        else:
+            # the stream format allows each batch to carry its own dictionaries
+            self._writer = pa.ipc.new_stream(filename, self._schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+
+    def write(self, record):
+        unknown = set(record.get("accessControlList") or {}) - set(PRINCIPAL_KINDS + ("version",))
+        if unknown:
+            # from_pydict would drop them without a word
+            raise ValueError("{} output has no column for ACL {} of {}".format(
+                os.path.splitext(self.filename)[1], ", ".join(sorted(unknown)), "/".join(record["path"])))
+        acl = record.get("accessControlList")
+        if acl and acl.get("version") is not None and not isinstance(acl["version"], string_types):
+            # the version tag is a string in most Dremio versions and a number in some
+            record = dict(record, accessControlList=dict(acl, version=str(acl["version"])))
+        self._rows.append(record)
+        if len(self._rows) >= self._batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        columns = dict((name, [row.get(name) for row in self._rows]) for name in self._schema.names)
+        self._writer.write_table(pa.Table.from_pydict(columns, schema=self._schema))
+        self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def open_output(basename, fmt="json", kind="dump"):
+    """
+    open a writer for dump or report records
+
+    :param basename: path of the file to write, without extension
+    :param fmt: json (one document per line), parquet or arrow
+    :param kind: dump, space_dump or report, the shape of the records
+    :return: writer with write(record), close() and filename
+    """
+    if fmt == "json":
+        return JsonWriter(basename + _EXTENSIONS[fmt])
+    if NO_PYARROW:
+        raise click.UsageError(_NO_PYARROW.format("{} output".format(fmt)))
+    return ColumnarWriter(basename + _EXTENSIONS[fmt], fmt, kind)
+
+
+def merge_outputs(filenames, filename):
+    """
+    concatenate dump, report or plan files, e.g. those written by the shards of a run, into one
+
+    Parquet and Arrow files are told apart by their extension and need pyarrow, anything else is copied line by line.
+
+    :param filenames: files to merge, all of the same kind
+    :param filename: file to write
+    :return: filename
+    """
+    ext = os.path.splitext(filename)[1]
+    if ext not in (_EXTENSIONS["parquet"], _EXTENSIONS["arrow"]):
+        with open(filename, "w") as merged:
+            for name in filenames:
+                with open(name) as f:
+                    for line in f:
+                        merged.write(line if line.endswith("\n") else line + "\n")
+        return filename
+    if NO_PYARROW:
+        raise click.UsageError(_NO_PYARROW.format("merging {} files".format(ext)))
+    writer = None
+    for name in filenames:
+        if ext == _EXTENSIONS["parquet"]:
+            tables = [pq.read_table(name)]
+        else:
+            with pa.ipc.open_stream(name) as reader:
+                tables = [pa.Table.from_batches([batch], reader.schema) for batch in reader]
+        for table in tables:
+            if writer is None:
+                writer = pq.ParquetWriter(filename, table.schema, compression="zstd") if ext == _EXTENSIONS["parquet"] \
+                    else pa.ipc.new_stream(filename, table.schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+            writer.write_table(table)
+    if writer is not None:
+        writer.close()
+    return filename
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from six.moves.queue import Queue
+
+_DONE = object()
+
+
+def stream(items, worker, jobs=1, queue_size=1000):
+    """
+    run worker over items on a pool of threads and yield the results as they are ready
+
+    Items are pulled from their iterable on a thread of their own. The producer blocks once `queue_size` items are
+    waiting for a worker and workers block once `queue_size` results are waiting for the consumer, so memory is bounded
+    by the queue sizes rather than by the number of items, and reading, processing and consuming overlap.
+
+    :param items: iterable of work items, may be lazy
+    :param worker: function of one item returning a result, or None for nothing to yield
+    :param jobs: number of worker threads
+    :param queue_size: maximum number of items and of results waiting between stages
+    :return: generator of results, in completion order
+    """
+    jobs = max(1, jobs)
+    inbox = Queue(maxsize=queue_size)
+    outbox = Queue(maxsize=queue_size)
+    errors = []
+
+    def produce():
+        try:
+            for item in items:
+                inbox.put(item)
+        except Exception as e:  # NOQA
+            errors.append(e)
+        finally:
+            for _ in range(jobs):
+                inbox.put(_DONE)
+
+    def work():
+        try:
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                result = worker(item)
+                if result is not None:
+                    outbox.put(result)
+        except Exception as e:  # NOQA
+            errors.append(e)
+        finally:
+            outbox.put(_DONE)
+
+    threads = [threading.Thread(target=produce)] + [threading.Thread(target=work) for _ in range(jobs)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    finished = 0
+    while finished < jobs:
+        result = outbox.get()
+        if result is _DONE:
+            finished += 1
+            continue
+        yield result
+    if errors:
+        raise errors[0]
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+from .acl import acl_index, canonical_acl, in_phase, merge_acl, read_pds, superset_acl
+from .crawl import CatalogStore, crawl_containers, entity_path, walk
+from .pipeline import stream
+
+_EMPTY = frozenset()
+# all a change plan entry is written from
+_KEPT = ("id", "tag", "path", "entityType", "accessControlList")
+
+
+def acl_grants(acl):
+    """
+    the grants of an accessControlList as a set, so ACLs can be intersected and subtracted
+
+    :param acl: accessControlList dict
+    :return: frozenset of (principal kind, principal id, permission)
+    """
+    return frozenset((kind, pid, perm) for kind, principals in canonical_acl(acl)
+                     for pid, perms in principals for perm in perms)
+
+
+def grants_acl(grants):
+    superset = {}
+    for kind, pid, perm in grants:
+        merge_acl(superset, {kind: [{"id": pid, "permissions": [perm]}]})
+    return superset_acl(superset)
+
+
+def _target(acl_defs, default_acl, path):
+    acls = acl_index(acl_defs).get(tuple(path))
+    return acl_grants(acls["accessControlList"] if acls is not None else default_acl["accessControlList"])
+
+
+def common_grants(targets, base, listings, children):
+    """
+    the grants every dataset below each container needs, i.e. the most a container can carry for its datasets
+
+    Containers without a dataset below them constrain nothing and are left out of the intersection of their parent.
+
+    :param targets: dict of dataset path tuple to the grants of its target ACL
+    :param base: path tuple of the container to start from
+    :param listings: dict of container path tuple to child listing, from crawl_containers
+    :param children: child listing of base
+    :return: dict of container path tuple to frozenset of grants, None for containers without datasets below them
+    """
+    common = {}
+    for path in sorted(listings, key=len, reverse=True) + [base]:
+        shared = None
+        for child in children if path == base else listings[path]:
+            if child["type"] == "DATASET":
+                grants = targets[tuple(child["path"])]
+            elif child["type"] == "CONTAINER":
+                grants = common[tuple(child["path"])]
+            else:
+                continue
+            if grants is not None:
+                shared = grants if shared is None else shared & grants
+        common[path] = shared
+    return common
+
+
+def place_acls(targets, current, folders, base, listings, children, hoist=True):
+    """
+    work out the grants each container carries so that every PDS gets its target ACL with the fewest writes
+
+    A PDS ends up with its own ACL plus the ACLs of every container above it. Each container keeps its ACL where that
+    grants nothing a dataset below does not need, has it cleared, or carries every grant its datasets have in common
+    that it does not inherit yet. A container is written when what it carries differs from its ACL, a PDS when its ACL
+    differs from its target less what it inherits. Each subtree takes the choice with the fewest writes for what it
+    inherits, so hoisting only happens where it saves writes. Containers without datasets below them keep their ACL.
+
+    :param targets: dict of dataset path tuple to the grants of its target ACL
+    :param current: dict of dataset path tuple to the grants of its ACL now. Datasets left out could not be read, they
+        constrain what their containers carry but are not written
+    :param folders: dict of container path tuple to the grants of its ACL now, base included
+    :param base: path tuple of the container to start from
+    :param listings: dict of container path tuple to child listing, from crawl_containers
+    :param children: child listing of base
+    :param hoist: False to only keep or clear container ACLs, which is what setting each PDS directly costs
+    :return: (number of writes, dict of container path tuple to the grants set on it, dict of container path tuple
+        to the grants its children inherit)
+    """
+    common = common_grants(targets, base, listings, children)
+    below = {}
+    best = {}
+
+    def writes_below(path, inherited):
+        # writes for the datasets and sub containers of path when they inherit `inherited`
+        key = (path, inherited)
+        if key not in below:
+            writes = 0
+            for child in children if path == base else listings[path]:
+                child_path = tuple(child["path"])
+                if child["type"] == "DATASET":
+                    own = current.get(child_path)
+                    writes += own is not None and own != targets[child_path] - inherited
+                elif child["type"] == "CONTAINER":
+                    writes += choose(child_path, inherited)[0]
+            below[key] = writes
+        return below[key]
+
+    def choose(path, inherited):
+        # (writes, grants path carries itself) of the cheapest choice for path and everything below it
+        key = (path, inherited)
+        if key not in best:
+            own = folders[path]
+            if common[path] is None:
+                best[key] = (0, own)
+                return best[key]
+            options = [own] if inherited | own <= common[path] else []
+            options.append(_EMPTY)
+            if hoist:
+                options.append(common[path] - inherited)
+            found = None
+            for option in options:
+                writes = (option != own) + writes_below(path, inherited | option)
+                if found is None or writes < found[0]:
+                    found = (writes, option)
+            best[key] = found
+        return best[key]
+
+    placed = {}
+    carried = {}
+
+    def assign(path, inherited):
+        placed[path] = choose(path, inherited)[1]
+        carried[path] = inherited | placed[path]
+        for child in children if path == base else listings[path]:
+            if child["type"] == "CONTAINER":
+                assign(tuple(child["path"]), carried[path])
+
+    writes = choose(base, _EMPTY)[0]
+    assign(base, _EMPTY)
+    return writes, placed, carried
+
+
+def placement_changes(client, acl_defs, source_folder, default_acl, out=lambda x: x, jobs=1, store=None):
+    """
+    smallest set of ACL writes below source_folder giving every PDS its target ACL
+
+    Grants shared by the datasets of a folder are set once on the folder where that takes fewer writes than setting
+    them on each PDS, and each PDS keeps only what it does not inherit. Every PDS is read before anything is decided.
+    Only objects whose ACL differs from what they carry now are yielded, PDSs without their read only fields such as
+    the schema. Folder definitions in acl_defs are not used.
+
+    :return: generator of (object, reason), reason is hoist for containers and placement for PDSs
+    """
+    store = store if store is not None else CatalogStore(client)
+    base = tuple(entity_path(source_folder))
+    children = source_folder.get("children", [])
+    listings = crawl_containers(client, children, jobs, store)
+    # the same target grants are shared between datasets rather than held once per dataset
+    interned = {}
+    targets = {}
+    for path in walk(children, listings):
+        grants = _target(acl_defs, default_acl, path)
+        targets[tuple(path)] = interned.setdefault(grants, grants)
+    containers = dict((path, source_folder if path == base else store.get(path)) for path in [base] + sorted(listings))
+    folders = dict((path, acl_grants(folder.get("accessControlList"))) for path, folder in containers.items())
+
+    read = read_pds(store, out)
+    current = {}
+    pdss = {}
+
+    def check(dataset_path):
+        pds = read(dataset_path)
+        if pds is None:
+            return None
+        return dict((k, pds[k]) for k in _KEPT if k in pds)
+
+    for pds in stream(walk(children, listings), in_phase("compare", check), jobs):
+        grants = acl_grants(pds["accessControlList"])
+        current[tuple(pds["path"])] = interned.setdefault(grants, grants)
+        pdss[tuple(pds["path"])] = pds
+
+    writes, placed, carried = place_acls(targets, current, folders, base, listings, children)
+    direct = place_acls(targets, current, folders, base, listings, children, hoist=False)[0]
+    for path in sorted(containers):
+        if placed[path] != folders[path]:
+            folder = containers[path]
+            folder["accessControlList"] = grants_acl(placed[path])
+            out("Hoisted ACLs to {}".format("/".join(path)))
+            yield folder, "hoist"
+    for path in walk(children, listings):
+        pds = pdss.pop(tuple(path), None)
+        if pds is None:
+            continue
+        own = targets[tuple(path)] - carried[tuple(path[:-1])]
+        if own != current[tuple(path)]:
+            pds["accessControlList"] = grants_acl(own)
+            yield pds, "placement"
+    out("Placement needs {} writes, setting each PDS directly would need {}".format(writes, direct))
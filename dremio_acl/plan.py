@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import simplejson as json
+from six.moves.urllib.parse import quote
+from .acl import submit
+from .crawl import entity_path
+
+
+class _PlannedStore(object):
+    def __init__(self, client):
+        """
+        Reads the document to PUT for each planned entry, which only carries what is needed to write its ACL
+
+        :param client: dremio client
+        """
+        self._client = client
+
+    def prepare(self, obj):
+        """fetch the full entity, keeping the tag it was planned against so that a changed entity is a conflict"""
+        full = self._client.catalog_item(quote(obj["id"], safe=""), None)
+        full["tag"] = obj["tag"]
+        full["accessControlList"] = obj["accessControlList"]
+        return full
+
+
+def plan_entry(obj, reason):
+    """
+    turn a changed catalog object into a change plan entry
+
+    :param obj: catalog object carrying its new accessControlList
+    :param reason: why the ACL changed, one of mismatch, revoke, default, hoist or placement
+    :return: dict with id, tag, path, entityType, accessControlList and reason
+    """
+    return {"id": obj["id"], "tag": obj.get("tag"), "path": entity_path(obj), "entityType": obj["entityType"],
+            "reason": reason, "accessControlList": obj["accessControlList"]}
+
+
+def write_plan(changes, plan_file, out=lambda x: x, on_done=None):
+    """
+    write a change plan as one JSON document per line
+
+    :param changes: iterable of (object, reason) as produced by acl_changes, space_acl_changes or placement_changes
+    :param plan_file: path of the plan file to write
+    :param out: output function
+    :param on_done: optional function called with the path of each object once its entry is written, e.g.
+        shard.QueueShard.done
+    :return: number of entries written
+    """
+    count = 0
+    with open(plan_file, "w") as f:
+        for obj, reason in changes:
+            f.write(json.dumps(plan_entry(obj, reason)) + "\n")
+            count += 1
+            if on_done is not None:
+                on_done(entity_path(obj))
+    out("Plan complete. {} objects need updating. See file {} for details.".format(count, plan_file))
+    return count
+
+
+def read_plan(plan_file):
+    """
+    read a change plan back
+
+    :param plan_file: open plan file
+    :return: generator of objects with id, tag, path, entityType and accessControlList, and name for spaces
+    """
+    for line in plan_file:
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        obj = {"id": entry["id"], "tag": entry["tag"], "path": entry["path"], "entityType": entry["entityType"],
+               "accessControlList": entry["accessControlList"]}
+        if obj["entityType"] == "space":
+            obj["name"] = obj["path"][0]
+        yield obj
+
+
+def apply_plan(client, plan_file, jobs=1, max_retries=5, out=lambda x: x, journal=None, deadline=None, writer=None):
+    """
+    commit every entry of a change plan without listing the catalog again
+
+    Entries are read from the plan as they are committed. PUTs read the entity of each entry by id first, a writer
+    such as grants.SqlWriter needs no more than the entry.
+
+    :param client: dremio client
+    :param plan_file: open plan file
+    :param jobs: maximum number of concurrent PUTs
+    :param max_retries: maximum number of retries per entry
+    :param out: output function
+    :param journal: optional Journal, entries it records as committed are skipped and new commits are recorded
+    :param deadline: optional time.time() after which no new PUTs are started
+    :param writer: optional writer to commit with instead of PUTs, e.g. a grants.SqlWriter
+    :return: list of objects that could not be committed
+    """
+    objs = (obj for obj in read_plan(plan_file) if journal is None or not journal.is_done(entity_path(obj)))
+    out("Applying the planned changes")
+    return submit(client, objs, jobs, max_retries, out, _PlannedStore(client), journal, deadline, writer)
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from six.moves.urllib.parse import quote
+
+from .crawl import CatalogStore
+from .information_schema import query_rows, under
+
+READERS = ("rest", "sql")
+
+# SQL privileges as they appear in the permissions of a catalog accessControlList. Other privileges are kept as they are
+PERMISSIONS = {"SELECT": "READ", "ALTER": "WRITE"}
+
+# grantee types of sys.privileges and the accessControlList kind each is listed under
+_GRANTEES = {"user": "users", "role": "roles", "group": "groups"}
+
+
+def parse_object_id(object_id):
+    """
+    path of a dotted object name, whose components may be double quoted
+
+    :param object_id: e.g. "my.source".folder.pds
+    :return: list of path components
+    """
+    path = []
+    name = []
+    quoted = False
+    i = 0
+    while i < len(object_id):
+        c = object_id[i]
+        if c == '"':
+            if quoted and object_id[i + 1:i + 2] == '"':
+                name.append('"')
+                i += 1
+            else:
+                quoted = not quoted
+        elif c == "." and not quoted:
+            path.append("".join(name))
+            name = []
+        else:
+            name.append(c)
+        i += 1
+    path.append("".join(name))
+    return path
+
+
+def quoted_name(path):
+    """the SQL name of a path, every component double quoted"""
+    return ".".join('"' + p.replace('"', '""') + '"' for p in path)
+
+
+def read_grants(client, prefixes, permissions=None):
+    """
+    the ACLs of every object with a grant below prefixes, from one sys.privileges query
+
+    :param client: dremio client
+    :param prefixes: list of container paths
+    :param permissions: dict of SQL privilege to ACL permission, PERMISSIONS if None
+    :return: dict of path tuple to (object type, accessControlList)
+    """
+    permissions = permissions if permissions is not None else PERMISSIONS
+    names = [".".join(p) for p in prefixes] + [quoted_name(p) for p in prefixes]
+    query = ("SELECT grantee_type, grantee_id, privilege, object_type, object_id FROM sys.privileges WHERE " +
+             under("object_id", names))
+    grants = {}
+    for row in query_rows(client, query, "read"):
+        kind = _GRANTEES.get((row["grantee_type"] or "").lower())
+        if kind is None:
+            continue
+        key = tuple(parse_object_id(row["object_id"]))
+        object_type, principals = grants.setdefault(key, (row["object_type"], {}))
+        granted = principals.setdefault(kind, {}).setdefault(row["grantee_id"], set())
+        granted.add(permissions.get(row["privilege"], row["privilege"]))
+    return dict((key, (object_type, dict((kind, [{"id": pid, "permissions": sorted(granted)}
+                                                 for pid, granted in sorted(ids.items())])
+                                         for kind, ids in principals.items())))
+                for key, (object_type, principals) in grants.items())
+
+
+class PrivilegeStore(CatalogStore):
+    def __init__(self, client, prefixes, permissions=None):
+        """
+        CatalogStore that reads the ACLs of datasets in bulk from sys.privileges instead of with one GET each
+
+        Needs a Dremio edition with the sys.privileges table. Everything that is not a dataset known from a child
+        listing or an INFORMATION_SCHEMA listing, such as the base and its folders, is still read over REST. Datasets
+        come back with their id, path, entityType and accessControlList only; tag is None, prepare fetches the full
+        entity before it is written. The id comes from the child listing. Datasets only INFORMATION_SCHEMA listed get
+        theirs from one GET of their folder, which resolves the ids of their listed siblings too.
+
+        :param client: dremio client
+        :param prefixes: list of container paths whose datasets are read in bulk
+        :param permissions: dict of SQL privilege to ACL permission, PERMISSIONS if None
+        """
+        super(PrivilegeStore, self).__init__(client, track_datasets=True)
+        self._prefixes = [list(p) for p in prefixes]
+        self._permissions = permissions
+        self._grants = None
+        self._load_lock = threading.Lock()
+        self._folder_locks = {}
+
+    def _load(self):
+        with self._load_lock:
+            if self._grants is None:
+                self._grants = read_grants(self._client, self._prefixes, self._permissions)
+            return self._grants
+
+    def _in_bulk(self, path, keep=True):
+        if not any(list(path[:len(p)]) == p for p in self._prefixes):
+            return False, None
+        return self._listed(path, keep)
+
+    def _resolve_id(self, path):
+        # one GET of the folder per run fills in the ids of every dataset in it that was listed without one
+        folder = tuple(path[:-1])
+        with self._lock:
+            lock = self._folder_locks.setdefault(folder, threading.Lock())
+        with lock:
+            with self._lock:
+                cid = self._datasets.get(tuple(path))
+            if cid is not None:
+                return cid
+            children = self._client.catalog_item(None, list(folder)).get("children", [])
+            with self._lock:
+                for child in children:
+                    key = tuple(child["path"])
+                    if child["type"] == "DATASET" and key in self._datasets and self._datasets[key] is None:
+                        self._datasets[key] = child.get("id")
+                    if key == tuple(path):
+                        cid = child.get("id")
+                self._folder_locks.pop(folder, None)
+        return cid
+
+    def get(self, path, keep=True):
+        listed, cid = self._in_bulk(path, keep=True)
+        if not listed:
+            return super(PrivilegeStore, self).get(path, keep)
+        if cid is None:
+            cid = self._resolve_id(path)
+        if not keep:
+            self._listed(path, keep=False)
+        if cid is None:
+            # not in its folder any more, read it over REST like anything else
+            return super(PrivilegeStore, self).get(path, keep)
+        grants = self._load()
+        with self._lock:
+            grant = grants.get(tuple(path)) if keep else grants.pop(tuple(path), None)
+        return {"id": cid, "path": list(path), "entityType": "dataset", "tag": None,
+                "accessControlList": grant[1] if grant is not None else {}}
+
+    def prepare(self, obj):
+        """fetch the full entity to PUT for a dataset read in bulk"""
+        if obj.get("tag") is not None:
+            return obj
+        full = self._client.catalog_item(quote(obj["id"], safe=""), None)
+        full["accessControlList"] = obj["accessControlList"]
+        return full
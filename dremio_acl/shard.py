@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+import simplejson as json
+
+_SEP = u"\x1f"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    worker TEXT,
+    leased REAL,
+    done INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS items_free ON items (done, leased);
+CREATE TABLE IF NOT EXISTS workers (
+    worker TEXT PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL,
+    summary TEXT,
+    output TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _key(path):
+    return _SEP.join(path)
+
+
+def _jump(key, buckets):
+    # Lamping and Veach, "A Fast, Minimal Memory, Consistent Hash Algorithm"
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return b
+
+
+def shard_of(path, count):
+    """
+    the shard of count a path belongs to. The hash only depends on the path, so every process agrees on it
+
+    Paths are spread with jump consistent hash: going from N to N + 1 shards moves only 1/(N + 1) of the paths, all of
+    them to the new shard, where a hash modulo the count would move nearly all of them. The journal of a shard stays
+    valid for the paths that are still its own after a rerun with more shards.
+    """
+    return _jump(int(hashlib.md5(_key(path).encode("utf-8")).hexdigest()[:16], 16), count)
+
+
+def parse_shard(spec):
+    """
+    parse a shard given as I/N
+
+    :param spec: e.g. 2/8 for the third of eight shards
+    :raise: ValueError if spec is not I/N with 0 <= I < N
+    :return: (index, count)
+    """
+    index, sep, count = spec.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError("shard must be given as I/N, not " + spec)
+    if not sep or count < 1 or not 0 <= index < count:
+        raise ValueError("shard must be I/N with 0 <= I < N, not " + spec)
+    return index, count
+
+
+class HashShard(object):
+    def __init__(self, index, count):
+        """
+        Static share of a run: the entities whose path hashes to index out of count shards
+
+        Run count processes with the same bases and indexes 0 to count - 1 and every entity is processed by exactly one
+        of them, without the processes talking to each other. Each still resolves the bases and lists their datasets.
+
+        :param index: this shard, from 0 to count - 1
+        :param count: number of shards
+        """
+        self.index = index
+        self.count = count
+        self.name = "shard{}of{}".format(index, count)
+        # the paths of a shard are known up front, readers may queue as many as they like
+        self.prefetch = None
+
+    def owns(self, path):
+        return shard_of(path, self.count) == self.index
+
+    def select(self, paths):
+        """the paths of this shard"""
+        for path in paths:
+            if self.owns(path):
+                yield path
+
+    def done(self, path):
+        """nothing to record, the paths of a shard are the same every run"""
+
+
+class QueueShard(object):
+    def __init__(self, filename, worker=None, batch_size=50, lease=600, poll=0.5):
+        """
+        Dynamic share of a run, taken a batch of datasets at a time from a work queue held in a SQLite file
+
+        The first process to open the queue fills it with the datasets it lists, and checks the databases and folders
+        of the bases. Every process, the first one included, takes the next batch of datasets whenever it is ready for
+        more, so a slow process holds up no one else. A dataset counts as done once the process that took it called
+        done, after finding it correct, committing it or writing its record. A process renews the lease of the datasets
+        it holds while it runs. Those of a process that died, and those a finished process failed to read, commit or
+        write, are taken again after `lease` seconds, by a later run with the same queue file if every other process is
+        done by then. Delete the file to start over.
+
+        The file must be on storage every process can lock, a local disk for processes on one host.
+
+        :param filename: SQLite file, created if it does not exist
+        :param worker: name of this process in the queue, host and process id if None
+        :param batch_size: number of datasets taken at a time
+        :param lease: seconds after which a batch that is not done, or a fill that stopped, is taken over
+        :param poll: seconds to wait for the queue to be filled further
+        """
+        self.filename = filename
+        self.name = worker if worker is not None else "{}-{}".format(socket.gethostname(), os.getpid())
+        self._batch_size = batch_size
+        # paths queued up in this process are paths no other process can take
+        self.prefetch = batch_size
+        self._lease = lease
+        self._poll = poll
+        # ids of the datasets taken and not done yet by key, and of those done but not recorded in the queue yet
+        self._leased = {}
+        self._finished = []
+        self._done_lock = threading.Lock()
+        self._renewed = time.time()
+        self._conn = self._connect()
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute("INSERT OR REPLACE INTO workers (worker, started) VALUES (?, ?)", (self.name, time.time()))
+        self.filler = self._take("filler", None)
+        self._fill_error = []
+
+    def _connect(self):
+        # autocommit, transactions are begun explicitly where reads and writes have to go together
+        return sqlite3.connect(self.filename, timeout=60, isolation_level=None, check_same_thread=False)
+
+    def _meta(self, conn, key):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _take(self, key, current):
+        # set meta key to this worker if it is still current, True if this worker has it now
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._meta(conn, key) == current:
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, self.name))
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('heartbeat', ?)", (str(time.time()),))
+            taken = self._meta(conn, key) == self.name
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return taken
+
+    def owns(self, path):
+        """containers are checked by the process that fills the queue"""
+        return self.filler
+
+    def _fill(self, paths):
+        conn = self._connect()
+        try:
+            batch = []
+            for path in paths:
+                batch.append((_key(path),))
+                if len(batch) >= self._batch_size:
+                    self._insert(conn, batch)
+                    batch = []
+            self._insert(conn, batch)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('filled', '1')")
+        except Exception as e:  # NOQA
+            self._fill_error.append(e)
+        finally:
+            conn.close()
+
+    def _insert(self, conn, batch):
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("INSERT OR IGNORE INTO items (key) VALUES (?)", batch)
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('heartbeat', ?)", (str(time.time()),))
+        conn.execute("COMMIT")
+
+    def _start_fill(self, paths):
+        thread = threading.Thread(target=self._fill, args=(paths,))
+        thread.daemon = True
+        thread.start()
+
+    def done(self, path):
+        """
+        record that this process is done with a dataset it took. Safe to call from any thread, and for paths that did
+        not come from the queue, which are ignored. The queue learns about it with the next batch taken, or at finish
+
+        :param path: dataset path
+        """
+        with self._done_lock:
+            cid = self._leased.pop(_key(path), None)
+            if cid is not None:
+                self._finished.append(cid)
+
+    def _take_finished(self):
+        with self._done_lock:
+            finished, self._finished = self._finished, []
+        return finished
+
+    def _mark_done(self, conn, finished):
+        conn.executemany("UPDATE items SET done = 1 WHERE id = ?", [(i,) for i in finished])
+
+    def _claim(self):
+        now = time.time()
+        finished = self._take_finished()
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._mark_done(conn, finished)
+            if now - self._renewed > self._lease / 4.0:
+                # datasets this process failed on stay its own until it finishes
+                conn.execute("UPDATE items SET leased = ? WHERE worker = ? AND done = 0", (now, self.name))
+                self._renewed = now
+            rows = conn.execute("SELECT id, key FROM items WHERE done = 0 AND (leased IS NULL OR leased < ?) "
+                                "ORDER BY id LIMIT ?", (now - self._lease, self._batch_size)).fetchall()
+            conn.executemany("UPDATE items SET worker = ?, leased = ? WHERE id = ?", [(self.name, now, r[0]) for r in rows])
+            filled = self._meta(conn, "filled") is not None
+            filler, heartbeat = self._meta(conn, "filler"), float(self._meta(conn, "heartbeat") or 0)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            with self._done_lock:
+                self._finished.extend(finished)
+            raise
+        with self._done_lock:
+            self._leased.update((key, cid) for cid, key in rows)
+        return rows, filled, filler, heartbeat
+
+    def select(self, paths):
+        """
+        the datasets this process takes from the queue
+
+        :param paths: every dataset below the bases, only read by the process filling the queue
+        :return: generator of paths
+        """
+        if self.filler:
+            self._start_fill(paths)
+        while True:
+            rows, filled, filler, heartbeat = self._claim()
+            if rows:
+                for _, key in rows:
+                    yield key.split(_SEP)
+                continue
+            if self._fill_error:
+                raise self._fill_error[0]
+            if filled:
+                return
+            if not self.filler and time.time() - heartbeat > self._lease and self._take("filler", filler):
+                # the process filling the queue stopped, list the datasets here and carry on where it left off
+                self.filler = True
+                self._start_fill(paths)
+            time.sleep(self._poll)
+
+    def finish(self, summary=None, output=None, out=lambda x: x):
+        """
+        record that this process is done, with its summary and output file
+
+        :param summary: Summary.as_dict() of this process
+        :param output: output file this process wrote, if any
+        :param out: output function
+        :return: (list of summaries, list of output files) of every process if this is the last one to finish a
+            queue that is now empty, None otherwise
+        """
+        finished = self._take_finished()
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._mark_done(conn, finished)
+            conn.execute("UPDATE workers SET finished = ?, summary = ?, output = ? WHERE worker = ?",
+                         (time.time(), json.dumps(summary) if summary is not None else None, output, self.name))
+            running = conn.execute("SELECT COUNT(*) FROM workers WHERE finished IS NULL").fetchone()[0]
+            left = conn.execute("SELECT COUNT(*) FROM items WHERE done = 0").fetchone()[0]
+            merged = None
+            if running == 0 and left == 0 and self._meta(conn, "filled") is not None \
+                    and self._meta(conn, "merged") is None:
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('merged', ?)", (self.name,))
+                rows = conn.execute("SELECT summary, output FROM workers ORDER BY started").fetchall()
+                merged = ([json.loads(r[0]) for r in rows if r[0] is not None], [r[1] for r in rows if r[1] is not None])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if running == 0 and left > 0:
+            out("{} datasets are not done, their process stopped or failed to read, commit or write them. Run again with "
+                "the same work queue once their lease ran out".format(left))
+        return merged
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+import simplejson as json
+from six.moves.urllib.parse import quote
+from dremio_client.error import DremioNotFoundException
+from dremio_client.model.endpoints import phase
+from .crawl import CatalogStore, entity_path
+
+_SEP = u"\x1f"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    key TEXT PRIMARY KEY,
+    id TEXT,
+    path TEXT NOT NULL,
+    entity_type TEXT,
+    name TEXT,
+    tag TEXT,
+    acl TEXT,
+    children TEXT,
+    listing TEXT,
+    run INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entities_id ON entities (id);
+CREATE TABLE IF NOT EXISTS runs (
+    run INTEGER PRIMARY KEY AUTOINCREMENT,
+    base TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL
+);
+"""
+
+
+def _key(path):
+    return _SEP.join(path)
+
+
+def _read(store, path):
+    with phase("enumerate"):
+        return store.get(path, False)
+
+
+def listing_signature(children):
+    digest = hashlib.sha1()
+    for child in children:
+        digest.update(json.dumps([child["path"], child.get("id"), child.get("tag"), child["type"]]).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class Snapshot(object):
+    def __init__(self, filename, client=None):
+        """
+        Local snapshot of catalog entities held in an indexed SQLite file
+
+        Each row keeps the id, path, type, tag and accessControlList of an entity, plus the child listing of
+        containers. A snapshot has the same read interface as CatalogStore so report, dump and update can be run
+        against it instead of the live catalog.
+
+        :param filename: SQLite file, created if it does not exist
+        :param client: dremio client, needed to refresh the snapshot or write objects read from it
+        """
+        self._client = client
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filename, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _row(self, path):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, path, entity_type, name, tag, acl, children, listing FROM entities WHERE key = ?",
+                (_key(path),)).fetchone()
+
+    def get(self, path, keep=True):
+        """
+        return the snapshot of the entity at path
+
+        :param path: list ['source', 'folder', 'pds']
+        :param keep: ignored, every entity in the snapshot is kept
+        :raise: DremioNotFoundException if the entity is not in the snapshot
+        :return: dict with id, path, entityType, tag, accessControlList and children for containers
+        """
+        row = self._row(path)
+        if row is None:
+            raise DremioNotFoundException("No entity exists in snapshot at " + ".".join(path), None)
+        item = {"id": row[0], "path": json.loads(row[1]), "entityType": row[2], "tag": row[4],
+                "accessControlList": json.loads(row[5]) if row[5] else {}}
+        if row[3] is not None:
+            item["name"] = row[3]
+        if row[6] is not None:
+            item["children"] = json.loads(row[6])
+        return item
+
+    def cached(self, path):
+        try:
+            return self.get(path)
+        except DremioNotFoundException:
+            return None
+
+    def remember(self, children):
+        pass
+
+    def is_dataset(self, path, keep=True):
+        row = self._row(path)
+        return row is not None and row[2] == "dataset"
+
+    def prepare(self, obj):
+        """fetch the full entity to PUT, snapshot rows only carry the fields needed to compare ACLs"""
+        full = self._client.catalog_item(quote(obj["id"], safe=""), None)
+        full["accessControlList"] = obj["accessControlList"]
+        return full
+
+    def _write(self, obj, run, listing=None):
+        path = entity_path(obj)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entities (key, id, path, entity_type, name, tag, acl, children, listing, run) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (_key(path), obj.get("id"), json.dumps(path), obj["entityType"], obj.get("name"), obj.get("tag"),
+                 json.dumps(obj.get("accessControlList") or {}),
+                 json.dumps(obj["children"]) if "children" in obj else None, listing, run))
+
+    def _crawl(self, root, jobs, store, full):
+        # (container, read) for every container below root, read False when it was taken from the snapshot
+        containers = []
+        executor = ThreadPoolExecutor(max_workers=max(1, jobs))
+        frontier = {}
+
+        def schedule(kids):
+            queue = deque(kids)
+            while queue:
+                child = queue.popleft()
+                if child["type"] != "CONTAINER":
+                    continue
+                known = None if full or child.get("tag") is None else self._row(child["path"])
+                if known is not None and known[4] == child["tag"] and known[6] is not None:
+                    container = self.get(child["path"])
+                    containers.append((container, False))
+                    queue.extend(container["children"])
+                else:
+                    frontier[executor.submit(_read, store, child["path"])] = child
+
+        try:
+            schedule(root.get("children", []))
+            while frontier:
+                done, _ = wait(list(frontier), return_when=FIRST_COMPLETED)
+                for future in done:
+                    frontier.pop(future)
+                    container = future.result()
+                    containers.append((container, True))
+                    schedule(container.get("children", []))
+        finally:
+            for future in frontier:
+                future.cancel()
+            executor.shutdown(wait=True)
+        return containers
+
+    def refresh(self, base, jobs=1, out=lambda x: x, full=False):
+        """
+        bring the snapshot of everything below base up to date
+
+        base itself is always read again. A container below it is only read again when its tag in the listing of its
+        parent differs from the snapshot, otherwise its listing, and so the subtree below it, is taken from the
+        snapshot. A dataset is only read again when it is new, or when the listing of its parent changed and its entry
+        has a different (or no) tag. Entities no longer below base are removed.
+
+        :param base: list ['source', 'folder']
+        :param jobs: maximum number of concurrent catalog requests
+        :param out: output function
+        :param full: read every container again, for catalogs whose container tags do not change when the containers
+            below them do
+        :return: number of datasets fetched
+        """
+        started = time.time()
+        with self._lock:
+            run = self._conn.execute("INSERT INTO runs (base, started) VALUES (?, ?)",
+                                     (json.dumps(list(base)), started)).lastrowid
+        store = CatalogStore(self._client)
+        root = store.get(base)
+        containers = [(root, True)] + self._crawl(root, jobs, store, full)
+        read = sum(1 for _, fetched in containers if fetched)
+        out("Read {} containers below {}, {} unchanged".format(read, "/".join(base), len(containers) - read))
+
+        stale = []
+        unchanged = []
+        for container, fetched in containers:
+            children = container.get("children", [])
+            if fetched:
+                signature = listing_signature(children)
+                previous = self._row(entity_path(container))
+                changed = previous is None or previous[7] != signature
+                self._write(container, run, signature)
+            else:
+                changed = False
+                unchanged.append((run, _key(entity_path(container))))
+            for child in children:
+                if child["type"] != "DATASET":
+                    continue
+                known = self._row(child["path"])
+                if known is None or (changed and (child.get("tag") is None or known[4] != child.get("tag"))):
+                    stale.append(child["path"])
+                else:
+                    unchanged.append((run, _key(child["path"])))
+        with self._lock:
+            self._conn.executemany("UPDATE entities SET run = ? WHERE key = ?", unchanged)
+        out("{} datasets unchanged, fetching {}".format(len(unchanged), len(stale)))
+
+        executor = ThreadPoolExecutor(max_workers=max(1, jobs))
+        try:
+            futures = dict((executor.submit(store.get, path, False), path) for path in stale)
+            for future in as_completed(futures):
+                try:
+                    self._write(future.result(), run)
+                except Exception as e:
+                    # keep whatever we had for this dataset rather than dropping it from the snapshot
+                    out("Unable to refresh {}: {}".format("/".join(futures[future]), e))
+                    with self._lock:
+                        self._conn.execute("UPDATE entities SET run = ? WHERE key = ?", (run, _key(futures[future])))
+        finally:
+            executor.shutdown(wait=True)
+
+        prefix = _key(entity_path(root))
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM entities WHERE (key = ? OR (key >= ? AND key < ?)) AND run != ?",
+                (prefix, prefix + _SEP, prefix + u"\x20", run)).rowcount
+            self._conn.execute("UPDATE runs SET finished = ? WHERE run = ?", (time.time(), run))
+            self._conn.commit()
+        out("Snapshot refreshed in {:.1f}s, {} entities removed".format(time.time() - started, removed))
+        return len(stale)
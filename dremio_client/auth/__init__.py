@@ -47,7 +47,11 @@ def _existing_token(config_dict):
             directory = os.path.dirname(source.filename)
             if os.path.exists(os.path.join(directory, "auth.json")):
                 with open(os.path.join(directory, "auth.json")) as f:
-                    authfile = json.load(f)
+                    try:
+                        authfile = json.load(f)
+                    except ValueError:
+                        # another process is writing it
+                        continue
                     if _is_valid(authfile, config_dict):
                         return authfile["token"]
     raise KeyError
@@ -10,6 +10,9 @@ import simplejson as json
 from . import __version__
 from .conf import get_base_url_token
 from .error import DremioNotFoundException
+from .model.endpoints import set_metrics
+from .model.metrics import Metrics
+from .profiling import Profiler
 from .model.endpoints import (
     cancel_job as _cancel_job,
     catalog as _catalog,
@@ -62,8 +65,9 @@ def print_version(ctx, param, value):
 @click.option("-p", "--password", help="password if different from config file")
 @click.option("--skip-verify", is_flag=True, help="skip verificatoin of ssl cert")
 @click.option("--version", is_flag=True, callback=print_version, expose_value=False, is_eager=True)
+@click.option("--profile", is_flag=True, help="Profile the command and write the profile to the current directory")
 @click.pass_context
-def cli(ctx, config, hostname, port, ssl, username, password, skip_verify):
+def cli(ctx, config, hostname, port, ssl, username, password, skip_verify, profile):
     if config:
         os.environ["DREMIO_CLIENTDIR"] = config
     ctx.obj = dict()
@@ -79,6 +83,12 @@ def cli(ctx, config, hostname, port, ssl, username, password, skip_verify):
         ctx.obj["auth.password"] = password
     if skip_verify:
         ctx.obj["verify"] = not skip_verify
+    if profile:
+        metrics = Metrics()
+        set_metrics(metrics)
+        profiler = Profiler(ctx.invoked_subcommand)
+        ctx.call_on_close(lambda: profiler.stop(metrics, click.echo))
+        profiler.start()
 
 
 @cli.command()
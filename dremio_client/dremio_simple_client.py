@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 
+import requests
+from requests.adapters import HTTPAdapter
+
 from .auth import auth
 from .model.endpoints import (
     cancel_job,
     catalog,
     catalog_item,
+    catalog_item_raw,
     collaboration_tags,
     set_collaboration_tags,
     collaboration_wiki,
@@ -39,12 +43,16 @@ from .util import refresh_metadata, run, run_async, refresh_vds_reflection_by_pa
 
 
 class SimpleClient(object):
-    def __init__(self, config):
+    def __init__(self, config, pool_size=None):
         """
         Create a Dremio Simple Client instance. This currently only supports basic auth from the constructor.
         Will be extended for oauth, token auth and storing auth on disk or in stores in the future
 
+        All requests go through one requests.Session, so connections to the coordinator are reused
+
         :param config: config dict from confuse
+        :param pool_size: connections the session keeps open, at least the number of threads sharing the client.
+            requests' default of 10 if None
         """
 
         port = config["port"].get(int)
@@ -57,27 +65,36 @@ class SimpleClient(object):
         )
         self._token = auth(self._base_url, config)
         self._ssl_verify = config["verify"].get(bool)
+        self._session = requests.Session()
+        if pool_size is not None:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
 
     def catalog(self):
-        return catalog(self._token, self._base_url, ssl_verify=self._ssl_verify)
+        return catalog(self._token, self._base_url, ssl_verify=self._ssl_verify, session=self._session)
 
     def job_status(self, jobid):
-        return job_status(self._token, self._base_url, jobid, ssl_verify=self._ssl_verify)
+        return job_status(self._token, self._base_url, jobid, ssl_verify=self._ssl_verify, session=self._session)
 
     def catalog_item(self, cid, path):
-        return catalog_item(self._token, self._base_url, cid, path, ssl_verify=self._ssl_verify)
+        return catalog_item(self._token, self._base_url, cid, path, ssl_verify=self._ssl_verify, session=self._session)
+
+    def catalog_item_raw(self, cid, path):
+        return catalog_item_raw(self._token, self._base_url, cid, path, ssl_verify=self._ssl_verify,
+                                session=self._session)
 
     def job_results(self, jobid):
-        return job_results(self._token, self._base_url, jobid, ssl_verify=self._ssl_verify)
+        return job_results(self._token, self._base_url, jobid, ssl_verify=self._ssl_verify, session=self._session)
 
     def sql(self, query, context=None):
-        return sql(self._token, self._base_url, query, context, ssl_verify=self._ssl_verify)
+        return sql(self._token, self._base_url, query, context, ssl_verify=self._ssl_verify, session=self._session)
 
     def reflections(self, summary=False):
-        return reflections(self._token, self._base_url, summary, ssl_verify=self._ssl_verify)
+        return reflections(self._token, self._base_url, summary, ssl_verify=self._ssl_verify, session=self._session)
 
     def reflection(self, reflectionid):
-        return reflection(self._token, self._base_url, reflectionid, ssl_verify=self._ssl_verify)
+        return reflection(self._token, self._base_url, reflectionid, ssl_verify=self._ssl_verify, session=self._session)
 
     def wlm_queues(self):
         """ return details all workload management queues
@@ -92,7 +109,7 @@ class SimpleClient(object):
         :raise: DremioNotFoundException queues not found
         :return: queues as a list of dicts
         """
-        return wlm_queues(self._token, self._base_url, ssl_verify=self._ssl_verify)
+        return wlm_queues(self._token, self._base_url, ssl_verify=self._ssl_verify, session=self._session)
 
     def wlm_rules(self):
         """ return details all workload management rules
@@ -107,7 +124,7 @@ class SimpleClient(object):
         :raise: DremioNotFoundException ruleset is not found
         :return: rules as a list of dicts
         """
-        return wlm_rules(self._token, self._base_url, ssl_verify=self._ssl_verify)
+        return wlm_rules(self._token, self._base_url, ssl_verify=self._ssl_verify, session=self._session)
 
     def votes(self):
         """ return details all reflection votes
@@ -120,7 +137,7 @@ class SimpleClient(object):
         :raise: DremioPermissionException user does not have permission
         :return: votes as a list of dicts
         """
-        return votes(self._token, self._base_url, ssl_verify=self._ssl_verify)
+        return votes(self._token, self._base_url, ssl_verify=self._ssl_verify, session=self._session)
 
     def user(self, uid=None, name=None):
         """ return details for a user
@@ -135,7 +152,7 @@ class SimpleClient(object):
         :raise: DremioNotFoundException user could not be found
         :return: user info as a dict
         """
-        return user(self._token, self._base_url, uid, name, ssl_verify=self._ssl_verify)
+        return user(self._token, self._base_url, uid, name, ssl_verify=self._ssl_verify, session=self._session)
 
     def group(self, gid=None, name=None):
         """ return details for a group
@@ -150,7 +167,7 @@ class SimpleClient(object):
         :raise: DremioNotFoundException group could not be found
         :return: group info as a dict
         """
-        return group(self._token, self._base_url, gid, name, ssl_verify=self._ssl_verify)
+        return group(self._token, self._base_url, gid, name, ssl_verify=self._ssl_verify, session=self._session)
 
     def personal_access_token(self, uid):
         """ return a list of personal access tokens for a user
@@ -163,7 +180,8 @@ class SimpleClient(object):
         :raise: DremioNotFoundException user could not be found
         :return: personal access token list
         """
-        return personal_access_token(self._token, self._base_url, uid, ssl_verify=self._ssl_verify)
+        return personal_access_token(self._token, self._base_url, uid, ssl_verify=self._ssl_verify,
+                                     session=self._session)
 
     def collaboration_tag(self, cid):
         """ returns a list of tags for catalog entity
@@ -175,7 +193,7 @@ class SimpleClient(object):
         :raise: DremioNotFoundException user could not be found
         :return: list of tags
         """
-        return collaboration_tags(self._token, self._base_url, cid, ssl_verify=self._ssl_verify)
+        return collaboration_tags(self._token, self._base_url, cid, ssl_verify=self._ssl_verify, session=self._session)
 
     def set_collaboration_tag(self, cid, tags):
         """ returns a list of tags for catalog entity
@@ -188,7 +206,8 @@ class SimpleClient(object):
         :raise: DremioNotFoundException user could not be found
         :return: list of tags
         """
-        return set_collaboration_tags(self._token, self._base_url, cid, tags, ssl_verify=self._ssl_verify)
+        return set_collaboration_tags(self._token, self._base_url, cid, tags, ssl_verify=self._ssl_verify,
+                                      session=self._session)
 
     def collaboration_wiki(self, cid):
         """ returns a wiki details for catalog entity
@@ -200,9 +219,9 @@ class SimpleClient(object):
         :raise: DremioNotFoundException user could not be found
         :return: wiki details
         """
-        return collaboration_wiki(self._token, self._base_url, cid, ssl_verify=self._ssl_verify)
+        return collaboration_wiki(self._token, self._base_url, cid, ssl_verify=self._ssl_verify, session=self._session)
 
-    def query(self, query, context=None, sleep_time=10, asynchronous=False):
+    def query(self, query, context=None, sleep_time=10, asynchronous=False, page_size=100):
         """ Run a single sql query asynchronously
 
         This executes a single sql query against the rest api asynchronously and returns a future for the result
@@ -211,6 +230,7 @@ class SimpleClient(object):
         :param context: optional context in which to execute the query
         :param sleep_time: seconds to sleep between checking for finished state
         :param asynchronous: boolean execute asynchronously
+        :param page_size: rows fetched per results request (max 500), synchronous queries only
         :raise: DremioException if job failed
         :raise: DremioUnauthorizedException if token is incorrect or invalid
         :return: concurrent.futures.Future for the result
@@ -223,8 +243,10 @@ class SimpleClient(object):
         [{'record':'1'}, {'record':'2'}]
         """
         if asynchronous:
-            return run_async(self._token, self._base_url, query, context, sleep_time, ssl_verify=self._ssl_verify)
-        return run(self._token, self._base_url, query, context, sleep_time, ssl_verify=self._ssl_verify)
+            return run_async(self._token, self._base_url, query, context, sleep_time, ssl_verify=self._ssl_verify,
+                             session=self._session)
+        return run(self._token, self._base_url, query, context, sleep_time, ssl_verify=self._ssl_verify,
+                   page_size=page_size, session=self._session)
 
     def refresh_metadata(self, table):
         """ Refresh the metadata for a given physical dataset
@@ -234,7 +256,7 @@ class SimpleClient(object):
         :raise: DremioUnauthorizedException if token is incorrect or invalid
         :return: None
         """
-        return refresh_metadata(self._token, self._base_url, table, ssl_verify=self._ssl_verify)
+        return refresh_metadata(self._token, self._base_url, table, ssl_verify=self._ssl_verify, session=self._session)
 
     def update_catalog(self, cid, json):
         """ update a catalog entity
@@ -245,7 +267,8 @@ class SimpleClient(object):
         :param json: json document for new catalog entity
         :return: updated catalog entity
         """
-        return update_catalog(self._token, self._base_url, cid, json, ssl_verify=self._ssl_verify)
+        return update_catalog(self._token, self._base_url, cid, json, ssl_verify=self._ssl_verify,
+                              session=self._session)
 
     def promote_catalog(self, cid, json):
         """ promote a catalog entity
@@ -256,7 +279,8 @@ class SimpleClient(object):
         :param json: json document for new catalog entity
         :return: updated catalog entity
         """
-        return promote_catalog(self._token, self._base_url, cid, json, ssl_verify=self._ssl_verify)
+        return promote_catalog(self._token, self._base_url, cid, json, ssl_verify=self._ssl_verify,
+                               session=self._session)
 
     def delete_catalog(self, cid, tag):
         """ remove a catalog item from Dremio
@@ -267,7 +291,7 @@ class SimpleClient(object):
         :param tag: version tag of entity
         :return: None
         """
-        return delete_catalog(self._token, self._base_url, cid, tag, ssl_verify=self._ssl_verify)
+        return delete_catalog(self._token, self._base_url, cid, tag, ssl_verify=self._ssl_verify, session=self._session)
 
     def set_catalog(self, json):
         """ add a new catalog entity
@@ -277,7 +301,7 @@ class SimpleClient(object):
         :param json: json document for new catalog entity
         :return: new catalog entity
         """
-        return set_catalog(self._token, self._base_url, json, ssl_verify=self._ssl_verify)
+        return set_catalog(self._token, self._base_url, json, ssl_verify=self._ssl_verify, session=self._session)
 
     def refresh_pds(self, pid):
         """ refresh a physical dataset and all its child reflections
@@ -287,7 +311,7 @@ class SimpleClient(object):
         :param pid: id of a catalog entity
         :return: None
         """
-        return refresh_pds(self._token, self._base_url, pid, ssl_verify=self._ssl_verify)
+        return refresh_pds(self._token, self._base_url, pid, ssl_verify=self._ssl_verify, session=self._session)
 
     def set_personal_access_token(self, uid, label, lifetime=24):
         """ create a pat for a given user
@@ -299,7 +323,8 @@ class SimpleClient(object):
         :param lifetime: lifetime in hours of token
         :return: updated catalog entity
         """
-        return set_personal_access_token(self._token, self._base_url, uid, label, lifetime, ssl_verify=self._ssl_verify)
+        return set_personal_access_token(self._token, self._base_url, uid, label, lifetime, ssl_verify=self._ssl_verify,
+                                         session=self._session)
 
     def delete_personal_access_token(self, uid):
         """ create a pat for a given user
@@ -309,7 +334,8 @@ class SimpleClient(object):
         :param uid: id user
         :return: updated catalog entity
         """
-        return delete_personal_access_token(self._token, self._base_url, uid, ssl_verify=self._ssl_verify)
+        return delete_personal_access_token(self._token, self._base_url, uid, ssl_verify=self._ssl_verify,
+                                            session=self._session)
 
     def create_reflection(self, json):
         """create a single reflection
@@ -319,7 +345,7 @@ class SimpleClient(object):
         :param json: json document for new reflection
         :return: result object
         """
-        return create_reflection(self._token, self._base_url, json, ssl_verify=self._ssl_verify)
+        return create_reflection(self._token, self._base_url, json, ssl_verify=self._ssl_verify, session=self._session)
 
     def modify_reflection(self, reflectionid, json):
         """update a single reflection by id
@@ -330,7 +356,8 @@ class SimpleClient(object):
         :param json: json document for modified reflection
         :return: result object
         """
-        return modify_reflection(self._token, self._base_url, reflectionid, json, ssl_verify=self._ssl_verify)
+        return modify_reflection(self._token, self._base_url, reflectionid, json, ssl_verify=self._ssl_verify,
+                                 session=self._session)
 
     def delete_reflection(self, reflectionid):
         """delete a single reflection by id
@@ -340,7 +367,8 @@ class SimpleClient(object):
         :param reflectionid: id of the reflection to fetch
         :return: result object
         """
-        return delete_reflection(self._token, self._base_url, reflectionid, ssl_verify=self._ssl_verify)
+        return delete_reflection(self._token, self._base_url, reflectionid, ssl_verify=self._ssl_verify,
+                                 session=self._session)
 
     def cancel_job(self, jobid):
         """cancel running job with job id = jobid
@@ -352,7 +380,7 @@ class SimpleClient(object):
         :exception DremioNotFoundException no job found
         :exception DremioBadRequestException job already finished
         """
-        return cancel_job(self._token, self._base_url, jobid, ssl_verify=self._ssl_verify)
+        return cancel_job(self._token, self._base_url, jobid, ssl_verify=self._ssl_verify, session=self._session)
 
     def modify_queue(self, queueid, json):
         """update a single queue by id
@@ -363,7 +391,8 @@ class SimpleClient(object):
         :param json: json document for modified queue
         :return: result object
         """
-        return modify_queue(self._token, self._base_url, queueid, json, ssl_verify=self._ssl_verify)
+        return modify_queue(self._token, self._base_url, queueid, json, ssl_verify=self._ssl_verify,
+                            session=self._session)
 
     def create_queue(self, json):
         """create a single queue
@@ -373,7 +402,7 @@ class SimpleClient(object):
         :param json: json document for new queue
         :return: result object
         """
-        return create_queue(self._token, self._base_url, json, ssl_verify=self._ssl_verify)
+        return create_queue(self._token, self._base_url, json, ssl_verify=self._ssl_verify, session=self._session)
 
     def delete_queue(self, queueid):
         """delete a single queue by id
@@ -383,7 +412,7 @@ class SimpleClient(object):
         :param queueid: id of the queue to delete
         :return: result object
         """
-        return delete_queue(self._token, self._base_url, queueid, ssl_verify=self._ssl_verify)
+        return delete_queue(self._token, self._base_url, queueid, ssl_verify=self._ssl_verify, session=self._session)
 
     def modify_rules(self, json):
         """update wlm rules. Order of rules array is important!
@@ -395,10 +424,10 @@ class SimpleClient(object):
         :param json: json document for modified reflection
         :return: result object
         """
-        return modify_rules(self._token, self._base_url, json, ssl_verify=self._ssl_verify)
+        return modify_rules(self._token, self._base_url, json, ssl_verify=self._ssl_verify, session=self._session)
 
     def graph(self, cid):
-        return graph(self._token, self._base_url, cid, ssl_verify=self._ssl_verify)
+        return graph(self._token, self._base_url, cid, ssl_verify=self._ssl_verify, session=self._session)
 
     def refresh_vds_reflection_by_path(self, path):
         """ Refresh the reflection for a given virtual dataset
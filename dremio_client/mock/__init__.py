@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""A local mock of the Dremio REST api, for benchmarks and offline testing"""
+from .catalog import DEFAULT_ACLS, MockCatalog, entity_id, id_path
+from .faults import Faults, parse_latency
+from .server import MockServer, sql_handler
+from . import sql  # NOQA registers the INFORMATION_SCHEMA queries
+
+__all__ = ["DEFAULT_ACLS", "MockCatalog", "entity_id", "id_path", "Faults", "parse_latency", "MockServer",
+           "sql_handler"]
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Run the mock Dremio server
+
+    python -m dremio_client.mock --port 9047 --depth 3 --fan 10 --datasets 90 --latency lognormal:0.01,0.5 --throttle-rate 0.01
+"""
+import time
+
+import click
+import simplejson as json
+
+from .catalog import MockCatalog
+from .faults import Faults, parse_latency
+from .server import MockServer
+
+
+def _check_latency(ctx, param, value):
+    try:
+        parse_latency(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    return value
+
+
+@click.command()
+@click.option("--host", "host", default="127.0.0.1", show_default=True, help="Address to listen on")
+@click.option("--port", "port", type=int, default=9047, show_default=True, help="Port to listen on, 0 for any free port")
+@click.option("--sources", "sources", type=int, default=1, show_default=True, help="Number of sources")
+@click.option("--spaces", "spaces", type=int, default=1, show_default=True, help="Number of spaces")
+@click.option("--depth", "depth", type=int, default=2, show_default=True, help="Levels of folders under each source and space")
+@click.option("--fan", "fan", type=int, default=5, show_default=True, help="Folders per container")
+@click.option("--datasets", "datasets", type=int, default=10, show_default=True, help="Datasets per container")
+@click.option("--fields", "fields", type=int, default=5, show_default=True, help="Schema fields per dataset, to give responses a realistic size")
+@click.option("--acls", "acls", type=click.File("r"), help="JSON file with a list of [weight, accessControlList] pairs, the ACL distribution")
+@click.option("--latency", "latency", callback=_check_latency, help="Latency distribution: 0.01, uniform:0.005,0.02, exp:0.01 or lognormal:0.01,0.5 (median, sigma)")
+@click.option("--error-rate", "error_rate", type=float, default=0.0, show_default=True, help="Share of requests answered with a 503")
+@click.option("--throttle-rate", "throttle_rate", type=float, default=0.0, show_default=True, help="Share of requests answered with a 429")
+@click.option("--retry-after", "retry_after", type=int, default=1, show_default=True, help="Retry-After seconds sent with a 429")
+@click.option("--max-inflight", "max_inflight", type=int, help="Requests served at once, any more are answered with a 429")
+@click.option("--conflict-rate", "conflict_rate", type=float, default=0.0, show_default=True, help="Share of catalog PUTs answered with a 409")
+@click.option("--reflections", "reflections", type=int, default=0, show_default=True, help="Number of reflections to list")
+@click.option("--job-seconds", "job_seconds", type=float, default=0.0, show_default=True, help="Seconds a job runs before it completes")
+@click.option("--user", "users", multiple=True, help="user:password accepted by login, may be repeated. Default anyone")
+@click.option("--seed", "seed", type=int, default=0, show_default=True, help="Random seed of the ACL distribution and of the faults")
+@click.option("-v", "--verbose", "verbose", is_flag=True, help="Log every request")
+def main(host, port, sources, spaces, depth, fan, datasets, fields, acls, latency, error_rate, throttle_rate, retry_after,
+         max_inflight, conflict_rate, reflections, job_seconds, users, seed, verbose):
+    """
+    serve a generated catalog on the Dremio REST api until interrupted
+    """
+    catalog = MockCatalog(sources, spaces, depth, fan, datasets, json.load(acls) if acls else None, fields, seed)
+    faults = Faults(latency, error_rate, throttle_rate, retry_after, max_inflight, conflict_rate, seed)
+    accounts = dict(u.split(":", 1) for u in users) if users else None
+    server = MockServer(catalog, faults, host, port, accounts, reflections, job_seconds, verbose)
+    with server:
+        click.echo("Serving {} datasets in {} on {}".format(catalog.dataset_count(), ", ".join(catalog.roots),
+                                                           server.url))
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    requests = sorted(server.requests.items())
+    for (method, endpoint), n in requests:
+        click.echo("{:6} {:45} {}".format(method, endpoint, n))
+
+
+if __name__ == "__main__":
+    main()
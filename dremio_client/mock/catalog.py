@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+import binascii
+import threading
+import zlib
+
+_SEP = u"\x1f"
+
+# (weight, accessControlList) pairs, the share of entities that get each ACL
+DEFAULT_ACLS = [
+    (4, {}),
+    (3, {"groups": [{"id": "analysts", "permissions": ["READ"]}]}),
+    (2, {"groups": [{"id": "analysts", "permissions": ["READ"]}, {"id": "engineers", "permissions": ["READ", "WRITE"]}]}),
+    (1, {"users": [{"id": "etl", "permissions": ["READ", "WRITE"]}], "groups": [{"id": "analysts", "permissions": ["READ"]}]}),
+]
+
+
+def entity_id(path):
+    """the id of the entity at path. Ids encode the path so that nothing has to be stored to look them up"""
+    return binascii.hexlify(_SEP.join(path).encode("utf-8")).decode("ascii")
+
+
+def id_path(cid):
+    try:
+        return binascii.unhexlify(cid.encode("ascii")).decode("utf-8").split(_SEP)
+    except (TypeError, ValueError, UnicodeError):
+        return None
+
+
+def _numbered(name, prefix, count):
+    return name[:len(prefix)] == prefix and name[len(prefix):].isdigit() and int(name[len(prefix):]) < count
+
+
+class MockCatalog(object):
+    def __init__(self, sources=1, spaces=1, depth=2, fan=5, datasets=10, acls=None, fields=5, seed=0):
+        """
+        A generated Dremio catalog
+
+        Every source and space has the same shape: `depth` levels of `fan` folders, and `datasets` datasets in every
+        container, the source or space itself included. Sources are named src0, src1..., spaces space0, space1...,
+        folders f0, f1... and datasets d0, d1.... Datasets in sources are physical, in spaces virtual.
+
+        Entities are computed from their path when asked for, so a catalog of millions of datasets takes no memory.
+        Only what was written with put or grant is stored.
+
+        :param sources: number of sources
+        :param spaces: number of spaces
+        :param depth: levels of folders under each source and space
+        :param fan: folders per container
+        :param datasets: datasets per container
+        :param acls: list of (weight, accessControlList) pairs, see DEFAULT_ACLS
+        :param fields: schema fields per dataset, to give responses a realistic size
+        :param seed: changes which entity gets which ACL
+        """
+        self.roots = ["src{}".format(i) for i in range(sources)] + ["space{}".format(i) for i in range(spaces)]
+        self.sources = sources
+        self.depth = depth
+        self.fan = fan
+        self.datasets = datasets
+        self._acls = []
+        for weight, acl in acls if acls is not None else DEFAULT_ACLS:
+            self._acls.extend([acl] * weight)
+        self._fields = [{"name": "col{}".format(i), "type": {"name": "VARCHAR"}} for i in range(fields)]
+        self._seed = seed
+        self._written = {}
+        self._lock = threading.Lock()
+
+    def dataset_count(self):
+        containers = sum(self.fan ** d for d in range(self.depth + 1))
+        return len(self.roots) * containers * self.datasets
+
+    def kind(self, path):
+        """source, space, folder, dataset or None if nothing exists at path"""
+        if not path or path[0] not in self.roots:
+            return None
+        if len(path) == 1:
+            return "source" if self.roots.index(path[0]) < self.sources else "space"
+        if not all(_numbered(name, "f", self.fan) for name in path[1:-1]):
+            return None
+        if len(path) <= self.depth + 1 and _numbered(path[-1], "f", self.fan):
+            return "folder"
+        if len(path) <= self.depth + 2 and _numbered(path[-1], "d", self.datasets):
+            return "dataset"
+        return None
+
+    def children(self, path):
+        kids = []
+        if len(path) <= self.depth:
+            for i in range(self.fan):
+                kids.append(self._summary(list(path) + ["f{}".format(i)], "folder"))
+        for i in range(self.datasets):
+            kids.append(self._summary(list(path) + ["d{}".format(i)], "dataset"))
+        return kids
+
+    def _summary(self, path, kind):
+        summary = {"id": entity_id(path), "path": path, "tag": self.tag(path)}
+        if kind == "dataset":
+            summary["type"] = "DATASET"
+            summary["datasetType"] = "PROMOTED" if self.roots.index(path[0]) < self.sources else "VIRTUAL"
+        else:
+            summary["type"] = "CONTAINER"
+            summary["containerType"] = kind.upper()
+        return summary
+
+    def root_listing(self):
+        return [self._summary([root], self.kind([root])) for root in self.roots]
+
+    def tag(self, path):
+        with self._lock:
+            written = self._written.get(tuple(path))
+        return written[0] if written is not None else "0"
+
+    def acl(self, path):
+        with self._lock:
+            written = self._written.get(tuple(path))
+        if written is not None:
+            return written[1]
+        if not self._acls:
+            return {}
+        key = u"{}{}{}".format(self._seed, _SEP, _SEP.join(path)).encode("utf-8")
+        return self._acls[zlib.crc32(key) % len(self._acls)]
+
+    def get(self, path):
+        """
+        the entity at path, as GET /api/v3/catalog/{id} returns it
+
+        :param path: list of path components
+        :return: entity dict or None
+        """
+        kind = self.kind(path)
+        if kind is None:
+            return None
+        entity = {"entityType": kind, "id": entity_id(path), "path": list(path), "tag": self.tag(path),
+                  "accessControlList": self.acl(path)}
+        if kind == "dataset":
+            entity["type"] = "PHYSICAL_DATASET" if self.roots.index(path[0]) < self.sources else "VIRTUAL_DATASET"
+            entity["fields"] = self._fields
+        else:
+            entity["children"] = self.children(path)
+        if kind in ("source", "space"):
+            entity["name"] = path[0]
+        return entity
+
+    def put(self, path, tag, acl):
+        """
+        write the ACL of the entity at path if tag is its current tag
+
+        :return: the new tag, or None if tag was out of date
+        """
+        key = tuple(path)
+        with self._lock:
+            written = self._written.get(key)
+            current = written[0] if written is not None else "0"
+            if tag != current:
+                return None
+            new_tag = str(int(current) + 1)
+            self._written[key] = (new_tag, acl)
+        return new_tag
+
+    def grant(self, path, kind, principal, permissions, revoke=False):
+        """
+        add permissions to, or with revoke remove them from, one principal in the ACL of the entity at path
+
+        :param kind: users, groups or roles
+        :return: the new tag
+        """
+        key = tuple(path)
+        acl = self.acl(path)
+        with self._lock:
+            written = self._written.get(key)
+            tag, acl = written if written is not None else ("0", acl)
+            granted = dict((p["id"], set(p["permissions"])) for p in acl.get(kind, []))
+            if revoke:
+                granted[principal] = granted.get(principal, set()) - set(permissions)
+            else:
+                granted[principal] = granted.get(principal, set()) | set(permissions)
+            acl = dict(acl)
+            acl[kind] = [{"id": pid, "permissions": sorted(perms)} for pid, perms in sorted(granted.items()) if perms]
+            if not acl[kind]:
+                del acl[kind]
+            new_tag = str(int(tag) + 1)
+            self._written[key] = (new_tag, acl)
+        return new_tag
+
+    def written(self):
+        """paths written with put or grant, and their ACLs"""
+        with self._lock:
+            return dict((path, acl) for path, (_, acl) in self._written.items())
+
+    def walk(self, path=None):
+        """
+        every entity summary under path, or in the whole catalog, depth first
+
+        :param path: container path, None for the whole catalog
+        """
+        stack = [self._summary([root], self.kind([root])) for root in reversed(self.roots)] if path is None \
+            else list(reversed(self.children(path)))
+        while stack:
+            summary = stack.pop()
+            yield summary
+            if summary["type"] == "CONTAINER":
+                stack.extend(reversed(self.children(summary["path"])))
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import math
+import random
+import threading
+
+
+def parse_latency(spec):
+    """
+    a latency distribution from its description
+
+    0.01 or fixed:0.01 -- always 10ms
+    uniform:0.005,0.02 -- between 5ms and 20ms
+    exp:0.01 -- exponential with a mean of 10ms
+    lognormal:0.01,0.5 -- log-normal with a median of 10ms and a sigma of 0.5, a long tail like real servers have
+
+    :param spec: description, None or empty for no latency
+    :return: function of a random.Random returning seconds
+    """
+    if not spec:
+        return lambda rng: 0.0
+    kind, _, args = spec.partition(":") if ":" in spec else ("fixed", None, spec)
+    try:
+        values = [float(v) for v in args.split(",")]
+    except ValueError:
+        raise ValueError("bad latency " + spec)
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "exp" and len(values) == 1:
+        return lambda rng: rng.expovariate(1.0 / values[0]) if values[0] > 0 else 0.0
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError("bad latency " + spec)
+
+
+class Faults(object):
+    def __init__(self, latency=None, error_rate=0.0, throttle_rate=0.0, retry_after=1, max_inflight=None,
+                 conflict_rate=0.0, seed=None):
+        """
+        Faults the mock server injects into its responses
+
+        :param latency: latency distribution, see parse_latency
+        :param error_rate: share of requests answered with a 503
+        :param throttle_rate: share of requests answered with a 429
+        :param retry_after: Retry-After seconds sent with a 429, None to send none
+        :param max_inflight: requests served at once, any more are answered with a 429. None for no limit
+        :param conflict_rate: share of catalog PUTs answered with a 409 as if another writer changed the entity
+        :param seed: random seed, for repeatable runs
+        """
+        self._latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.max_inflight = max_inflight
+        self.conflict_rate = conflict_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._inflight = 0
+
+    def _roll(self, rate):
+        if not rate:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+
+    def delay(self):
+        with self._lock:
+            return self._latency(self._random)
+
+    def enter(self):
+        """
+        count a request in and pick the fault to answer it with
+
+        :return: None, 429 or 503
+        """
+        with self._lock:
+            self._inflight += 1
+            over = self.max_inflight is not None and self._inflight > self.max_inflight
+        if over or self._roll(self.throttle_rate):
+            return 429
+        if self._roll(self.error_rate):
+            return 503
+        return None
+
+    def leave(self):
+        with self._lock:
+            self._inflight -= 1
+
+    def conflict(self):
+        return self._roll(self.conflict_rate)
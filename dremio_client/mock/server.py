@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+import binascii
+import hashlib
+import itertools
+import re
+import threading
+import time
+import uuid
+
+import simplejson as json
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.parse import parse_qs, unquote, urlparse
+
+from ..model.metrics import endpoint_template
+from .catalog import MockCatalog, id_path
+from .faults import Faults
+
+# (compiled regex, function(catalog, match) returning a list of row dicts). A query is answered by the first handler
+# whose regex matches all of it, queries nothing matches and handlers raising ValueError fail like invalid SQL does
+SQL_HANDLERS = []
+
+MAX_RESULTS = 500
+
+
+def sql_handler(pattern):
+    """register a function answering the queries that match pattern, case insensitive and ignoring extra whitespace"""
+    def register(fn):
+        SQL_HANDLERS.append((re.compile(r"\s*" + pattern + r"\s*;?\s*$", re.IGNORECASE | re.DOTALL), fn))
+        return fn
+    return register
+
+
+def _token(user):
+    # tokens are derived from the user name so that tokens cached by clients stay valid when the server is restarted
+    name = binascii.hexlify(user.encode("utf-8")).decode("ascii")
+    return name + "." + hashlib.sha1(u"mock\x1f{}".format(user).encode("utf-8")).hexdigest()
+
+
+class _HttpError(Exception):
+    def __init__(self, status, message, headers=None):
+        super(_HttpError, self).__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in two writes, with Nagle a kept-alive connection waits on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.mock.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def do_GET(self):
+        self._serve("GET")
+
+    def do_POST(self):
+        self._serve("POST")
+
+    def do_PUT(self):
+        self._serve("PUT")
+
+    def do_DELETE(self):
+        self._serve("DELETE")
+
+    def _serve(self, method):
+        mock = self.server.mock
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        fault = mock.faults.enter()
+        try:
+            time.sleep(mock.faults.delay())
+            mock.count(method, self.path)
+            url = urlparse(self.path)
+            if url.path == "/apiv2/login":
+                # faults are for the api under test, a client that can not log in tests nothing
+                fault = None
+            if fault == 429:
+                retry_after = mock.faults.retry_after
+                raise _HttpError(429, "Too many requests",
+                                 {"Retry-After": str(retry_after)} if retry_after is not None else None)
+            if fault is not None:
+                raise _HttpError(fault, "Injected server error")
+            body = json.loads(raw.decode("utf-8")) if raw else None
+            if url.path != "/apiv2/login":
+                mock.check_token(self.headers.get("Authorization"))
+            status, result = mock.route(method, url.path, parse_qs(url.query), body)
+            self._send(status, result)
+        except _HttpError as e:
+            self._send(e.status, {"errorMessage": str(e)}, e.headers)
+        except ValueError as e:
+            self._send(400, {"errorMessage": str(e)})
+        finally:
+            mock.faults.leave()
+
+    def _send(self, status, result, headers=None):
+        data = json.dumps(result).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockServer(object):
+    def __init__(self, catalog=None, faults=None, host="127.0.0.1", port=0, users=None, reflections=0,
+                 job_seconds=0.0, verbose=False):
+        """
+        A local stand-in for the Dremio REST api, serving a MockCatalog
+
+        Serves /apiv2/login, GET /api/v3/catalog, /api/v3/catalog/{id} and /api/v3/catalog/by-path/{path}, PUT
+        /api/v3/catalog/{id} (ACLs only, with tag checks), POST /api/v3/sql, /api/v3/job/{id} and its results, and
+        /api/v3/reflection. Queries are answered by the functions registered with sql_handler.
+
+            with MockServer(MockCatalog(depth=3), Faults(latency="lognormal:0.01,0.5", throttle_rate=0.01)) as mock:
+                client = DremioClient(build_config(mock.config()))
+
+        :param catalog: MockCatalog to serve, a default one if None
+        :param faults: Faults to inject, none if None
+        :param host: address to listen on
+        :param port: port to listen on, 0 for any free port
+        :param users: dict of user name to password accepted by login, None to accept anyone
+        :param reflections: number of raw reflections to list, on the first datasets of the catalog
+        :param job_seconds: seconds a job stays RUNNING before it completes
+        :param verbose: log every request to stderr
+        """
+        self.catalog = catalog if catalog is not None else MockCatalog()
+        self.faults = faults if faults is not None else Faults()
+        self.users = users
+        self.job_seconds = job_seconds
+        self.verbose = verbose
+        self.sql_handlers = list(SQL_HANDLERS)
+        self.requests = {}
+        self._jobs = {}
+        self._lock = threading.Lock()
+        datasets = itertools.islice((s for s in self.catalog.walk() if s["type"] == "DATASET"), reflections)
+        self._reflections = [{"id": "reflection{}".format(i), "type": "RAW", "name": "raw{}".format(i),
+                              "datasetId": s["id"], "enabled": True, "status": {"availability": "AVAILABLE"}}
+                             for i, s in enumerate(datasets)]
+        self._server = _Server((host, port), _Handler)
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    @property
+    def url(self):
+        return "http://{}:{}".format(self._server.server_address[0], self.port)
+
+    def config(self, username="dremio", password="dremio123"):
+        """arguments for dremio_client.conf.build_config that connect to this server"""
+        return {"hostname": self._server.server_address[0], "port": self.port, "ssl": False,
+                "auth.type": "basic", "auth.username": username, "auth.password": password}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def count(self, method, path):
+        key = (method, endpoint_template(path))
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def check_token(self, header):
+        token = header[len("_dremio"):] if header and header.startswith("_dremio") else ""
+        user, _, _ = token.partition(".")
+        try:
+            user = binascii.unhexlify(user.encode("ascii")).decode("utf-8")
+        except (TypeError, ValueError, UnicodeError):
+            user = None
+        if not user or token != _token(user):
+            raise _HttpError(401, "Invalid or missing token")
+
+    def route(self, method, path, query, body):
+        """
+        answer one request
+
+        :return: (status, json result)
+        """
+        parts = path.strip("/").split("/")
+        if method == "POST" and path == "/apiv2/login":
+            return 200, self._login(body or {})
+        if parts[:2] != ["api", "v3"] or len(parts) < 3:
+            raise _HttpError(404, "No such endpoint " + path)
+        collection, rest = parts[2], parts[3:]
+        if collection == "catalog":
+            if method == "GET" and not rest:
+                return 200, {"data": self.catalog.root_listing()}
+            if method == "GET" and rest[0] == "by-path" and len(rest) > 1:
+                return 200, self._entity([unquote(p) for p in rest[1:]])
+            if method == "GET" and len(rest) == 1:
+                return 200, self._entity(id_path(unquote(rest[0])))
+            if method == "PUT" and len(rest) == 1:
+                return 200, self._put(id_path(unquote(rest[0])), body or {})
+        if collection == "sql" and method == "POST" and not rest:
+            return 200, self._submit((body or {}).get("sql") or "")
+        if collection == "job" and method == "GET" and rest:
+            job = self._job(rest[0])
+            if len(rest) == 1:
+                return 200, dict((k, v) for k, v in job.items() if k not in ("rows", "ready"))
+            if len(rest) == 2 and rest[1] == "results":
+                return 200, self._results(job, query)
+        if collection == "reflection" and method == "GET":
+            if not rest:
+                return 200, {"data": self._reflections}
+            if rest == ["summary"]:
+                return 200, {"data": [dict((k, r[k]) for k in ("id", "type", "name", "datasetId"))
+                                      for r in self._reflections]}
+            for r in self._reflections:
+                if len(rest) == 1 and r["id"] == rest[0]:
+                    return 200, r
+            raise _HttpError(404, "No reflection " + "/".join(rest))
+        raise _HttpError(404, "No such endpoint {} {}".format(method, path))
+
+    def _login(self, body):
+        user, password = body.get("userName"), body.get("password")
+        if not user or (self.users is not None and self.users.get(user) != password):
+            raise _HttpError(401, "Login failed")
+        return {"token": _token(user), "userName": user}
+
+    def _entity(self, path):
+        entity = self.catalog.get(path) if path else None
+        if entity is None:
+            raise _HttpError(404, "Could not find entity")
+        return entity
+
+    def _put(self, path, body):
+        self._entity(path)
+        if "tag" not in body:
+            raise _HttpError(400, "tag is required to update an entity")
+        if self.faults.conflict() or self.catalog.put(path, body["tag"], body.get("accessControlList") or {}) is None:
+            raise _HttpError(409, "The entity was changed by another user, refresh its tag")
+        return self.catalog.get(path)
+
+    def _submit(self, sql):
+        for regex, fn in self.sql_handlers:
+            match = regex.match(sql)
+            if match is not None:
+                try:
+                    rows = fn(self.catalog, match)
+                    job = {"jobState": "COMPLETED", "rowCount": len(rows), "rows": rows}
+                except ValueError as e:
+                    job = {"jobState": "FAILED", "rowCount": 0, "rows": [], "errorMessage": str(e)}
+                break
+        else:
+            job = {"jobState": "FAILED", "rowCount": 0, "rows": [],
+                   "errorMessage": "Query is not supported by the mock server: " + sql}
+        job["id"] = str(uuid.uuid4())
+        job["ready"] = time.time() + self.job_seconds
+        with self._lock:
+            self._jobs[job["id"]] = job
+        return {"id": job["id"]}
+
+    def _job(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise _HttpError(404, "No job " + job_id)
+        if time.time() < job["ready"]:
+            return {"id": job_id, "jobState": "RUNNING", "rowCount": 0, "rows": []}
+        return job
+
+    def _results(self, job, query):
+        if job["jobState"] != "COMPLETED":
+            raise _HttpError(400, "Job {} is {}".format(job["id"], job["jobState"]))
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", ["100"])[0])
+        if limit > MAX_RESULTS:
+            raise _HttpError(400, "limit can not be more than {}".format(MAX_RESULTS))
+        return {"rowCount": job["rowCount"], "rows": job["rows"][offset:offset + limit]}
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""INFORMATION_SCHEMA, sys.privileges, GRANT and REVOKE statements answered by the mock server"""
+import re
+
+from .server import sql_handler
+
+_SCHEMA_LITERAL = re.compile(r"(?:TABLE_SCHEMA|SCHEMA_NAME|OBJECT_ID)\s*=\s*'((?:[^']|'')*)'", re.IGNORECASE)
+
+# catalog ACL permissions as SQL privileges
+_PRIVILEGES = {"READ": "SELECT", "WRITE": "ALTER"}
+_GRANTEE_TYPES = {"users": "user", "groups": "group", "roles": "role"}
+_PERMISSIONS = dict((v, k) for k, v in _PRIVILEGES.items())
+_OBJECT_TYPES = {"TABLE": "dataset", "VIEW": "dataset", "FOLDER": "folder", "SPACE": "space", "SOURCE": "source"}
+
+_NAME = re.compile(r'"((?:[^"]|"")*)"|([^".]+)')
+
+
+def _prefixes(catalog, where):
+    # only the schema equality conditions are looked at, each names a container to list below
+    schemas = [m.group(1).replace("''", "'") for m in _SCHEMA_LITERAL.finditer(where or "")]
+    if not schemas:
+        return [[root] for root in catalog.roots]
+    return [schema.split(".") for schema in schemas]
+
+
+def _project(columns, rows):
+    columns = columns.strip()
+    if columns == "*":
+        return rows
+    names = [c.strip().strip('"') for c in columns.split(",")]
+    return [dict((name, row[name]) for name in names) for row in rows]
+
+
+@sql_handler(r'SELECT\s+(?P<columns>.+?)\s+FROM\s+INFORMATION_SCHEMA\."?TABLES"?(?:\s+WHERE\s+(?P<where>.*))?')
+def tables(catalog, match):
+    rows = []
+    for prefix in _prefixes(catalog, match.group("where")):
+        if catalog.kind(prefix) in (None, "dataset"):
+            continue
+        for child in catalog.walk(prefix):
+            if child["type"] == "DATASET":
+                rows.append({"TABLE_CATALOG": "DREMIO", "TABLE_SCHEMA": ".".join(child["path"][:-1]),
+                             "TABLE_NAME": child["path"][-1],
+                             "TABLE_TYPE": "VIEW" if child["datasetType"] == "VIRTUAL" else "TABLE"})
+    return _project(match.group("columns"), rows)
+
+
+@sql_handler(r"SELECT\s+(?P<columns>.+?)\s+FROM\s+INFORMATION_SCHEMA\.SCHEMATA(?:\s+WHERE\s+(?P<where>.*))?")
+def schemata(catalog, match):
+    rows = []
+    for prefix in _prefixes(catalog, match.group("where")):
+        if catalog.kind(prefix) in (None, "dataset"):
+            continue
+        paths = [prefix] + [child["path"] for child in catalog.walk(prefix) if child["type"] == "CONTAINER"]
+        for path in paths:
+            rows.append({"CATALOG_NAME": "DREMIO", "SCHEMA_NAME": ".".join(path), "SCHEMA_OWNER": "<owner>",
+                         "TYPE": "SIMPLE", "IS_MUTABLE": "NO"})
+    return _project(match.group("columns"), rows)
+
+
+@sql_handler(r"SELECT\s+(?P<columns>.+?)\s+FROM\s+sys\.privileges(?:\s+WHERE\s+(?P<where>.*))?")
+def privileges(catalog, match):
+    rows = []
+    for prefix in _prefixes(catalog, match.group("where")):
+        # quoted names in the condition do not name a container and are skipped here
+        if catalog.kind(prefix) in (None, "dataset"):
+            continue
+        for child in [{"path": prefix, "type": "CONTAINER"}] + list(catalog.walk(prefix)):
+            path = child["path"]
+            kind = catalog.kind(path)
+            object_type = ("PDS" if catalog.roots.index(path[0]) < catalog.sources else "VDS") \
+                if kind == "dataset" else kind.upper()
+            object_id = ".".join('"' + p.replace('"', '""') + '"' for p in path)
+            acl = catalog.acl(path)
+            for key, grantee_type in sorted(_GRANTEE_TYPES.items()):
+                for principal in acl.get(key, []):
+                    for permission in principal["permissions"]:
+                        rows.append({"grantee_type": grantee_type, "grantee_id": principal["id"],
+                                     "privilege": _PRIVILEGES.get(permission, permission),
+                                     "object_type": object_type, "object_id": object_id})
+    return _project(match.group("columns"), rows)
+
+
+def _split_name(name):
+    return [(quoted.replace('""', '"') if quoted else plain.strip()) for quoted, plain in _NAME.findall(name)]
+
+
+@sql_handler(r"(?P<verb>GRANT|REVOKE)\s+(?P<privileges>.+?)\s+ON\s+(?P<type>\w+)\s+(?P<name>.+?)\s+(?:TO|FROM)\s+"
+             r"(?P<grantee_type>USER|ROLE)\s+(?P<grantee>.+)")
+def grant(catalog, match):
+    path = _split_name(match.group("name"))
+    kind = catalog.kind(path)
+    if kind is None or _OBJECT_TYPES.get(match.group("type").upper()) != kind:
+        raise ValueError("Object {} not found".format(match.group("name")))
+    grantee = _split_name(match.group("grantee"))[0]
+    permissions = [_PERMISSIONS.get(p.strip().upper(), p.strip().upper()) for p in match.group("privileges").split(",")]
+    grantees = "users" if match.group("grantee_type").upper() == "USER" else "roles"
+    catalog.grant(path, grantees, grantee, permissions, match.group("verb").upper() == "REVOKE")
+    return [{"ok": True, "summary": "Privileges changed"}]
@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 
+import time
+from contextlib import contextmanager
+
 import requests
 import json as jsonlib
-from requests.exceptions import HTTPError
+from requests.exceptions import ConnectionError, HTTPError, Timeout
 from six.moves.urllib.parse import quote
 
 from ..error import (
@@ -19,27 +22,89 @@ def _get_headers(token):
     return headers
 
 
-def _get(url, token, details="", ssl_verify=True):
-    r = requests.get(url, headers=_get_headers(token), verify=ssl_verify)
+_limiter = None
+_metrics = None
+
+
+def set_limiter(limiter):
+    """
+    send every request through limiter, or through nothing if limiter is None
+
+    :param limiter: object with acquire() and release(latency, status, retry_after, failed), e.g. AdaptiveLimiter
+    """
+    global _limiter
+    _limiter = limiter
+
+
+def set_metrics(metrics):
+    """
+    record every request in metrics, or nowhere if metrics is None
+
+    :param metrics: object with record(method, url, latency, status, size) and phase(name), e.g. Metrics
+    """
+    global _metrics
+    _metrics = metrics
+
+
+@contextmanager
+def _no_phase():
+    yield
+
+
+def phase(name):
+    """context manager timing a phase of a run in the installed metrics, if any"""
+    metrics = _metrics
+    return metrics.phase(name) if metrics is not None else _no_phase()
+
+
+def _request(method, url, token, json=None, ssl_verify=True, session=None):
+    # a Session reuses its pooled connections, the requests module opens a new one for every call
+    http = session if session is not None else requests
+    limiter = _limiter
+    metrics = _metrics
+    if limiter is None and metrics is None:
+        return http.request(method, url, headers=_get_headers(token), verify=ssl_verify, json=json)
+    if limiter is not None:
+        limiter.acquire()
+    start = time.time()
+    try:
+        r = http.request(method, url, headers=_get_headers(token), verify=ssl_verify, json=json)
+    except Exception as e:  # NOQA
+        latency = time.time() - start
+        if limiter is not None:
+            limiter.release(latency, failed=isinstance(e, (ConnectionError, Timeout)))
+        if metrics is not None:
+            metrics.record(method, url, latency)
+        raise
+    latency = time.time() - start
+    if limiter is not None:
+        limiter.release(latency, r.status_code, r.headers.get("Retry-After"))
+    if metrics is not None:
+        metrics.record(method, url, latency, r.status_code, len(r.content))
+    return r
+
+
+def _get(url, token, details="", ssl_verify=True, session=None):
+    r = _request("GET", url, token, ssl_verify=ssl_verify, session=session)
     return _check_error(r, details)
 
 
-def _post(url, token, json=None, details="", ssl_verify=True):
+def _post(url, token, json=None, details="", ssl_verify=True, session=None):
     if isinstance(json, str):
         json = jsonlib.loads(json)
-    r = requests.post(url, headers=_get_headers(token), verify=ssl_verify, json=json)
+    r = _request("POST", url, token, json, ssl_verify, session)
     return _check_error(r, details)
 
 
-def _delete(url, token, details="", ssl_verify=True):
-    r = requests.delete(url, headers=_get_headers(token), verify=ssl_verify)
+def _delete(url, token, details="", ssl_verify=True, session=None):
+    r = _request("DELETE", url, token, ssl_verify=ssl_verify, session=session)
     return _check_error(r, details)
 
 
-def _put(url, token, json=None, details="", ssl_verify=True):
+def _put(url, token, json=None, details="", ssl_verify=True, session=None):
     if isinstance(json, str):
         json = jsonlib.loads(json)
-    r = requests.put(url, headers=_get_headers(token), verify=ssl_verify, json=json)
+    r = _request("PUT", url, token, json, ssl_verify, session)
     return _check_error(r, details)
 
 
@@ -59,10 +124,18 @@ def _check_error(r, details=""):
         raise DremioPermissionException("Not permissioned to view entity at " + details, error, r)
     if code == 404:
         raise DremioNotFoundException("No entity exists at " + details, error, r)
-    raise DremioException("unknown error", error)
+    raise DremioException("unknown error", error, r)
+
+
+def _catalog_item_url(base_url, cid=None, path=None):
+    if cid is None and path is None:
+        raise TypeError("both id and path can't be None for a catalog_item call")
+    cpath = [quote(i, safe="") for i in path] if path else ""
+    endpoint = "/{}".format(cid) if cid else "/by-path/{}".format("/".join(cpath).replace('"', ""))
+    return base_url + "/api/v3/catalog{}".format(endpoint)
 
 
-def catalog_item(token, base_url, cid=None, path=None, ssl_verify=True):
+def catalog_item(token, base_url, cid=None, path=None, ssl_verify=True, session=None):
     """fetch a specific catalog item by id or by path
 
     https://docs.dremio.com/rest-api/catalog/get-catalog-id.html
@@ -73,29 +146,46 @@ def catalog_item(token, base_url, cid=None, path=None, ssl_verify=True):
     :param cid: unique dremio id for resource
     :param path: list ['space', 'folder', 'vds']
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: json of resource
     """
-    if cid is None and path is None:
-        raise TypeError("both id and path can't be None for a catalog_item call")
+    url = _catalog_item_url(base_url, cid, path)
     idpath = (cid if cid else "") + ", " + (".".join(path) if path else "")
-    cpath = [quote(i, safe="") for i in path] if path else ""
-    endpoint = "/{}".format(cid) if cid else "/by-path/{}".format("/".join(cpath).replace('"', ""))
-    return _get(base_url + "/api/v3/catalog{}".format(endpoint), token, idpath, ssl_verify=ssl_verify)
+    return _get(url, token, idpath, ssl_verify=ssl_verify, session=session)
 
 
-def catalog(token, base_url, ssl_verify=True):
+def catalog_item_raw(token, base_url, cid=None, path=None, ssl_verify=True, session=None):
+    """fetch a specific catalog item by id or by path without decoding it
+
+    :param token: auth token from previous login attempt
+    :param base_url: base Dremio url
+    :param cid: unique dremio id for resource
+    :param path: list ['space', 'folder', 'vds']
+    :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
+    :return: response body as bytes
+    """
+    url = _catalog_item_url(base_url, cid, path)
+    r = _request("GET", url, token, ssl_verify=ssl_verify, session=session)
+    if r.status_code >= 400:
+        _check_error(r, (cid if cid else "") + ", " + (".".join(path) if path else ""))
+    return r.content
+
+
+def catalog(token, base_url, ssl_verify=True, session=None):
     """
     https://docs.dremio.com/rest-api/catalog/get-catalog.html populate the root dremio catalog
 
     :param token: auth token from previous login attempt
     :param base_url: base Dremio url
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: json of root resource
     """
-    return _get(base_url + "/api/v3/catalog", token, ssl_verify=ssl_verify)
+    return _get(base_url + "/api/v3/catalog", token, ssl_verify=ssl_verify, session=session)
 
 
-def sql(token, base_url, query, context=None, ssl_verify=True):
+def sql(token, base_url, query, context=None, ssl_verify=True, session=None):
     """submit job w/ given sql
 
     https://docs.dremio.com/rest-api/sql/post-sql.html
@@ -105,12 +195,15 @@ def sql(token, base_url, query, context=None, ssl_verify=True):
     :param query: sql query
     :param context: optional dremio context
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: job id json object
     """
-    return _post(base_url + "/api/v3/sql", token, ssl_verify=ssl_verify, json={"sql": query, "context": context})
+    return _post(
+        base_url + "/api/v3/sql", token, ssl_verify=ssl_verify, json={"sql": query, "context": context}, session=session
+    )
 
 
-def job_status(token, base_url, job_id, ssl_verify=True):
+def job_status(token, base_url, job_id, ssl_verify=True, session=None):
     """fetch job status
 
     https://docs.dremio.com/rest-api/jobs/get-job.html
@@ -119,12 +212,13 @@ def job_status(token, base_url, job_id, ssl_verify=True):
     :param base_url: sql query
     :param job_id: job id (as returned by sql)
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: status object
     """
-    return _get(base_url + "/api/v3/job/{}".format(job_id), token, ssl_verify=ssl_verify)
+    return _get(base_url + "/api/v3/job/{}".format(job_id), token, ssl_verify=ssl_verify, session=session)
 
 
-def job_results(token, base_url, job_id, offset=0, limit=100, ssl_verify=True):
+def job_results(token, base_url, job_id, offset=0, limit=100, ssl_verify=True, session=None):
     """fetch job results
 
     https://docs.dremio.com/rest-api/jobs/get-job.html
@@ -135,16 +229,18 @@ def job_results(token, base_url, job_id, offset=0, limit=100, ssl_verify=True):
     :param offset: offset of result set to return
     :param limit: number of results to return (max 500)
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
     return _get(
         base_url + "/api/v3/job/{}/results?offset={}&limit={}".format(job_id, offset, limit),
         token,
         ssl_verify=ssl_verify,
+        session=session,
     )
 
 
-def reflections(token, base_url, summary=False, ssl_verify=True):
+def reflections(token, base_url, summary=False, ssl_verify=True, session=None):
     """fetch all reflections
 
     https://docs.dremio.com/rest-api/reflections/get-reflection.html
@@ -153,12 +249,15 @@ def reflections(token, base_url, summary=False, ssl_verify=True):
     :param base_url: sql query
     :param summary: fetch only the reflection summary
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
-    return _get(base_url + "/api/v3/reflection" + ("/summary" if summary else ""), token, ssl_verify=ssl_verify)
+    return _get(
+        base_url + "/api/v3/reflection" + ("/summary" if summary else ""), token, ssl_verify=ssl_verify, session=session
+    )
 
 
-def reflection(token, base_url, reflectionid, ssl_verify=True):
+def reflection(token, base_url, reflectionid, ssl_verify=True, session=None):
     """fetch a single reflection by id
 
     https://docs.dremio.com/rest-api/reflections/get-reflection.html
@@ -167,12 +266,13 @@ def reflection(token, base_url, reflectionid, ssl_verify=True):
     :param base_url: sql query
     :param reflectionid: id of the reflection to fetch
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
-    return _get(base_url + "/api/v3/reflection/{}".format(reflectionid), token, ssl_verify=ssl_verify)
+    return _get(base_url + "/api/v3/reflection/{}".format(reflectionid), token, ssl_verify=ssl_verify, session=session)
 
 
-def wlm_queues(token, base_url, ssl_verify=True):
+def wlm_queues(token, base_url, ssl_verify=True, session=None):
     """fetch all wlm queues
 
     https://docs.dremio.com/rest-api/reflections/get-wlm-queue.html
@@ -180,12 +280,13 @@ def wlm_queues(token, base_url, ssl_verify=True):
     :param token: auth token
     :param base_url: sql query
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
-    return _get(base_url + "/api/v3/wlm/queue", token, ssl_verify=ssl_verify)
+    return _get(base_url + "/api/v3/wlm/queue", token, ssl_verify=ssl_verify, session=session)
 
 
-def wlm_rules(token, base_url, ssl_verify=True):
+def wlm_rules(token, base_url, ssl_verify=True, session=None):
     """fetch all wlm rules
 
     https://docs.dremio.com/rest-api/reflections/get-wlm-queue.html
@@ -193,12 +294,13 @@ def wlm_rules(token, base_url, ssl_verify=True):
     :param token: auth token
     :param base_url: sql query
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
-    return _get(base_url + "/api/v3/wlm/rule", token, ssl_verify=ssl_verify)
+    return _get(base_url + "/api/v3/wlm/rule", token, ssl_verify=ssl_verify, session=session)
 
 
-def votes(token, base_url, ssl_verify=True):
+def votes(token, base_url, ssl_verify=True, session=None):
     """fetch all votes
 
     https://docs.dremio.com/rest-api/reflections/get-vote.html
@@ -206,12 +308,13 @@ def votes(token, base_url, ssl_verify=True):
     :param token: auth token
     :param base_url: sql query
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
-    return _get(base_url + "/api/v3/vote", token, ssl_verify=ssl_verify)
+    return _get(base_url + "/api/v3/vote", token, ssl_verify=ssl_verify, session=session)
 
 
-def user(token, base_url, uid=None, name=None, ssl_verify=True):
+def user(token, base_url, uid=None, name=None, ssl_verify=True, session=None):
     """
     fetch user based on id or name
     https://docs.dremio.com/rest-api/reflections/get-user.html
@@ -221,16 +324,17 @@ def user(token, base_url, uid=None, name=None, ssl_verify=True):
     :param uid: unique dremio id for user
     :param name: name for a user
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
     if uid is None and name is None:
         raise TypeError("both id and name can't be None for a user call")
     idpath = (uid if uid else "") + ", " + (".".join(name) if name else "")
     endpoint = "/{}".format(uid) if uid else "/by-name/{}".format("/".join(name).replace('"', ""))
-    return _get(base_url + "/api/v3/user{}".format(endpoint), token, idpath, ssl_verify=ssl_verify)
+    return _get(base_url + "/api/v3/user{}".format(endpoint), token, idpath, ssl_verify=ssl_verify, session=session)
 
 
-def group(token, base_url, gid=None, name=None, ssl_verify=True):
+def group(token, base_url, gid=None, name=None, ssl_verify=True, session=None):
     """fetch a group based on id or name
 
     https://docs.dremio.com/rest-api/reflections/get-group.html
@@ -240,16 +344,17 @@ def group(token, base_url, gid=None, name=None, ssl_verify=True):
     :param gid: unique dremio id for group
     :param name: name for a group
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
     if gid is None and name is None:
         raise TypeError("both id and name can't be None for a user call")
     idpath = (gid if gid else "") + ", " + (".".join(name) if name else "")
     endpoint = "/{}".format(gid) if gid else "/by-name/{}".format("/".join(name).replace('"', ""))
-    return _get(base_url + "/api/v3/group{}".format(endpoint), token, idpath, ssl_verify=ssl_verify)
+    return _get(base_url + "/api/v3/group{}".format(endpoint), token, idpath, ssl_verify=ssl_verify, session=session)
 
 
-def personal_access_token(token, base_url, uid, ssl_verify=True):
+def personal_access_token(token, base_url, uid, ssl_verify=True, session=None):
     """fetch a PAT for a user based on id
 
     https://docs.dremio.com/rest-api/user/get-user-id-token.html
@@ -259,11 +364,12 @@ def personal_access_token(token, base_url, uid, ssl_verify=True):
     :param uid: id of a user
     :return: result object
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     """
-    return _get(base_url + "/api/v3/user/{}/token".format(uid), token, ssl_verify=ssl_verify)
+    return _get(base_url + "/api/v3/user/{}/token".format(uid), token, ssl_verify=ssl_verify, session=session)
 
 
-def collaboration_tags(token, base_url, cid, ssl_verify=True):
+def collaboration_tags(token, base_url, cid, ssl_verify=True, session=None):
     """fetch tags for a catalog entry
 
     https://docs.dremio.com/rest-api/user/get-catalog-collaboration.html
@@ -272,12 +378,15 @@ def collaboration_tags(token, base_url, cid, ssl_verify=True):
     :param base_url: sql query
     :param cid: id of a catalog entity
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
-    return _get(base_url + "/api/v3/catalog/{}/collaboration/tag".format(cid), token, ssl_verify=ssl_verify)
+    return _get(
+        base_url + "/api/v3/catalog/{}/collaboration/tag".format(cid), token, ssl_verify=ssl_verify, session=session
+    )
 
 
-def collaboration_wiki(token, base_url, cid, ssl_verify=True):
+def collaboration_wiki(token, base_url, cid, ssl_verify=True, session=None):
     """fetch wiki for a catalog entry
 
     https://docs.dremio.com/rest-api/user/get-catalog-collaboration.html
@@ -286,12 +395,15 @@ def collaboration_wiki(token, base_url, cid, ssl_verify=True):
     :param base_url: sql query
     :param cid: id of a catalog entity
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
-    return _get(base_url + "/api/v3/catalog/{}/collaboration/wiki".format(cid), token, ssl_verify=ssl_verify)
+    return _get(
+        base_url + "/api/v3/catalog/{}/collaboration/wiki".format(cid), token, ssl_verify=ssl_verify, session=session
+    )
 
 
-def refresh_pds(token, base_url, pid, ssl_verify=True):
+def refresh_pds(token, base_url, pid, ssl_verify=True, session=None):
     """ refresh a physical dataset and all its child reflections
 
     https://docs.dremio.com/rest-api/catalog/post-catalog-id-refresh.html
@@ -300,12 +412,13 @@ def refresh_pds(token, base_url, pid, ssl_verify=True):
     :param base_url: sql query
     :param pid: id of a catalog entity
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: None
     """
-    return _post(base_url + "/api/v3/catalog/{}/refresh".format(pid), token, ssl_verify=ssl_verify)
+    return _post(base_url + "/api/v3/catalog/{}/refresh".format(pid), token, ssl_verify=ssl_verify, session=session)
 
 
-def set_collaboration_tags(token, base_url, cid, tags, ssl_verify=True):
+def set_collaboration_tags(token, base_url, cid, tags, ssl_verify=True, session=None):
     """ set tags on a given catalog entity
 
     https://docs.dremio.com/rest-api/catalog/post-catalog-collaboration.html
@@ -315,18 +428,25 @@ def set_collaboration_tags(token, base_url, cid, tags, ssl_verify=True):
     :param cid: id of a catalog entity
     :param tags: list of strings for tags
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: None
     """
     json = {"tags": tags}
     try:
-        old_tags = collaboration_tags(token, base_url, cid, ssl_verify)
+        old_tags = collaboration_tags(token, base_url, cid, ssl_verify, session)
         json["version"] = old_tags["version"]
     except:  # NOQA
         pass
-    return _post(base_url + "/api/v3/catalog/{}/collaboration/tag".format(cid), token, ssl_verify=ssl_verify, json=json)
+    return _post(
+        base_url + "/api/v3/catalog/{}/collaboration/tag".format(cid),
+        token,
+        ssl_verify=ssl_verify,
+        json=json,
+        session=session,
+    )
 
 
-def set_collaboration_wiki(token, base_url, cid, wiki, ssl_verify=True):
+def set_collaboration_wiki(token, base_url, cid, wiki, ssl_verify=True, session=None):
     """ set wiki on a given catalog entity
 
     https://docs.dremio.com/rest-api/catalog/post-catalog-collaboration.html
@@ -336,20 +456,25 @@ def set_collaboration_wiki(token, base_url, cid, wiki, ssl_verify=True):
     :param cid: id of a catalog entity
     :param wiki: text representing markdown for entity
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: None
     """
     json = {"text": wiki}
     try:
-        old_wiki = collaboration_wiki(token, base_url, cid, ssl_verify)
+        old_wiki = collaboration_wiki(token, base_url, cid, ssl_verify, session)
         json["version"] = old_wiki["version"]
     except:  # NOQA
         pass
     return _post(
-        base_url + "/api/v3/catalog/{}/collaboration/wiki".format(cid), token, ssl_verify=ssl_verify, json=json
+        base_url + "/api/v3/catalog/{}/collaboration/wiki".format(cid),
+        token,
+        ssl_verify=ssl_verify,
+        json=json,
+        session=session,
     )
 
 
-def delete_catalog(token, base_url, cid, tag, ssl_verify=True):
+def delete_catalog(token, base_url, cid, tag, ssl_verify=True, session=None):
     """ remove a catalog item from Dremio
 
     https://docs.dremio.com/rest-api/catalog/delete-catalog-id.html
@@ -359,12 +484,15 @@ def delete_catalog(token, base_url, cid, tag, ssl_verify=True):
     :param cid: id of a catalog entity
     :param tag: version tag of entity
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: None
     """
-    return _delete(base_url + "/api/v3/catalog/{}?tag={}".format(cid, tag), token, ssl_verify=ssl_verify)
+    return _delete(
+        base_url + "/api/v3/catalog/{}?tag={}".format(cid, tag), token, ssl_verify=ssl_verify, session=session
+    )
 
 
-def set_catalog(token, base_url, json, ssl_verify=True):
+def set_catalog(token, base_url, json, ssl_verify=True, session=None):
     """ add a new catalog entity
 
     https://docs.dremio.com/rest-api/catalog/post-catalog.html
@@ -373,12 +501,13 @@ def set_catalog(token, base_url, json, ssl_verify=True):
     :param base_url: sql query
     :param json: json document for new catalog entity
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: new catalog entity
     """
-    return _post(base_url + "/api/v3/catalog", token, json, ssl_verify=ssl_verify)
+    return _post(base_url + "/api/v3/catalog", token, json, ssl_verify=ssl_verify, session=session)
 
 
-def update_catalog(token, base_url, cid, json, ssl_verify=True):
+def update_catalog(token, base_url, cid, json, ssl_verify=True, session=None):
     """ update a catalog entity
 
     https://docs.dremio.com/rest-api/catalog/put-catalog-id.html
@@ -388,12 +517,13 @@ def update_catalog(token, base_url, cid, json, ssl_verify=True):
     :param cid: id of catalog entity
     :param json: json document for new catalog entity
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: updated catalog entity
     """
-    return _put(base_url + "/api/v3/catalog/{}".format(cid), token, json, ssl_verify=ssl_verify)
+    return _put(base_url + "/api/v3/catalog/{}".format(cid), token, json, ssl_verify=ssl_verify, session=session)
 
 
-def promote_catalog(token, base_url, cid, json, ssl_verify=True):
+def promote_catalog(token, base_url, cid, json, ssl_verify=True, session=None):
     """ promote a catalog entity (only works on folders and files in sources
 
     https://docs.dremio.com/rest-api/catalog/post-catalog-id.html
@@ -403,12 +533,13 @@ def promote_catalog(token, base_url, cid, json, ssl_verify=True):
     :param cid: id of catalog entity
     :param json: json document for new catalog entity
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: updated catalog entity
     """
-    return _post(base_url + "/api/v3/catalog/{}".format(cid), token, json, ssl_verify=ssl_verify)
+    return _post(base_url + "/api/v3/catalog/{}".format(cid), token, json, ssl_verify=ssl_verify, session=session)
 
 
-def set_personal_access_token(token, base_url, uid, label, lifetime=24, ssl_verify=True):
+def set_personal_access_token(token, base_url, uid, label, lifetime=24, ssl_verify=True, session=None):
     """ create a pat for a given user
 
     https://docs.dremio.com/rest-api/user/post-user-uid-token.html
@@ -419,6 +550,7 @@ def set_personal_access_token(token, base_url, uid, label, lifetime=24, ssl_veri
     :param label: label of token
     :param lifetime: lifetime in hours of token
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: updated catalog entity
     """
     return _post(
@@ -426,10 +558,11 @@ def set_personal_access_token(token, base_url, uid, label, lifetime=24, ssl_veri
         token,
         {"label": label, "lifeTime": 1000 * 60 * 60 * lifetime},
         ssl_verify=ssl_verify,
+        session=session,
     )
 
 
-def delete_personal_access_token(token, base_url, uid, tid=None, ssl_verify=True):
+def delete_personal_access_token(token, base_url, uid, tid=None, ssl_verify=True, session=None):
     """ create a pat for a given user
 
     https://docs.dremio.com/rest-api/user/delete-user-uid-token.html
@@ -439,14 +572,18 @@ def delete_personal_access_token(token, base_url, uid, tid=None, ssl_verify=True
     :param uid: id user
     :param tid: label of token (optional)
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: updated catalog entity
     """
     return _delete(
-        base_url + "/api/v3/user/{}/token{}".format(uid, ("/" + tid) if tid else ""), token, ssl_verify=ssl_verify
+        base_url + "/api/v3/user/{}/token{}".format(uid, ("/" + tid) if tid else ""),
+        token,
+        ssl_verify=ssl_verify,
+        session=session,
     )
 
 
-def modify_reflection(token, base_url, reflectionid, json, ssl_verify=True):
+def modify_reflection(token, base_url, reflectionid, json, ssl_verify=True, session=None):
     """update a single reflection by id
 
     https://docs.dremio.com/rest-api/reflections/put-reflection.html
@@ -456,12 +593,15 @@ def modify_reflection(token, base_url, reflectionid, json, ssl_verify=True):
     :param reflectionid: id of the reflection to fetch
     :param json: json document for modified reflection
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
-    return _put(base_url + "/api/v3/reflection/{}".format(reflectionid), token, json, ssl_verify=ssl_verify)
+    return _put(
+        base_url + "/api/v3/reflection/{}".format(reflectionid), token, json, ssl_verify=ssl_verify, session=session
+    )
 
 
-def create_reflection(token, base_url, json, ssl_verify=True):
+def create_reflection(token, base_url, json, ssl_verify=True, session=None):
     """create a single reflection
 
     https://docs.dremio.com/rest-api/reflections/post-reflection.html
@@ -470,12 +610,13 @@ def create_reflection(token, base_url, json, ssl_verify=True):
     :param base_url: sql query
     :param json: json document for new reflection
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
-    return _post(base_url + "/api/v3/reflection/", token, json, ssl_verify=ssl_verify)
+    return _post(base_url + "/api/v3/reflection/", token, json, ssl_verify=ssl_verify, session=session)
 
 
-def delete_reflection(token, base_url, reflectionid, ssl_verify=True):
+def delete_reflection(token, base_url, reflectionid, ssl_verify=True, session=None):
     """delete a single reflection by id
 
     https://docs.dremio.com/rest-api/reflections/delete-reflection.html
@@ -484,12 +625,13 @@ def delete_reflection(token, base_url, reflectionid, ssl_verify=True):
     :param base_url: sql query
     :param reflectionid: id of the reflection to delete
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
-    _delete(base_url + "/api/v3/reflection/{}".format(reflectionid), token, ssl_verify=ssl_verify)
+    _delete(base_url + "/api/v3/reflection/{}".format(reflectionid), token, ssl_verify=ssl_verify, session=session)
 
 
-def cancel_job(token, base_url, jid, ssl_verify=True):
+def cancel_job(token, base_url, jid, ssl_verify=True, session=None):
     """cancel running job with job id = jid
 
     https://docs.dremio.com/rest-api/jobs/post-job.html
@@ -498,14 +640,15 @@ def cancel_job(token, base_url, jid, ssl_verify=True):
     :param base_url: sql query
     :param jid: id of the job to cancel
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     :exception DremioNotFoundException no job found
     :exception DremioBadRequestException job already finished
     """
-    _post(base_url + "/api/v3/job/{}/cancel".format(jid), token, ssl_verify=ssl_verify)
+    _post(base_url + "/api/v3/job/{}/cancel".format(jid), token, ssl_verify=ssl_verify, session=session)
 
 
-def modify_queue(token, base_url, queueid, json, ssl_verify=True):
+def modify_queue(token, base_url, queueid, json, ssl_verify=True, session=None):
     """update a single queue by id
 
     https://docs.dremio.com/rest-api/reflections/put-wlm-queue.html
@@ -515,12 +658,13 @@ def modify_queue(token, base_url, queueid, json, ssl_verify=True):
     :param queueid: id of the reflection to fetch
     :param json: json document for modified queue
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
-    return _put(base_url + "/api/v3/queue/{}".format(queueid), token, json, ssl_verify=ssl_verify)
+    return _put(base_url + "/api/v3/queue/{}".format(queueid), token, json, ssl_verify=ssl_verify, session=session)
 
 
-def create_queue(token, base_url, json, ssl_verify=True):
+def create_queue(token, base_url, json, ssl_verify=True, session=None):
     """create a single queue
 
     https://docs.dremio.com/rest-api/reflections/post-wlm-queue.html
@@ -529,12 +673,13 @@ def create_queue(token, base_url, json, ssl_verify=True):
     :param base_url: sql query
     :param json: json document for new queue
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
-    return _post(base_url + "/api/v3/queue/", token, json, ssl_verify=ssl_verify)
+    return _post(base_url + "/api/v3/queue/", token, json, ssl_verify=ssl_verify, session=session)
 
 
-def delete_queue(token, base_url, queueid, ssl_verify=True):
+def delete_queue(token, base_url, queueid, ssl_verify=True, session=None):
     """delete a single queue by id
 
     https://docs.dremio.com/rest-api/reflections/delete-wlm-queue.html
@@ -543,12 +688,13 @@ def delete_queue(token, base_url, queueid, ssl_verify=True):
     :param base_url: sql query
     :param queueid: id of the queue to delete
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
-    _delete(base_url + "/api/v3/queue/{}".format(queueid), token, ssl_verify=ssl_verify)
+    _delete(base_url + "/api/v3/queue/{}".format(queueid), token, ssl_verify=ssl_verify, session=session)
 
 
-def modify_rules(token, base_url, json, ssl_verify=True):
+def modify_rules(token, base_url, json, ssl_verify=True, session=None):
     """update wlm rules. Order of rules array is important!
 
     The order of the rules is the order in which they will be applied. If a rule isn't included it will be deleted
@@ -559,9 +705,10 @@ def modify_rules(token, base_url, json, ssl_verify=True):
     :param base_url: sql query
     :param json: json document for modified reflection
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: result object
     """
-    return _put(base_url + "/api/v3/rule/", token, json, ssl_verify=ssl_verify)
+    return _put(base_url + "/api/v3/rule/", token, json, ssl_verify=ssl_verify, session=session)
 
 
 def _raise_for_status(self):
@@ -588,7 +735,7 @@ def _raise_for_status(self):
         return None, self.status_code, reason
 
 
-def graph(token, base_url, cid=None, ssl_verify=True):
+def graph(token, base_url, cid=None, ssl_verify=True, session=None):
     """Retrieves graph information about a specific catalog entity by id
 
     https://docs.dremio.com/rest-api/catalog/get-catalog-id-graph.html
@@ -597,8 +744,9 @@ def graph(token, base_url, cid=None, ssl_verify=True):
     :param base_url: base Dremio url
     :param cid: unique dremio id for resource
     :param ssl_verify: ignore ssl errors if False
+    :param session: optional requests.Session to send the requests with
     :return: json of resource
     """
     if cid is None:
         raise TypeError("resource id can't be None for a graph call")
-    return _get(base_url + "/api/v3/catalog/{}/graph".format(cid), token, ssl_verify=ssl_verify)
+    return _get(base_url + "/api/v3/catalog/{}/graph".format(cid), token, ssl_verify=ssl_verify, session=session)
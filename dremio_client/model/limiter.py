@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import email.utils
+import threading
+import time
+
+OVERLOAD_STATUS = {429, 503}
+
+
+def parse_retry_after(value, now=None):
+    """
+    seconds to wait according to a Retry-After header
+
+    :param value: header value, either delta seconds or an HTTP date
+    :param now: current time.time(), for HTTP dates
+    :return: seconds to wait, or None if the header is missing or malformed
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parsed = email.utils.parsedate_tz(value)
+    if parsed is None:
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, email.utils.mktime_tz(parsed) - now)
+
+
+class AdaptiveLimiter(object):
+    def __init__(self, initial=2, min_limit=1, max_limit=256, target_latency=1.0, spike_factor=4.0, decrease=0.5,
+                 window=50):
+        """
+        AIMD limit on the number of requests in flight against the coordinator
+
+        Every `window` successful requests, the limit goes up by one if the p95 latency of that window stayed under
+        `target_latency`. A 429, 503, timeout or connection error, or a single response slower than `spike_factor`
+        times the target, multiplies the limit by `decrease`. At most one decrease happens per window so that a burst of
+        failures from the same overload only counts once. A Retry-After header holds back every new request until it
+        has passed.
+
+        :param initial: limit to start with
+        :param min_limit: lowest limit
+        :param max_limit: highest limit
+        :param target_latency: p95 latency in seconds under which the limit is raised
+        :param spike_factor: multiple of target_latency above which a single response counts as overload
+        :param decrease: factor applied to the limit on overload
+        :param window: number of responses between increases
+        """
+        self._min = min_limit
+        self._max = max_limit
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._target = target_latency
+        self._spike = spike_factor * target_latency
+        self._decrease = decrease
+        self._window = window
+        self._samples = []
+        self._since_cut = window
+        self._in_flight = 0
+        self._resume_at = 0.0
+        self._cond = threading.Condition()
+        self.increases = 0
+        self.decreases = 0
+        self.peak = int(self._limit)
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def acquire(self):
+        """block until a request may be sent"""
+        with self._cond:
+            while True:
+                wait = self._resume_at - time.time()
+                if wait <= 0 and self._in_flight < int(self._limit):
+                    self._in_flight += 1
+                    return
+                self._cond.wait(wait if wait > 0 else None)
+
+    def release(self, latency, status=None, retry_after=None, failed=False):
+        """
+        record the outcome of a request started with acquire
+
+        :param latency: seconds the request took
+        :param status: HTTP status code, None if no response was received
+        :param retry_after: value of the Retry-After header, if any
+        :param failed: True if the request timed out or the connection failed
+        """
+        with self._cond:
+            self._in_flight -= 1
+            self._since_cut += 1
+            delay = parse_retry_after(retry_after)
+            if delay:
+                self._resume_at = max(self._resume_at, time.time() + delay)
+            if failed or status in OVERLOAD_STATUS or latency > self._spike:
+                self._cut()
+            elif status is not None and status < 500:
+                self._samples.append(latency)
+                if len(self._samples) >= self._window:
+                    self._samples.sort()
+                    if self._samples[int(0.95 * (len(self._samples) - 1))] <= self._target and self._limit < self._max:
+                        self._limit += 1
+                        self.increases += 1
+                        self.peak = max(self.peak, int(self._limit))
+                    self._samples = []
+            self._cond.notify_all()
+
+    def _cut(self):
+        if self._since_cut < self._window:
+            return
+        self._limit = max(self._min, self._limit * self._decrease)
+        self._since_cut = 0
+        self._samples = []
+        self.decreases += 1
+
+    def stats(self):
+        with self._cond:
+            return {"limit": int(self._limit), "in_flight": self._in_flight, "peak": self.peak,
+                    "increases": self.increases, "decreases": self.decreases}
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import simplejson as json
+from six.moves.urllib.parse import urlparse
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# CPU time of the calling thread, where the platform can tell
+_thread_time = getattr(time, "thread_time", None)
+
+_WORD = re.compile(r"^[a-z][a-z_-]*$")
+
+
+def endpoint_template(url):
+    """
+    the endpoint a url was built from, with ids and paths replaced by placeholders
+
+    /api/v3/catalog/by-path/a/b becomes /api/v3/catalog/by-path/{path}, /api/v3/job/1234/results becomes
+    /api/v3/job/{id}/results
+
+    :param url: request url
+    :return: path template
+    """
+    path = urlparse(url).path
+    head, sep, _ = path.partition("/by-path/")
+    if sep:
+        return head + "/by-path/{path}"
+    segments = path.split("/")
+    # /api/v3/<collection> is always literal, any later segment that is not a plain word is an id
+    return "/".join(s if i < 4 or _WORD.match(s) else "{id}" for i, s in enumerate(segments))
+
+
+class _Series(object):
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.status = {}
+
+    def add(self, latency, status, size):
+        i = 0
+        while i < len(BUCKETS) and latency > BUCKETS[i]:
+            i += 1
+        self.buckets[i] += 1
+        self.count += 1
+        self.seconds += latency
+        self.bytes += size
+        key = str(status) if status is not None else "error"
+        self.status[key] = self.status.get(key, 0) + 1
+
+    def summary(self):
+        cumulative = []
+        total = 0
+        for n in self.buckets:
+            total += n
+            cumulative.append(total)
+        return {"count": self.count, "seconds": self.seconds, "bytes": self.bytes, "status": dict(self.status),
+                "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], cumulative))}
+
+
+class Metrics(object):
+    def __init__(self):
+        """
+        Run metrics: per endpoint request latency histograms, response sizes and status counts, phase timers and gauges
+
+        Phases can overlap and run on several threads at once. Each phase keeps the seconds spent inside it summed over
+        all threads, the CPU seconds of those threads while inside it, the number of times it was entered, and the wall
+        clock span from its first start to its last end.
+        """
+        self.started = time.time()
+        self._requests = {}
+        self._phases = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def record(self, method, url, latency, status=None, size=0):
+        """
+        record one request
+
+        :param method: HTTP method
+        :param url: request url, reduced to its endpoint template
+        :param latency: seconds the request took
+        :param status: HTTP status code, None if no response was received
+        :param size: response body size in bytes
+        """
+        key = (method, endpoint_template(url))
+        with self._lock:
+            series = self._requests.get(key)
+            if series is None:
+                series = self._requests[key] = _Series()
+            series.add(latency, status, size)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.time()
+        cpu = _thread_time() if _thread_time is not None else 0.0
+        try:
+            yield
+        finally:
+            end = time.time()
+            cpu = _thread_time() - cpu if _thread_time is not None else 0.0
+            with self._lock:
+                phase = self._phases.setdefault(name, {"seconds": 0.0, "cpu": 0.0, "count": 0, "first": start,
+                                                       "last": end})
+                phase["seconds"] += end - start
+                phase["cpu"] += cpu
+                phase["count"] += 1
+                phase["first"] = min(phase["first"], start)
+                phase["last"] = max(phase["last"], end)
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def summary(self):
+        with self._lock:
+            return {
+                "started": self.started,
+                "duration": time.time() - self.started,
+                "requests": [dict(series.summary(), method=method, endpoint=endpoint)
+                             for (method, endpoint), series in sorted(self._requests.items())],
+                "phases": dict((name, {"seconds": p["seconds"], "cpu": p["cpu"], "count": p["count"],
+                                       "wall": p["last"] - p["first"]})
+                               for name, p in self._phases.items()),
+                "gauges": dict(self._gauges),
+            }
+
+    def write_json(self, filename):
+        _write_atomic(filename, json.dumps(self.summary(), indent=2, sort_keys=True) + "\n")
+
+    def write_prometheus(self, filename, prefix="dremio_acl"):
+        """write the summary in the Prometheus text format, for the node exporter textfile collector"""
+        summary = self.summary()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append("# HELP {}_{} {}".format(prefix, name, help_text))
+            lines.append("# TYPE {}_{} {}".format(prefix, name, kind))
+            for suffix, labels, value in samples:
+                label_text = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+                                      for k, v in labels)
+                lines.append("{}_{}{}{} {}".format(prefix, name, suffix, "{" + label_text + "}" if label_text else "",
+                                                   repr(float(value))))
+
+        requests = summary["requests"]
+        samples = []
+        for r in requests:
+            labels = [("method", r["method"]), ("endpoint", r["endpoint"])]
+            for le in [str(b) for b in BUCKETS] + ["+Inf"]:
+                samples.append(("_bucket", labels + [("le", le)], r["buckets"][le]))
+            samples.append(("_sum", labels, r["seconds"]))
+            samples.append(("_count", labels, r["count"]))
+        metric("request_duration_seconds", "histogram", "Dremio REST request latency.", samples)
+        metric("response_bytes_total", "counter", "Dremio REST response body bytes.",
+               [("", [("method", r["method"]), ("endpoint", r["endpoint"])], r["bytes"]) for r in requests])
+        metric("requests_total", "counter", "Dremio REST requests by status code.",
+               [("", [("method", r["method"]), ("endpoint", r["endpoint"]), ("status", status)], n)
+                for r in requests for status, n in sorted(r["status"].items())])
+        phases = sorted(summary["phases"].items())
+        metric("phase_seconds_total", "counter", "Seconds spent in each phase, summed over threads.",
+               [("", [("phase", name)], p["seconds"]) for name, p in phases])
+        metric("phase_cpu_seconds_total", "counter", "CPU seconds of the threads in each phase.",
+               [("", [("phase", name)], p["cpu"]) for name, p in phases])
+        metric("phase_wall_seconds", "gauge", "Wall clock span of each phase.",
+               [("", [("phase", name)], p["wall"]) for name, p in phases])
+        for name, value in sorted(summary["gauges"].items()):
+            metric(name, "gauge", "Value of {} at the end of the run.".format(name), [("", [], value)])
+        metric("run_duration_seconds", "gauge", "Duration of the run.", [("", [], summary["duration"])])
+        metric("last_run_timestamp_seconds", "gauge", "Start time of the run.", [("", [], summary["started"])])
+        _write_atomic(filename, "\n".join(lines) + "\n")
+
+
+def _write_atomic(filename, text):
+    # collectors may read the file at any time, never let them see half of it
+    tmp = filename + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.rename(tmp, filename)
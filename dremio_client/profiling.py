@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import cProfile
+import datetime
+import os
+import pstats
+import sys
+import threading
+import time
+
+import simplejson as json
+from six import StringIO
+
+# process wide CPU time, time.clock on python 2
+_process_time = getattr(time, "process_time", None) or time.clock
+
+_active = None
+
+
+def note_output(dirname):
+    """ask the running profiler, if any, to write its files to dirname, next to the output of the command"""
+    if _active is not None:
+        _active.dirname = dirname
+
+
+class Profiler(object):
+    def __init__(self, name, dirname=".", interval=0.01):
+        """
+        Profile a CLI run
+
+        A cProfile profile is kept for the main thread and for every thread started during the run, and merged at the
+        end. A sampler thread also records the stack of every thread each `interval` seconds, as collapsed stacks that
+        flamegraph.pl or speedscope can read. This shows where threads wait as well as where they compute.
+
+        :param name: name of the run, used in the file names
+        :param dirname: directory to write the files to, see note_output
+        :param interval: seconds between stack samples
+        """
+        self.name = name
+        self.dirname = dirname
+        self._interval = interval
+        self._profiles = []
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def _thread_hook(self, frame, event, arg):
+        # runs once in each new thread and hands it over to a profile of its own
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def _sample(self):
+        me = threading.current_thread().ident
+        while not self._stop.wait(self._interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append("{}:{}".format(os.path.basename(code.co_filename), code.co_name))
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                self._samples[key] = self._samples.get(key, 0) + 1
+
+    def start(self):
+        global _active
+        _active = self
+        self._wall = time.time()
+        self._cpu = _process_time()
+        self._main = cProfile.Profile()
+        if sys.version_info < (3, 12):
+            # from 3.12 on one cProfile profile sees every thread, and a second one cannot be enabled
+            threading.setprofile(self._thread_hook)
+        self._sampler = threading.Thread(target=self._sample)
+        self._sampler.daemon = True
+        self._sampler.start()
+        self._main.enable()
+
+    def stop(self, metrics=None, out=lambda x: x):
+        """
+        stop profiling and write the results
+
+        Writes <prefix>.prof (pstats, for snakeviz or pstats.Stats), <prefix>.collapsed (sampled stacks),
+        <prefix>.json (wall and CPU time of the run and of each phase) and <prefix>.txt (the same breakdown, then the
+        top functions by cumulative time).
+
+        :param metrics: optional Metrics whose phase timers are added to the breakdown
+        :param out: output function
+        :return: file name prefix
+        """
+        global _active
+        self._main.disable()
+        threading.setprofile(None)
+        self._stop.set()
+        self._sampler.join()
+        _active = None
+        wall = time.time() - self._wall
+        cpu = _process_time() - self._cpu
+
+        stats = pstats.Stats(self._main)
+        with self._lock:
+            profiles = list(self._profiles)
+        for profile in profiles:
+            try:
+                stats.add(profile)
+            except (TypeError, ValueError):
+                # a thread that made no calls leaves nothing to merge
+                pass
+
+        try:
+            os.makedirs(self.dirname)
+        except OSError:
+            pass
+        prefix = os.path.join(self.dirname, "profile_{}_{}".format(
+            self.name, datetime.datetime.now().strftime("%Y%m%d-%H%M%S")))
+        stats.dump_stats(prefix + ".prof")
+        with open(prefix + ".collapsed", "w") as f:
+            for stack, count in sorted(self._samples.items()):
+                f.write("{} {}\n".format(stack, count))
+
+        breakdown = {"wall": wall, "cpu": cpu, "threads": len(profiles) + 1,
+                     "phases": metrics.summary()["phases"] if metrics is not None else {}}
+        text = StringIO()
+        text.write("wall {:.3f}s, cpu {:.3f}s, {} threads profiled\n".format(wall, cpu, breakdown["threads"]))
+        for phase, p in sorted(breakdown["phases"].items()):
+            text.write("phase {}: wall {:.3f}s, busy {:.3f}s, cpu {:.3f}s over {} calls\n".format(
+                phase, p["wall"], p["seconds"], p["cpu"], p["count"]))
+        text.write("\n")
+        stats.stream = text
+        stats.sort_stats("cumulative").print_stats(40)
+        with open(prefix + ".txt", "w") as f:
+            f.write(text.getvalue())
+        with open(prefix + ".json", "w") as f:
+            f.write(json.dumps(breakdown, indent=2, sort_keys=True) + "\n")
+        out("Profile written to {}.*".format(prefix))
+        return prefix
@@ -22,7 +22,7 @@ _job_states = {
 _done_job_states = {"COMPLETED", "CANCELED", "FAILED"}
 
 
-def run(token, base_url, query, context=None, sleep_time=0.1, ssl_verify=True):
+def run(token, base_url, query, context=None, sleep_time=0.1, ssl_verify=True, page_size=100, session=None):
     """ Run a single sql query
 
     This runs a single sql query against the rest api and returns a json document of the results
@@ -33,6 +33,8 @@ def run(token, base_url, query, context=None, sleep_time=0.1, ssl_verify=True):
     :param context: optional context in which to execute the query
     :param sleep_time: seconds to sleep between checking for finished state
     :param ssl_verify: verify ssl on web requests
+    :param page_size: rows fetched per results request (max 500)
+    :param session: optional requests.Session to send the requests with
     :raise: DremioException if job failed
     :raise: DremioUnauthorizedException if token is incorrect or invalid
     :return: json array of result rows
@@ -43,10 +45,10 @@ def run(token, base_url, query, context=None, sleep_time=0.1, ssl_verify=True):
     [{'record':'1'}, {'record':'2'}]
     """
     assert sleep_time > 0
-    job = sql(token, base_url, query, context, ssl_verify=ssl_verify)
+    job = sql(token, base_url, query, context, ssl_verify=ssl_verify, session=session)
     job_id = job["id"]
     while True:
-        state = job_status(token, base_url, job_id, ssl_verify=ssl_verify)
+        state = job_status(token, base_url, job_id, ssl_verify=ssl_verify, session=session)
         if state["jobState"] == "COMPLETED":
             row_count = state.get("rowCount", 0)
             break
@@ -56,12 +58,12 @@ def run(token, base_url, query, context=None, sleep_time=0.1, ssl_verify=True):
         time.sleep(sleep_time)
     count = 0
     while count < row_count:
-        result = job_results(token, base_url, job_id, count, ssl_verify=ssl_verify)
-        count += 100
+        result = job_results(token, base_url, job_id, count, page_size, ssl_verify=ssl_verify, session=session)
+        count += page_size
         yield result
 
 
-def run_async(token, base_url, query, context=None, sleep_time=10, ssl_verify=True):
+def run_async(token, base_url, query, context=None, sleep_time=10, ssl_verify=True, session=None):
     """ Run a single sql query asynchronously
 
     This executes a single sql query against the rest api asynchronously and returns a future for the result
@@ -72,6 +74,7 @@ def run_async(token, base_url, query, context=None, sleep_time=10, ssl_verify=Tr
     :param context: optional context in which to execute the query
     :param sleep_time: seconds to sleep between checking for finished state
     :param ssl_verify: verify ssl on web requests
+    :param session: optional requests.Session to send the requests with
     :raise: DremioException if job failed
     :raise: DremioUnauthorizedException if token is incorrect or invalid
     :return: concurrent.futures.Future for the result
@@ -82,10 +85,10 @@ def run_async(token, base_url, query, context=None, sleep_time=10, ssl_verify=Tr
     >>> f.result()
     [{'record':'1'}, {'record':'2'}]
     """
-    return executor.submit(run, token, base_url, query, context, sleep_time, ssl_verify)
+    return executor.submit(run, token, base_url, query, context, sleep_time, ssl_verify, session=session)
 
 
-def refresh_metadata(token, base_url, table, ssl_verify=True):
+def refresh_metadata(token, base_url, table, ssl_verify=True, session=None):
     """ Refresh the metadata of a given PDS
 
     This requests a metadata refresh of a given Physical Dataset
@@ -94,6 +97,7 @@ def refresh_metadata(token, base_url, table, ssl_verify=True):
     :param base_url: base url of Dremio instance
     :param table: valid dremio table name
     :param ssl_verify: verify ssl on web requests
+    :param session: optional requests.Session to send the requests with
     :raise: DremioException if job failed
     :raise: DremioUnauthorizedException if token is incorrect or invalid
     :return: None
@@ -104,7 +108,12 @@ def refresh_metadata(token, base_url, table, ssl_verify=True):
     """
     res = []
     for x in run(
-        token, base_url, "ALTER PDS {} REFRESH METADATA FORCE UPDATE".format(table), sleep_time=2, ssl_verify=ssl_verify
+        token,
+        base_url,
+        "ALTER PDS {} REFRESH METADATA FORCE UPDATE".format(table),
+        sleep_time=2,
+        ssl_verify=ssl_verify,
+        session=session,
     ):
         res.append(x)
     return res
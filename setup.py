@@ -48,10 +48,12 @@ setup(
             "dremio_client.auth",
             "dremio_client.model",
             "dremio_client.util",
-            "dremio_client.conf",]),
+            "dremio_client.conf",
+            "dremio_client.mock",]),
     extras_require={
         ':python_version == "2.7"': ["futures"],
-        ':python_version == "2.6"': ["futures"]
+        ':python_version == "2.6"': ["futures"],
+        "arrow": ["pyarrow>=2.0"],
     },
     setup_requires=setup_requirements,
     test_suite="tests",
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from dremio_client.conf import build_config
+from dremio_client.dremio_simple_client import SimpleClient
+from dremio_client.mock import MockCatalog, MockServer
+
+
+@pytest.fixture
+def catalog():
+    """one source holding four PDSs and two folders of four PDSs each"""
+    return MockCatalog(sources=1, spaces=0, depth=1, fan=2, datasets=4)
+
+
+@pytest.fixture
+def server(catalog):
+    with MockServer(catalog) as mock:
+        yield mock
+
+
+@pytest.fixture
+def client(server):
+    return SimpleClient(build_config(server.config()))
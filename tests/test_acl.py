@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from dremio_acl.acl import _acl_matches, acl_fingerprint, index_acl_defs
+
+
+def _acl(**principals):
+    return dict((kind, [{"id": pid, "permissions": perms} for pid, perms in entries])
+                for kind, entries in principals.items())
+
+
+def test_fingerprints_ignore_order_and_version():
+    one = _acl(users=[("a", ["READ", "WRITE"]), ("b", ["READ"])])
+    other = _acl(users=[("b", ["READ"]), ("a", ["WRITE", "READ"])])
+    other["version"] = "4"
+    assert acl_fingerprint(one) == acl_fingerprint(other)
+    assert acl_fingerprint(None) == acl_fingerprint({}) == acl_fingerprint({"users": []})
+
+
+def test_matching_compares_the_canonical_form():
+    acl = _acl(users=[("a", ["READ"])])
+    defs = {"entities": [{"entityPath": ["s", "x"], "accessControlList": acl},
+                         {"entityPath": ["s", "y"], "accessControlList": _acl(users=[("a", ["READ"])])}]}
+    index_acl_defs(defs)
+    assert defs["fingerprints"][("s", "x")] is defs["fingerprints"][("s", "y")]
+    assert not isinstance(defs["fingerprints"][("s", "x")], int)
+    assert _acl_matches(defs, ("s", "x"), _acl(users=[("a", ["READ"])]))
+    assert not _acl_matches(defs, ("s", "x"), _acl(users=[("a", ["READ", "WRITE"])]))
+    assert not _acl_matches(defs, ("s", "x"), _acl(groups=[("a", ["READ"])]))
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import glob
+import os
+
+import simplejson as json
+from click.testing import CliRunner
+
+from dremio_acl.cli import cli
+
+_OWN = {"users": [{"id": "etl", "permissions": ["READ", "WRITE"]}]}
+
+
+def _run(server, *args):
+    result = CliRunner().invoke(cli, ["-h", "127.0.0.1", "-p", str(server.port), "-u", "dremio", "--password", "x"]
+                                + list(args))
+    assert result.exit_code == 0, result.output
+    return result
+
+
+def _report(server, defs, report_path):
+    _run(server, "report", "acl", "-a", defs, "-g", "analysts", "-r", report_path, "src0")
+    reports = glob.glob(os.path.join(report_path, "*"))
+    assert len(reports) == 1
+    with open(reports[0]) as f:
+        entries = [json.loads(line) for line in f]
+    os.remove(reports[0])
+    return entries
+
+
+def test_update_then_report_finds_nothing_left(tmpdir, catalog, server):
+    defs = str(tmpdir.join("defs.json"))
+    with open(defs, "w") as f:
+        json.dump({"entities": [{"entityPath": ["src0", "f0", "d1"], "accessControlList": _OWN}]}, f)
+    report_path = str(tmpdir.join("report"))
+
+    assert len(_report(server, defs, report_path)) > 0
+    _run(server, "update", "acl", "-a", defs, "-g", "analysts", "-j", "4", "src0")
+    assert catalog.acl(["src0", "f0", "d1"]) == _OWN
+    assert _report(server, defs, report_path) == []
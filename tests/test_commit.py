@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import time
+
+import requests
+from requests.exceptions import ConnectionError, Timeout
+
+from dremio_acl.commit import backoff, commit, is_retryable
+from dremio_client.error import DremioException
+from dremio_acl.grants import SqlWriter
+
+
+def _failed(status):
+    response = requests.Response()
+    response.status_code = status
+    return DremioException("failed", None, response)
+
+
+def test_retry_classification():
+    assert is_retryable(ConnectionError())
+    assert is_retryable(Timeout())
+    for status in (409, 429, 500, 502, 503):
+        assert is_retryable(_failed(status))
+    for status in (400, 401, 403, 404):
+        assert not is_retryable(_failed(status))
+    assert not is_retryable(DremioException("failed", None))
+    assert not is_retryable(ValueError("bad"))
+
+
+def test_backoff_doubles_up_to_its_cap():
+    for attempt, cap in ((1, 0.5), (2, 1.0), (3, 2.0), (10, 30.0)):
+        delays = [backoff(attempt) for _ in range(200)]
+        assert all(0 <= delay <= cap for delay in delays)
+        assert max(delays) > cap / 2
+
+
+def _objects(pulled):
+    for i in range(1000):
+        pulled.append(i)
+        yield {"id": str(i), "path": ["src0", "d{}".format(i)], "entityType": "dataset", "accessControlList": {}}
+
+
+def test_commit_past_deadline_leaves_the_source_unread(client):
+    pulled = []
+    assert commit(client, _objects(pulled), jobs=4, deadline=time.time() - 1) == []
+    assert pulled == []
+
+
+def test_sql_writer_past_deadline_leaves_the_source_unread(client):
+    pulled = []
+    bad = SqlWriter(client, [["src0"]]).commit(_objects(pulled), jobs=4, deadline=time.time() - 1)
+    assert [obj["id"] for obj in bad] == ["0"]
+    assert pulled == [0]
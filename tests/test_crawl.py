@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+from dremio_acl.crawl import CatalogStore, iter_crawl
+from dremio_client.mock import MockCatalog
+
+
+class _CountingStore(CatalogStore):
+    def __init__(self, client):
+        super(_CountingStore, self).__init__(client)
+        self.reads = 0
+        self._count_lock = threading.Lock()
+
+    def get(self, path, keep=True):
+        with self._count_lock:
+            self.reads += 1
+        return super(_CountingStore, self).get(path, keep)
+
+
+@pytest.fixture
+def catalog():
+    return MockCatalog(sources=1, spaces=0, depth=1, fan=20, datasets=2)
+
+
+def test_iter_crawl_caps_the_containers_in_flight(client):
+    store = _CountingStore(client)
+    crawl = iter_crawl(client, client.catalog()["data"], jobs=1, store=store)
+    assert next(crawl)["path"] == ["src0"]
+    assert next(crawl)["path"] == ["src0", "f0"]
+    # of the twenty folders listed in src0 only two were asked for
+    assert store.reads <= 3
+    assert len(list(crawl)) == 20 - 1 + 21 * 2
+    assert store.reads == 21
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+import simplejson as json
+from click.testing import CliRunner
+
+from dremio_acl.acl import canonical_acl, fetch, index_acl_defs, update_acl
+from dremio_acl.cli import cli
+from dremio_acl.grants import SqlWriter, grant_statements
+from dremio_client.conf import build_config
+from dremio_client.dremio_simple_client import SimpleClient
+from dremio_client.mock import MockCatalog, MockServer
+
+_ROLE_READ = {"roles": [{"id": "analysts", "permissions": ["READ"]}]}
+
+
+def _dataset(acl):
+    return {"entityType": "dataset", "path": ["src", 'a"b', "pds"], "accessControlList": acl}
+
+
+def test_users_and_roles_are_granted_to_their_own_grantee_type():
+    wanted = {"users": [{"id": "etl", "permissions": ["READ", "WRITE"]}], "roles": [{"id": "bi", "permissions": ["READ"]}]}
+    current = {"users": [{"id": "etl", "permissions": ["READ"]}], "roles": [{"id": "old", "permissions": ["READ"]}]}
+    assert grant_statements(_dataset(wanted), current) == [
+        'GRANT SELECT ON TABLE "src"."a""b"."pds" TO ROLE "bi"',
+        'GRANT ALTER ON TABLE "src"."a""b"."pds" TO USER "etl"',
+        'REVOKE SELECT ON TABLE "src"."a""b"."pds" FROM ROLE "old"',
+    ]
+
+
+def test_groups_are_refused():
+    with pytest.raises(ValueError) as e:
+        grant_statements(_dataset({"groups": [{"id": "analysts", "permissions": ["READ"]}]}), {})
+    assert "--write-acls-with rest" in str(e.value)
+
+
+def test_sql_writer_matches_rest():
+    base = ["src0", "f1"]
+    defs = {"entities": [{"entityPath": base + ["d{}".format(i)],
+                          "accessControlList": {"users": [{"id": "z", "permissions": ["READ"]}]}} for i in (0, 2)]}
+    index_acl_defs(defs)
+    written = {}
+    for mode in ("rest", "sql"):
+        catalog = MockCatalog(sources=1, spaces=0, depth=1, fan=2, datasets=4, acls=[(1, _ROLE_READ)])
+        with MockServer(catalog) as server:
+            client = SimpleClient(build_config(server.config()))
+            datasets, folder = fetch(client, base)
+            writer = SqlWriter(client, [base], sleep_time=0.01) if mode == "sql" else None
+            assert update_acl(client, defs, datasets, folder, False, {"accessControlList": _ROLE_READ},
+                              writer=writer) == []
+            written[mode] = dict((path, canonical_acl(acl)) for path, acl in catalog.written().items())
+    assert len(written["rest"]) == 2
+    assert written["sql"] == written["rest"]
+
+
+def test_sql_writer_refuses_a_group_default_acl(tmpdir, server):
+    acl_file = str(tmpdir.join("defs.json"))
+    with open(acl_file, "w") as f:
+        json.dump({"entities": []}, f)
+    result = CliRunner().invoke(cli, ["-h", "127.0.0.1", "-p", str(server.port), "-u", "dremio", "--password", "x",
+                                      "update", "acl", "-a", acl_file, "-g", "analysts", "--write-acls-with", "sql",
+                                      "src0"])
+    assert result.exit_code == 2
+    assert "groups can not be granted with SQL" in result.output
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from dremio_acl.journal import Journal
+
+
+def test_resume_skips_done_paths(tmpdir):
+    filename = str(tmpdir.join("journal.jsonl"))
+    journal = Journal(filename)
+    journal.checked(["s", "ok"], "1", False)
+    journal.checked(["s", "dirty"], "2", True)
+    journal.checked(["s", "committed"], "3", True)
+    journal.committed(["s", "committed"], "3")
+    journal.close()
+    resumed = Journal(filename, resume=True)
+    resumed.close()
+    assert resumed.is_done(["s", "ok"]) and resumed.is_done(["s", "committed"])
+    assert not resumed.is_done(["s", "dirty"])
+    assert not Journal(filename).is_done(["s", "ok"])
+
+
+def test_resume_after_a_torn_last_line(tmpdir):
+    filename = str(tmpdir.join("journal.jsonl"))
+    journal = Journal(filename)
+    journal.committed(["s", "first"], "1")
+    journal.close()
+    with open(filename, "a") as f:
+        f.write('{"op": "committed", "path": ["s", "to')
+
+    resumed = Journal(filename, resume=True)
+    resumed.committed(["s", "second"], "2")
+    resumed.close()
+    again = Journal(filename, resume=True)
+    again.close()
+    assert len(again) == 2
+    assert again.is_done(["s", "first"]) and again.is_done(["s", "second"])
+    with open(filename) as f:
+        assert all(line.endswith("\n") for line in f)
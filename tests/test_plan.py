@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+import io
+
+import simplejson as json
+
+from dremio_acl.acl import acl_changes, fetch, index_acl_defs
+from dremio_acl.plan import apply_plan, write_plan
+
+_READ = {"groups": [{"id": "readers", "permissions": ["READ"]}]}
+
+
+def test_plan_then_apply_writes_the_planned_acls(tmpdir, catalog, client):
+    plan_file = str(tmpdir.join("plan.jsonl"))
+    datasets, source_folder = fetch(client, ["src0"])
+    acl_defs = {"entities": []}
+    index_acl_defs(acl_defs)
+    default_acl = {"accessControlList": _READ}
+    count = write_plan(acl_changes(client, acl_defs, datasets, source_folder, False, default_acl), plan_file)
+    assert count > 0
+    assert catalog.written() == {}
+
+    with open(plan_file) as f:
+        entries = [json.loads(line) for line in f]
+    # entries carry no more than is needed to write the ACL
+    assert all(set(entry) == {"id", "tag", "path", "entityType", "reason", "accessControlList"} for entry in entries)
+
+    with io.open(plan_file) as f:
+        assert apply_plan(client, f) == []
+    written = catalog.written()
+    assert sorted(written) == sorted(tuple(entry["path"]) for entry in entries)
+    assert all(acl == _READ for acl in written.values())
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from dremio_acl.acl import canonical_acl
+from dremio_acl.privileges import parse_object_id, read_grants
+
+
+class _QueryClient(object):
+    def __init__(self, rows):
+        self._rows = rows
+
+    def query(self, query, sleep_time=10, page_size=100):
+        yield {"rows": self._rows}
+
+
+def _row(grantee_type, grantee_id, privilege, object_id):
+    return {"grantee_type": grantee_type, "grantee_id": grantee_id, "privilege": privilege, "object_type": "DATASET",
+            "object_id": object_id}
+
+
+def test_parse_object_id_keeps_quoted_dots():
+    assert parse_object_id('"my.src"."a""b".c') == ["my.src", 'a"b', "c"]
+
+
+def test_read_grants_keeps_roles_apart_from_groups():
+    client = _QueryClient([_row("ROLE", "analysts", "SELECT", "src.pds"),
+                           _row("GROUP", "analysts", "SELECT", "src.pds"),
+                           _row("USER", "alice", "ALTER", "src.pds"),
+                           _row("USER", "alice", "SELECT", "src.pds")])
+    object_type, acl = read_grants(client, [["src"]])[("src", "pds")]
+    assert object_type == "DATASET"
+    assert acl == {"roles": [{"id": "analysts", "permissions": ["READ"]}],
+                   "groups": [{"id": "analysts", "permissions": ["READ"]}],
+                   "users": [{"id": "alice", "permissions": ["READ", "WRITE"]}]}
+
+
+def test_role_and_group_of_one_name_differ():
+    role = {"roles": [{"id": "analysts", "permissions": ["READ"]}]}
+    group = {"groups": [{"id": "analysts", "permissions": ["READ"]}]}
+    assert canonical_acl(role) != canonical_acl(group)
+    assert canonical_acl(dict(role, version="3")) == canonical_acl(role)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import time
+
+import simplejson as json
+
+from dremio_acl.acl import dump_acl, fetch
+from dremio_acl.crawl import CatalogStore
+from dremio_acl.shard import QueueShard, shard_of
+
+
+class _FailingStore(CatalogStore):
+    def __init__(self, client, failing):
+        super(_FailingStore, self).__init__(client)
+        self._failing = failing
+
+    def get(self, path, keep=True):
+        if list(path) == self._failing:
+            raise ValueError("unreadable")
+        return super(_FailingStore, self).get(path, keep)
+
+
+def _dumped(filename):
+    with open(filename) as f:
+        return [json.loads(line)["path"] for line in f]
+
+
+def test_failed_dump_read_is_taken_by_another_worker(tmpdir, client):
+    queue = str(tmpdir.join("queue.sqlite"))
+    paths = fetch(client, ["src0"])[0]
+    failing = paths[0]
+
+    first = QueueShard(queue, "first", batch_size=3, lease=0.2, poll=0.01)
+    dumped = dump_acl(client, first.select(paths), str(tmpdir.join("first")), ["first"],
+                      store=_FailingStore(client, failing), on_done=first.done)
+    assert first.finish(None, dumped) is None
+    first.close()
+    assert failing not in _dumped(dumped)
+    assert len(_dumped(dumped)) == len(paths) - 1
+
+    time.sleep(0.3)
+    second = QueueShard(queue, "second", batch_size=3, lease=0.2, poll=0.01)
+    dumped = dump_acl(client, second.select(paths), str(tmpdir.join("second")), ["second"], on_done=second.done)
+    merged = second.finish(None, dumped)
+    second.close()
+    assert _dumped(dumped) == [failing]
+    assert merged is not None and len(merged[1]) == 2
+
+
+def test_shard_of_spreads_paths_evenly():
+    paths = [["src", "f{}".format(i // 100), "d{}".format(i)] for i in range(10000)]
+    counts = [0] * 8
+    for path in paths:
+        counts[shard_of(path, 8)] += 1
+    assert all(1100 < count < 1400 for count in counts)
+
+
+def test_adding_a_shard_only_moves_paths_to_it():
+    paths = [["src", "d{}".format(i)] for i in range(10000)]
+    moved = [path for path in paths if shard_of(path, 8) != shard_of(path, 9)]
+    assert all(shard_of(path, 9) == 8 for path in moved)
+    assert 900 < len(moved) < 1350
+
+
+def test_lease_of_a_stopped_worker_runs_out(tmpdir):
+    queue = str(tmpdir.join("queue.sqlite"))
+    paths = [["src0", "d{}".format(i)] for i in range(12)]
+
+    stopped = QueueShard(queue, "stopped", batch_size=2, lease=0.3, poll=0.01)
+    taken = stopped.select(iter(paths))
+    held = [next(taken), next(taken)]
+    # the process dies holding its batch: no done, no finish
+
+    live = QueueShard(queue, "live", batch_size=2, lease=0.3, poll=0.01)
+    first = list(live.select(iter(paths)))
+    assert sorted(first) == sorted(path for path in paths if path not in held)
+    for path in first:
+        live.done(path)
+    assert list(live.select(iter(paths))) == []
+
+    time.sleep(0.4)
+    second = list(live.select(iter(paths)))
+    assert sorted(second) == sorted(held)
+    for path in second:
+        live.done(path)
+    assert live.finish() is None
+    live.close()
+    stopped.close()
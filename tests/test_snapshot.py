@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from dremio_acl.snapshot import Snapshot
+
+
+def _by_path(server):
+    return server.requests.get(("GET", "/api/v3/catalog/by-path/{path}"), 0)
+
+
+def test_refresh_reads_only_containers_whose_tag_changed(tmpdir, catalog, server, client):
+    snap = Snapshot(str(tmpdir.join("snap.sqlite")), client)
+    assert snap.refresh(["src0"]) == 12
+    first = _by_path(server)
+
+    assert snap.refresh(["src0"]) == 0
+    # only src0 itself, both folders come from the snapshot
+    assert _by_path(server) - first == 1
+
+    catalog.put(["src0", "f1"], "0", {"users": [{"id": "etl", "permissions": ["READ"]}]})
+    before = _by_path(server)
+    snap.refresh(["src0"])
+    assert _by_path(server) - before == 2
+    assert snap.get(["src0", "f1"])["accessControlList"] == {"users": [{"id": "etl", "permissions": ["READ"]}]}
+    assert len(snap.get(["src0", "f0"])["children"]) == 4
+
+    before = _by_path(server)
+    snap.refresh(["src0"], full=True)
+    assert _by_path(server) - before == 3
+    snap.close()